@@ -0,0 +1,110 @@
+"""
+Incrementally maintained result aggregates for the admin dashboard.
+
+Quiz_Stats holds count/sum/max of completed scores per quiz, Quiz_Score_Histogram
+the number of scores per bucket, and Global_Stats the number of distinct students
+with a completed attempt. submit_quiz bumps them for one attempt; a regrade rebuilds
+the rows of that quiz from Quiz_Attempts in a few set-based statements.
+
+CLI (backfill after deploying):  python aggregates.py rebuild
+"""
+import sys
+from database import get_db_connection, backend
+
+HISTOGRAM_BUCKET = 10  # score bucket width in marks
+
+STATS_UPSERT = backend.upsert('Quiz_Stats', ('quiz_id', 'attempts', 'score_sum', 'score_max'), ('quiz_id',),
+                              "attempts=attempts+1, score_sum=score_sum+NEW(score_sum), score_max=GREATEST(score_max, NEW(score_max))",
+                              values=('%s', '1', '%s', '%s'))
+HISTOGRAM_UPSERT = backend.upsert('Quiz_Score_Histogram', ('quiz_id', 'bucket', 'n'), ('quiz_id', 'bucket'), "n=n+1",
+                                  values=('%s', '%s', '1'))
+STUDENTS_UPSERT = backend.upsert('Global_Stats', ('id', 'students'), ('id',), "students=students+1", values=('1', '1'))
+HISTOGRAM_SQL = "SELECT bucket, n FROM Quiz_Score_Histogram WHERE quiz_id=%s ORDER BY bucket"
+TOP_SQL = """SELECT a.attempt_id, a.total_score, u.full_name FROM Quiz_Attempts a JOIN Users u ON a.user_id=u.user_id
+             WHERE a.quiz_id=%s AND a.status='Completed' ORDER BY a.total_score DESC LIMIT %s"""
+
+def record_submission(cursor, quiz_id, user_id, attempt_id, score):
+    """Folds one newly completed attempt into the aggregates. Caller commits."""
+    cursor.execute(STATS_UPSERT, (quiz_id, score, score))
+    cursor.execute(HISTOGRAM_UPSERT, (quiz_id, int(score // HISTOGRAM_BUCKET) * HISTOGRAM_BUCKET))
+
+    # First completed attempt for this student? (indexed lookup, not a scan)
+    cursor.execute("SELECT 1 FROM Quiz_Attempts WHERE user_id=%s AND status='Completed' AND attempt_id<>%s LIMIT 1", (user_id, attempt_id))
+    if not cursor.fetchone():
+        cursor.execute(STUDENTS_UPSERT)
+
+def rebuild_quiz_stats(cursor, quiz_id):
+    """Recomputes one quiz's aggregates (after a regrade). Caller commits."""
+    forget_quiz(cursor, quiz_id)
+    cursor.execute("""INSERT INTO Quiz_Stats (quiz_id, attempts, score_sum, score_max)
+                      SELECT quiz_id, COUNT(*), SUM(total_score), MAX(total_score)
+                      FROM Quiz_Attempts WHERE quiz_id=%s AND status='Completed' GROUP BY quiz_id""", (quiz_id,))
+    cursor.execute("""INSERT INTO Quiz_Score_Histogram (quiz_id, bucket, n)
+                      SELECT quiz_id, FLOOR(total_score / %s) * %s, COUNT(*)
+                      FROM Quiz_Attempts WHERE quiz_id=%s AND status='Completed' GROUP BY quiz_id, FLOOR(total_score / %s)""",
+                   (HISTOGRAM_BUCKET, HISTOGRAM_BUCKET, quiz_id, HISTOGRAM_BUCKET))
+
+def forget_quiz(cursor, quiz_id):
+    cursor.execute("DELETE FROM Quiz_Stats WHERE quiz_id=%s", (quiz_id,))
+    cursor.execute("DELETE FROM Quiz_Score_Histogram WHERE quiz_id=%s", (quiz_id,))
+
+def rebuild_all(cursor):
+    """Full recompute of every aggregate; used for the initial backfill."""
+    cursor.execute("SELECT quiz_id FROM Quizzes")
+    for row in cursor.fetchall():
+        rebuild_quiz_stats(cursor, row['quiz_id'])
+    cursor.execute("""REPLACE INTO Global_Stats (id, students)
+                      SELECT 1, COUNT(DISTINCT user_id) FROM Quiz_Attempts WHERE status='Completed'""")
+
+def dashboard_stats(cursor):
+    """Everything the admin header and winner picker need, read from O(quizzes) rows."""
+    cursor.execute("""SELECT s.*, z.title FROM Quiz_Stats s JOIN Quizzes z ON s.quiz_id=z.quiz_id
+                      ORDER BY s.score_max DESC""")
+    per_quiz = cursor.fetchall() or []
+    cursor.execute("SELECT students FROM Global_Stats WHERE id=1")
+    row = cursor.fetchone()
+
+    exams = sum(q['attempts'] for q in per_quiz)
+    total = sum(q['score_sum'] for q in per_quiz)
+    for q in per_quiz:
+        q['avg'] = round(q['score_sum'] / q['attempts'], 1) if q['attempts'] else 0
+
+    # Winners: attempts holding the overall top score, found via the (quiz_id, status, total_score) index
+    winners = []
+    if per_quiz:
+        high = per_quiz[0]['score_max']
+        for q in per_quiz:
+            if q['score_max'] != high: break
+            cursor.execute("""SELECT a.attempt_id, a.total_score, u.full_name FROM Quiz_Attempts a JOIN Users u ON a.user_id=u.user_id
+                              WHERE a.quiz_id=%s AND a.status='Completed' AND a.total_score=%s""", (q['quiz_id'], high))
+            winners.extend(cursor.fetchall())
+
+    stats = {'students': row['students'] if row else 0, 'exams': exams,
+             'avg': round(float(total) / exams, 1) if exams else 0}
+    return stats, winners, per_quiz
+
+def completed_count(cursor, quiz_id):
+    cursor.execute("SELECT attempts FROM Quiz_Stats WHERE quiz_id=%s", (quiz_id,))
+    row = cursor.fetchone()
+    return row['attempts'] if row else 0
+
+def histogram(cursor, quiz_id):
+    cursor.execute(HISTOGRAM_SQL, (quiz_id,))
+    return [{'from': r['bucket'], 'to': r['bucket'] + HISTOGRAM_BUCKET, 'count': r['n']} for r in cursor.fetchall()]
+
+def top_n(cursor, quiz_id, n=10):
+    """Leaderboard read straight off the (quiz_id, status, total_score) index."""
+    cursor.execute(TOP_SQL, (quiz_id, n))
+    return cursor.fetchall()
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['rebuild']:
+        sys.exit("usage: python aggregates.py rebuild")
+    conn = get_db_connection()
+    if conn is None: sys.exit(1)
+    with conn.cursor() as cursor:
+        rebuild_all(cursor)
+    conn.commit()
+    conn.close()
+    print("Aggregates rebuilt")
@@ -0,0 +1,221 @@
+import atexit
+import glob
+import json
+import os
+import threading
+from database import get_db_connection, backend
+
+UPSERT_SQL = backend.upsert('Quiz_Responses', ('attempt_id', 'question_id', 'selected_option', 'is_flagged'), ('attempt_id', 'question_id'),
+                            "selected_option=COALESCE(NEW(selected_option), selected_option), is_flagged=NEW(is_flagged)")
+
+
+def open_attempts_sql(n):
+    """Which of n attempts are still in progress, locking their rows until the flush commits."""
+    return (f"SELECT attempt_id FROM Quiz_Attempts WHERE attempt_id IN ({','.join(['%s'] * n)}) "
+            "AND status='In-Progress' FOR UPDATE")
+
+def _alive(pid):
+    try: os.kill(pid, 0)
+    except ProcessLookupError: return False
+    except PermissionError: return True
+    return True
+
+
+class AnswerBuffer:
+    """
+    Write-behind buffer for autosaves. Answers are keyed by (attempt_id, question_id)
+    so repeated clicks collapse to the last value, and are written to Quiz_Responses
+    as multi-row upserts once flush_size answers are pending or flush_interval passes.
+
+    durability:
+      'none'    - memory only, a crash loses unflushed answers
+      'journal' - append every answer to the journal before acknowledging
+      'fsync'   - same as journal, but fsync each append (survives power loss)
+
+    Each process journals to `<journal_path>.<pid>` and on start takes over the journals
+    of processes that are no longer running. Every flush starts a fresh journal holding
+    only what stays pending (the old one is kept as `<journal_path>.<pid>.flushing`
+    until the batch is committed), so the journal never grows past the pending answers. Pending answers live in one process's memory,
+    so the buffer needs a single web worker: submit_quiz and the sweeper can only flush
+    the buffer of the process they run in (create_app's start_services enforces this).
+    Answers for attempts that were submitted in the meantime are dropped at flush time,
+    so a submitted attempt's responses can't change after it was scored.
+    """
+
+    def __init__(self, journal_path='answers.journal', durability='journal', flush_size=500, flush_interval=2.0):
+        self.journal_base = journal_path
+        self.journal_path = f"{journal_path}.{os.getpid()}"
+        self.durability = durability
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._seq = {}  # attempt_id -> last client sequence acknowledged by this process
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = None
+        self._journal = None
+        self.stats = {'buffered': 0, 'flushes': 0, 'rows_written': 0, 'dropped': 0, 'errors': 0}
+
+    # --- Lifecycle ---
+    def start(self):
+        if self.durability != 'none':
+            orphans = self._recover()
+            # Copy what the dead processes left into our own journal before dropping theirs
+            self._journal = open(self.journal_path, 'w', encoding='utf-8')
+            self._append(self._pending.items())
+            os.fsync(self._journal.fileno())
+            for path in orphans:
+                if path != self.journal_path: os.remove(path)
+            try: self.flush()
+            except Exception as e: print(f"Flush Error: {e}")  # stays pending; flusher retries
+        self._thread = threading.Thread(target=self._run, name='answer-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def shutdown(self):
+        self._stop = True
+        self._wake.set()
+        if self._thread: self._thread.join(timeout=10)
+        try: self.flush()
+        except Exception as e: print(f"Flush Error: {e}")  # journal still holds the answers
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+            if not self._pending: os.remove(self.journal_path)  # clean exit, nothing left to recover
+
+    def _orphans(self):
+        """
+        Journals whose process has exited, oldest format (one shared file) included, in
+        replay order: a process's `.flushing` journal holds older answers than its current one.
+        """
+        found = []
+        for path in glob.glob(glob.escape(self.journal_base) + '.*'):
+            pid, _, suffix = path[len(self.journal_base) + 1:].partition('.')
+            if not pid.isdigit() or suffix not in ('', 'flushing'): continue
+            # A live pid is e.g. an old worker still draining during a graceful reload;
+            # a file under our own pid is a stale one from before the pid was reused
+            if int(pid) != os.getpid() and _alive(int(pid)): continue
+            found.append((int(pid), suffix != 'flushing', path))
+        paths = [path for _, _, path in sorted(found)]
+        return ([self.journal_base] if os.path.exists(self.journal_base) else []) + paths
+
+    def _recover(self):
+        """Reads the journals left by exited processes into pending; returns their paths."""
+        orphans = self._orphans()
+        for path in orphans:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try: aid, qid, opt, flag = json.loads(line)
+                    except ValueError: continue  # torn final line from the crash
+                    self._pending[(aid, qid)] = (opt, flag)
+        if self._pending:
+            print(f"--- Recovered {len(self._pending)} buffered answers from {len(orphans)} journal(s) ---")
+        return orphans
+
+    def _run(self):
+        while not self._stop:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try: self.flush()
+            except Exception as e: print(f"Flush Error: {e}")
+
+    # --- Journal (call with _lock held) ---
+    def _append(self, entries):
+        for (aid, qid), (opt, flag) in entries:
+            self._journal.write(json.dumps([aid, qid, opt, flag]) + '\n')
+        self._journal.flush()
+        if self.durability == 'fsync': os.fsync(self._journal.fileno())
+
+    def _rotate(self):
+        """Moves the journal aside and starts a new one with what is still pending; returns the old path."""
+        if not self._journal: return None
+        old = f"{self.journal_path}.flushing"
+        self._journal.close()
+        os.replace(self.journal_path, old)
+        self._journal = open(self.journal_path, 'w', encoding='utf-8')
+        self._append(self._pending.items())
+        return old
+
+    # --- Buffering ---
+    def put(self, attempt_id, question_id, option, is_flagged=0):
+        key = (int(attempt_id), int(question_id))
+        flag = 1 if is_flagged else 0
+        with self._lock:
+            if option is None and key in self._pending:
+                option = self._pending[key][0]  # flag-only change keeps the buffered answer
+            if self._journal: self._append([(key, (option, flag))])
+            self._pending[key] = (option, flag)
+            self.stats['buffered'] += 1
+            full = len(self._pending) >= self.flush_size
+        if full: self._wake.set()
+
+    def put_batch(self, attempt_id, seq, changes):
+        """Buffers a /api/save_answers batch; returns (sequence number to acknowledge, whether it was applied)."""
+        aid = int(attempt_id)
+        with self._lock:
+            last = self._seq.get(aid, 0)
+            if seq <= last: return last, False  # retry of a batch we already have (or a reused number)
+            self._seq[aid] = seq
+        for c in changes:
+            self.put(aid, c['question_id'], c.get('option'), c.get('is_flagged', 0))
+        return seq, True
+
+    def last_seq(self, attempt_id):
+        """Highest batch sequence acknowledged for an attempt by this process (0 if none)."""
+        with self._lock:
+            return self._seq.get(int(attempt_id), 0)
+
+    def pending_for(self, attempt_id):
+        """
+        Unflushed changes for one attempt, shaped like quiz_interface's saved_responses.
+        'opt' is left out for a flag-only change: the stored answer still stands.
+        """
+        with self._lock:
+            return {qid: {'opt': opt, 'flag': flag} if opt is not None else {'flag': flag}
+                    for (aid, qid), (opt, flag) in self._pending.items() if aid == int(attempt_id)}
+
+    def flush(self, attempt_id=None):
+        """Writes pending answers (all, or one attempt's) to the database. Returns rows written."""
+        with self._flush_lock:
+            with self._lock:
+                if attempt_id is None:
+                    batch, self._pending = self._pending, {}
+                else:
+                    aid = int(attempt_id)
+                    batch = {k: v for k, v in self._pending.items() if k[0] == aid}
+                    for k in batch: del self._pending[k]
+                if not batch: return 0
+                flushing = self._rotate()
+
+            attempts = sorted({aid for aid, qid in batch})
+            conn = get_db_connection()
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(open_attempts_sql(len(attempts)), attempts)
+                    open_ids = {r['attempt_id'] for r in cursor.fetchall()}
+                    rows = [(aid, qid, opt, flag) for (aid, qid), (opt, flag) in batch.items() if aid in open_ids]
+                    # pymysql rewrites this into a single multi-row INSERT; SQLite reuses one statement
+                    if rows: cursor.executemany(UPSERT_SQL, rows)
+                conn.commit()
+            except Exception:
+                with self._lock:
+                    self.stats['errors'] += 1
+                    # Keep anything newer that arrived while we were writing
+                    restored = [(k, v) for k, v in batch.items() if k not in self._pending]
+                    self._pending.update(restored)
+                    if flushing:
+                        self._append(restored)  # back in the live journal before the old one goes
+                        os.remove(flushing)
+                raise
+            finally:
+                if conn: conn.close()
+
+            # The batch is in the database now; the live journal has everything newer
+            if flushing: os.remove(flushing)
+            with self._lock:
+                self.stats['flushes'] += 1
+                self.stats['rows_written'] += len(rows)
+                self.stats['dropped'] += len(batch) - len(rows)
+            return len(rows)
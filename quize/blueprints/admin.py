@@ -0,0 +1,456 @@
+"""
+Admin and Coordinator pages: dashboards, session and question management, bank
+uploads, results export, background jobs and the JSON metrics endpoints.
+"""
+import os
+import sys
+import uuid
+from flask import Blueprint, current_app, request, redirect, session, render_template, jsonify, send_file, Response
+from database import get_db_connection, pool as db_pool
+from scoring import regrade_quiz
+import aggregates
+import listing
+from exports import iter_results_csv, gzip_stream
+import jobs
+from executor import get_executor
+import code_grading
+import events
+import importer
+import lazy
+import search
+from state import invalidate_quiz, dashboard_cache, quiz_cache, deadline_cache, analysis_cache, parse_start_time, quiz_of_question
+
+bp = Blueprint('admin', __name__)
+
+COORDINATORS_SQL = "SELECT * FROM Users WHERE role='Coordinator'"
+
+
+# --- DASHBOARDS ---
+@bp.route('/admin')
+def admin_dashboard():
+    if session.get('role') != 'Admin': return redirect('/')
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            # Get Quizzes
+            cursor.execute("SELECT * FROM Quizzes")
+            quizzes = cursor.fetchall() or []
+
+            # Questions & Results tables load page-by-page from /api/list/<resource>
+
+            # Get Coordinators
+            cursor.execute(COORDINATORS_SQL)
+            coordinators = cursor.fetchall() or []
+
+            # Winners & Analytics (precomputed per quiz, see aggregates.py)
+            stats, winners, quiz_stats = aggregates.dashboard_stats(cursor)
+
+    except Exception as e:
+        print(f"DB Error: {e}")
+        quizzes, coordinators, winners, quiz_stats = [], [], [], []
+        stats = {'students': 0, 'exams': 0, 'avg': 0}
+    finally:
+        conn.close()
+
+    return render_template('admin_dashboard.html', 
+                           coordinators=coordinators, quizzes=quizzes, winners=winners,
+                           stats=stats, quiz_stats=quiz_stats)
+
+@bp.route('/coordinator')
+def coordinator_dashboard():
+    if session.get('role') != 'Coordinator': return redirect('/')
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT * FROM Quizzes")
+            quizzes = cursor.fetchall()
+            # Students & Questions tables load page-by-page from /api/list/<resource>
+            cursor.execute("SELECT quiz_id, attempts FROM Quiz_Stats")
+            completed = {r['quiz_id']: r['attempts'] for r in cursor.fetchall()}
+    except Exception as e:
+        print(f"Coordinator DB Error: {e}")
+        quizzes, completed = [], {}
+    finally:
+        conn.close()
+
+    return render_template('coordinator_dashboard.html', quizzes=quizzes, completed=completed, name=session['name'])
+
+@bp.route('/api/list/<resource>')
+def list_resource(resource):
+    """Keyset-paginated JSON behind the dashboard tables (see listing.py for sorts/filters)."""
+    spec = listing.RESOURCES.get(resource)
+    if not spec: return jsonify({'status': 'error', 'output': 'Unknown list'}), 404
+    if session.get('role') not in spec['roles']: return "Denied", 403
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            page = listing.fetch_page(cursor, resource, request.args)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'output': str(e)}), 400
+    finally:
+        conn.close()
+    return jsonify(page)
+
+@bp.route('/api/questions/search')
+def search_questions():
+    """Ranked full-text search over question text and options: ?q=&quiz_id=&limit="""
+    if session.get('role') not in ['Admin', 'Coordinator']: return "Denied", 403
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            items = search.search(cursor, request.args.get('q', ''), quiz_id=request.args.get('quiz_id', type=int),
+                                  limit=request.args.get('limit', search.SEARCH_LIMIT, type=int))
+    finally:
+        conn.close()
+    return jsonify({'items': items})
+
+@bp.route('/api/questions/similar', methods=['GET', 'POST'])
+def similar_questions():
+    """Near-duplicates of a draft question (?text=, or form field q_text); exclude= skips the question being edited."""
+    if session.get('role') not in ['Admin', 'Coordinator']: return "Denied", 403
+    text = request.values.get('text') or request.values.get('q_text') or ''
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            items = search.similar_questions(cursor, text, exclude=request.values.get('exclude', type=int))
+    finally:
+        conn.close()
+    return jsonify({'items': items})
+
+# --- SESSION MANAGEMENT ---
+@bp.route('/create_quiz_session', methods=['POST'])
+def create_quiz_session():
+    if session.get('role') not in ['Admin', 'Coordinator']: return "Denied"
+    
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        cursor.execute("INSERT INTO Quizzes (title, category, duration_minutes, total_marks, start_time) VALUES (%s, %s, %s, %s, %s)", 
+                       (request.form['title'], request.form['category'], request.form['duration'], request.form['total_marks'], parse_start_time(request.form['start_time'])))
+        conn.commit()
+    conn.close()
+    dashboard_cache.invalidate('schedule')
+    events.publish('quizzes', 'quizzes', {})
+    return redirect(request.referrer)
+
+@bp.route('/session/edit/<int:quiz_id>', methods=['POST'])
+def edit_session(quiz_id):
+    if session.get('role') != 'Admin': return "Denied"
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        cursor.execute("""UPDATE Quizzes SET title=%s, category=%s, duration_minutes=%s, total_marks=%s, start_time=%s 
+                          WHERE quiz_id=%s""", 
+                       (request.form['title'], request.form['category'], request.form['duration'], request.form['total_marks'], parse_start_time(request.form['start_time']), quiz_id))
+        conn.commit()
+    conn.close()
+    invalidate_quiz(quiz_id)
+    dashboard_cache.invalidate('schedule')
+    events.publish('quizzes', 'quizzes', {})
+    return redirect('/admin')
+
+@bp.route('/session/delete/<int:quiz_id>')
+def delete_session(quiz_id):
+    if session.get('role') != 'Admin': return "Denied"
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        cursor.execute("DELETE FROM Quizzes WHERE quiz_id=%s", (quiz_id,))
+        cursor.execute("DELETE FROM Questions WHERE quiz_id=%s", (quiz_id,))
+        aggregates.forget_quiz(cursor, quiz_id)
+        conn.commit()
+    conn.close()
+    invalidate_quiz(quiz_id)
+    dashboard_cache.invalidate('schedule')
+    events.publish('quizzes', 'quizzes', {})
+    return redirect('/admin')
+
+# --- QUESTION MANAGEMENT ---
+@bp.route('/admin/add_manual_question', methods=['POST'])
+def add_manual_question():
+    if session.get('role') not in ['Admin', 'Coordinator']: return "Denied"
+    
+    quiz_id = request.form.get('quiz_id')
+    q_text = request.form.get('q_text')
+    
+    if not quiz_id or not q_text: return "Error: Missing Data"
+
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        if request.form.get('q_type') == 'MCQ':
+            cursor.execute("""INSERT INTO Questions (quiz_id, question_type, question_text, text_hash, option_a, option_b, option_c, option_d, correct_option, marks)
+                              VALUES (%s, 'MCQ', %s, %s, %s, %s, %s, %s, %s, %s)""", 
+                           (quiz_id, q_text, importer.text_hash(q_text), request.form.get('opt_a'), request.form.get('opt_b'), request.form.get('opt_c'), request.form.get('opt_d'), request.form.get('correct_opt'), request.form.get('marks')))
+            question_id = cursor.lastrowid
+        else:
+            cursor.execute("""INSERT INTO Questions (quiz_id, question_type, question_text, text_hash, test_input, test_output, marks)
+                              VALUES (%s, 'CODE', %s, %s, %s, %s, %s)""", 
+                           (quiz_id, q_text, importer.text_hash(q_text), request.form.get('test_input'), request.form.get('test_output'), request.form.get('marks')))
+            question_id = cursor.lastrowid
+            # Hidden test cases (graded server-side, never sent to the browser)
+            hidden = [(question_id, i, t_in, t_out) for i, (t_in, t_out)
+                      in enumerate(zip(request.form.getlist('hidden_input'), request.form.getlist('hidden_output'))) if t_out.strip()]
+            if hidden:
+                cursor.executemany("INSERT INTO Question_Tests (question_id, position, input, expected_output) VALUES (%s, %s, %s, %s)", hidden)
+        search.reindex(cursor, [question_id])
+        conn.commit()
+    conn.close()
+    invalidate_quiz(quiz_id)
+    return redirect(request.referrer)
+
+@bp.route('/question/edit/<int:q_id>', methods=['GET', 'POST'])
+def edit_question(q_id):
+    if session.get('role') not in ['Admin', 'Coordinator']: return "Denied"
+    conn = get_db_connection()
+
+    if request.method == 'POST':
+        with conn.cursor() as cursor:
+            cursor.execute("""UPDATE Questions SET question_text=%s, text_hash=%s, option_a=%s, option_b=%s, option_c=%s, option_d=%s, correct_option=%s, marks=%s 
+                              WHERE question_id=%s""", 
+                           (request.form['q_text'], importer.text_hash(request.form['q_text']), request.form['opt_a'], request.form['opt_b'], request.form['opt_c'], request.form['opt_d'], request.form['correct'], request.form['marks'], q_id))
+            search.reindex(cursor, [q_id])
+            quiz_id = quiz_of_question(cursor, q_id)
+            code_grading.invalidate(q_id)
+            if quiz_id:
+                regrade_quiz(cursor, quiz_id)  # answer key or marks may have changed
+                aggregates.rebuild_quiz_stats(cursor, quiz_id)
+            conn.commit()
+            invalidate_quiz(quiz_id)
+            if quiz_id: analysis_cache.invalidate(quiz_id)
+        conn.close()
+        return redirect(request.referrer or '/admin')
+
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT * FROM Questions WHERE question_id=%s", (q_id,))
+        q = cursor.fetchone()
+    conn.close()
+    return render_template('edit_question.html', q=q)
+
+@bp.route('/question/delete/<int:q_id>')
+def delete_question(q_id):
+    if session.get('role') not in ['Admin', 'Coordinator']: return "Denied"
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        quiz_id = quiz_of_question(cursor, q_id)
+        cursor.execute("DELETE FROM Questions WHERE question_id=%s", (q_id,))
+        cursor.execute("DELETE FROM Question_Tests WHERE question_id=%s", (q_id,))
+        conn.commit()
+    conn.close()
+    invalidate_quiz(quiz_id)
+    if quiz_id: analysis_cache.invalidate(quiz_id)
+    code_grading.invalidate(q_id)
+    return redirect(request.referrer)
+
+@bp.route('/admin/delete_bulk_questions', methods=['POST'])
+def delete_bulk_questions():
+    if session.get('role') not in ['Admin', 'Coordinator']: return "Denied"
+    ids = request.form.getlist('q_ids')
+    if not ids: return "No questions selected"
+    jobs.enqueue('delete_questions', {'ids': [int(i) for i in ids]}, user_id=session.get('user_id'))
+    return redirect(request.referrer)
+
+@bp.route('/upload_docx', methods=['POST'])
+def upload_docx():
+    """Question bank upload: .docx, .csv, .json or .jsonl (see importer.py for the layouts)."""
+    if 'file' not in request.files: return "No file"
+    file = request.files['file']
+    quiz_id = request.form.get('quiz_id')
+    if not quiz_id: return "Error: Select Session"
+    fmt = importer.detect_format(file.filename or '')
+    if not fmt: return "Error: Upload a .docx, .csv, .json or .jsonl file"
+
+    # Parsing happens in a background job; the request only stores the upload
+    os.makedirs(current_app.config['UPLOAD_DIR'], exist_ok=True)
+    path = os.path.abspath(os.path.join(current_app.config['UPLOAD_DIR'], f"{uuid.uuid4().hex}.{fmt}"))
+    file.save(path)
+    jobs.enqueue('import_questions', {'path': path, 'format': fmt, 'quiz_id': int(quiz_id)}, max_attempts=1, user_id=session.get('user_id'))
+    return redirect(request.referrer)
+
+# --- ADMIN EXTRAS ---
+@bp.route('/admin/regrade/<int:quiz_id>', methods=['POST'])
+def regrade(quiz_id):
+    if session.get('role') != 'Admin': return "Denied"
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        changed = regrade_quiz(cursor, quiz_id)
+        aggregates.rebuild_quiz_stats(cursor, quiz_id)
+        conn.commit()
+    conn.close()
+    analysis_cache.invalidate(quiz_id)
+    return jsonify({'status': 'success', 'quiz_id': quiz_id, 'changed': changed})
+
+@bp.route('/admin/analysis/<int:quiz_id>')
+def item_analysis(quiz_id):
+    """Per-question difficulty, discrimination and distractor statistics (see item_analysis.py)."""
+    if session.get('role') != 'Admin': return "Denied"
+    return jsonify(lazy.load('item_analysis').analyze(quiz_id))
+
+@bp.route('/admin/announce_winner', methods=['POST'])
+def announce_winner():
+    if session.get('role') != 'Admin': return "Denied"
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        message = f"🏆 Top Scorer: {request.form['winner_name']}"
+        cursor.execute("UPDATE Announcements SET message=%s, is_active=1 WHERE id=1", (message,))
+        conn.commit()
+    conn.close()
+    dashboard_cache.invalidate('announcement')
+    events.publish('announcements', 'announcement', {'message': message})
+    return redirect('/admin')
+
+@bp.route('/admin/clear_announcement')
+def clear_announcement():
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        cursor.execute("UPDATE Announcements SET is_active=0 WHERE id=1")
+        conn.commit()
+    conn.close()
+    dashboard_cache.invalidate('announcement')
+    events.publish('announcements', 'announcement', {'message': None})
+    return redirect('/admin')
+
+@bp.route('/admin/delete_user/<int:user_id>')
+def delete_user(user_id):
+    if session.get('role') != 'Admin': return "Denied"
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        cursor.execute("DELETE FROM Users WHERE user_id=%s", (user_id,))
+        cursor.execute("UPDATE Quiz_Attempts SET user_id=NULL WHERE user_id=%s", (user_id,))
+        conn.commit()
+    conn.close()
+    return redirect('/admin')
+
+@bp.route('/admin/create_coordinator', methods=['POST'])
+def create_coordinator():
+    if session.get('role') != 'Admin': return "Denied"
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        cursor.execute("INSERT INTO Users (full_name, email, password_hash, role) VALUES (%s, %s, %s, 'Coordinator')", (request.form['name'], request.form['email'], request.form['password']))
+        conn.commit()
+    conn.close()
+    return redirect('/admin')
+
+@bp.route('/admin/export_results')
+def export_results():
+    if session.get('role') != 'Admin': return "Denied"
+    # Filters: ?quiz_id=&status=&from=YYYY-MM-DD&to=YYYY-MM-DD, plus breakdown=1 (needs quiz_id) and gzip=1
+    filters = {'quiz_id': request.args.get('quiz_id', type=int), 'status': request.args.get('status'),
+               'date_from': request.args.get('from'), 'date_to': request.args.get('to')}
+    breakdown, compress = request.args.get('breakdown') == '1', request.args.get('gzip') == '1'
+    if request.args.get('async') == '1':
+        # Written to disk by a job worker; fetched later from /admin/jobs/<id>/download/file
+        jobs.enqueue('export_results', {'filters': filters, 'breakdown': breakdown, 'gzip': compress,
+                                        'directory': current_app.config['EXPORT_DIR']}, user_id=session.get('user_id'))
+        return redirect('/admin')
+    body = iter_results_csv(filters, breakdown=breakdown)
+    name = 'results.csv'
+    if compress:
+        body, name = gzip_stream(body), 'results.csv.gz'
+    return Response(body, mimetype='application/gzip' if name.endswith('.gz') else 'text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={name}'})
+
+# --- BACKGROUND JOBS ---
+@jobs.handler('import_questions')
+def import_questions_job(payload, job):
+    path, quiz_id = payload['path'], payload['quiz_id']
+    conn = get_db_connection()
+    try:
+        summary = importer.import_questions(conn, quiz_id, importer.read_rows(path, payload['format']), progress=job.progress)
+    finally:
+        conn.close()
+    invalidate_quiz(quiz_id)
+    os.remove(path)
+    return summary
+
+@jobs.handler('delete_questions')
+def delete_questions_job(payload, job):
+    ids = payload['ids']
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        fmt = ','.join(['%s'] * len(ids))
+        cursor.execute(f"DELETE FROM Questions WHERE question_id IN ({fmt})", tuple(ids))
+        deleted = cursor.rowcount
+        cursor.execute(f"DELETE FROM Question_Tests WHERE question_id IN ({fmt})", tuple(ids))
+    conn.commit()
+    conn.close()
+    invalidate_quiz()  # ids may span several quizzes
+    analysis_cache.clear()
+    code_grading.invalidate()
+    return {'deleted': deleted}
+
+@jobs.handler('export_results')
+def export_results_job(payload, job):
+    body = iter_results_csv(payload['filters'], breakdown=payload['breakdown'])
+    name = f"results_{job.job_id}.csv"
+    if payload['gzip']:
+        body, name = gzip_stream(body), name + '.gz'
+    # Workers run outside any request, so the directory travels in the payload
+    directory = payload.get('directory', 'exports')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.abspath(os.path.join(directory, name))
+    size = 0
+    with open(path, 'wb') as f:
+        for chunk in body:
+            f.write(chunk)
+            size += len(chunk)
+    return {'file': path, 'bytes': size}
+
+def _visible_job(job):
+    # Coordinators see the jobs they started; Admins see everything
+    return job and (session.get('role') == 'Admin' or job['created_by'] == session.get('user_id'))
+
+@bp.route('/admin/jobs')
+def list_jobs():
+    if session.get('role') not in ['Admin', 'Coordinator']: return "Denied"
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        items = [j for j in jobs.recent_jobs(cursor, limit=50) if _visible_job(j)][:20]
+    conn.close()
+    return jsonify(items)
+
+@bp.route('/admin/jobs/<int:job_id>')
+def job_status(job_id):
+    if session.get('role') not in ['Admin', 'Coordinator']: return "Denied"
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        job = jobs.job_status(cursor, job_id)
+    conn.close()
+    if not _visible_job(job): return jsonify({'status': 'error', 'output': 'Unknown job'}), 404
+    return jsonify(job)
+
+@bp.route('/admin/jobs/<int:job_id>/download/<kind>')
+def job_download(job_id, kind):
+    if session.get('role') not in ['Admin', 'Coordinator']: return "Denied"
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        job = jobs.job_status(cursor, job_id)
+    conn.close()
+    if not _visible_job(job) or kind not in ('zip', 'merged', 'file'): return "Not found", 404
+    path = (job['result'] or {}).get(kind)
+    if not path or not os.path.exists(path): return "Not ready", 404
+    return send_file(path, as_attachment=True, download_name=os.path.basename(path))
+
+# --- METRICS ---
+@bp.route('/admin/metrics/db_pool')
+def db_pool_metrics():
+    if session.get('role') != 'Admin': return "Denied"
+    return jsonify(db_pool.metrics())
+
+@bp.route('/admin/metrics/executor')
+def executor_metrics():
+    if session.get('role') != 'Admin': return "Denied"
+    return jsonify(get_executor(current_app.config['CODE_EXECUTOR']).metrics())
+
+@bp.route('/admin/metrics/cache')
+def cache_metrics():
+    if session.get('role') != 'Admin': return "Denied"
+    return jsonify({'quiz_papers': quiz_cache.metrics(), 'student_dashboard': dashboard_cache.metrics(),
+                    'deadlines': deadline_cache.metrics(), 'item_analysis': analysis_cache.metrics()})
+
+@bp.route('/admin/metrics/events')
+def event_metrics():
+    if session.get('role') != 'Admin': return "Denied"
+    return jsonify(events.broker.metrics())
+
+@bp.route('/admin/metrics/startup')
+def startup_metrics():
+    if session.get('role') != 'Admin': return "Denied"
+    return jsonify({'timings': current_app.extensions.get('startup', {}), 'imports': lazy.IMPORT_TIMES,
+                    'heavy_loaded': {m: m in sys.modules for m in lazy.HEAVY}})
@@ -0,0 +1,63 @@
+"""Login, registration and logout."""
+from flask import Blueprint, request, redirect, session, render_template
+from database import get_db_connection
+
+bp = Blueprint('auth', __name__)
+
+# Module constants so migrations.py can EXPLAIN the exact statements
+LOGIN_SQL = "SELECT * FROM Users WHERE email=%s AND password_hash=%s"
+EMAIL_SQL = "SELECT * FROM Users WHERE email=%s"
+
+
+# --- AUTH ROUTES ---
+@bp.route('/', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        email = request.form.get('email')
+        password = request.form.get('password')
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(LOGIN_SQL, (email, password))
+            user = cursor.fetchone()
+        conn.close()
+
+        if user:
+            if user.get('is_blocked', 0) == 1: return "<h1>ACCOUNT BLOCKED</h1>"
+            session.permanent = True
+            session['user_id'] = user['user_id']
+            session['role'] = user['role']
+            session['name'] = user['full_name']
+            
+            if user['role'] == 'Admin': return redirect('/admin')
+            elif user['role'] == 'Coordinator': return redirect('/coordinator')
+            else: return redirect('/student')
+        return "Login Failed"
+    return render_template('login.html')
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    conn = get_db_connection()
+    if request.method == 'POST':
+        name = request.form['name']
+        email = request.form['email']
+        password = request.form['password']
+        session_interest = request.form.get('session_interest', 'General')
+        with conn.cursor() as cursor:
+            cursor.execute(EMAIL_SQL, (email,))
+            if cursor.fetchone(): return "<h1>Email registered!</h1>"
+            cursor.execute("INSERT INTO Users (full_name, email, password_hash, role, selected_session) VALUES (%s, %s, %s, 'Student', %s)", 
+                           (name, email, password, session_interest))
+            conn.commit()
+        conn.close()
+        return redirect('/') 
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT DISTINCT category FROM Quizzes")
+        rows = cursor.fetchall() or []
+        categories = [row['category'] for row in rows]
+    conn.close()
+    return render_template('register.html', categories=categories)
+
+@bp.route('/logout')
+def logout():
+    session.clear()
+    return redirect('/')
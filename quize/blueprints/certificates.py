@@ -0,0 +1,53 @@
+"""
+Certificate approval, bulk rendering and download. ReportLab, qrcode and PIL are only
+imported when a certificate is actually rendered (see lazy.py).
+"""
+from datetime import datetime
+from flask import Blueprint, request, redirect, session, jsonify, send_file
+from database import get_db_connection
+import jobs
+import lazy
+
+bp = Blueprint('certificates', __name__)
+
+CERTIFICATE_SQL = """SELECT u.full_name, q.title, a.total_score, a.status, a.certificate_approved FROM Quiz_Attempts a
+                     JOIN Users u ON a.user_id=u.user_id JOIN Quizzes q ON a.quiz_id=q.quiz_id WHERE a.attempt_id=%s"""
+
+
+# --- CERTIFICATES ---
+@bp.route('/admin/approve_cert/<int:attempt_id>')
+def approve_cert(attempt_id):
+    if session.get('role') != 'Admin': return "Denied"
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        cursor.execute("UPDATE Quiz_Attempts SET certificate_approved=1 WHERE attempt_id=%s", (attempt_id,))
+        conn.commit()
+    conn.close()
+    return redirect('/admin')
+
+@bp.route('/admin/bulk_certs/<int:quiz_id>', methods=['POST'])
+def bulk_certs(quiz_id):
+    """Approves and renders every certificate of a quiz in the background."""
+    if session.get('role') != 'Admin': return "Denied"
+    payload = {'quiz_id': quiz_id, 'zip': request.form.get('zip') == '1', 'merged': request.form.get('merged') == '1'}
+    job_id = jobs.enqueue('bulk_certs', payload, max_attempts=1, user_id=session.get('user_id'))
+    return jsonify({'status': 'success', 'job_id': job_id, 'status_url': f"/admin/jobs/{job_id}"})
+
+@bp.route('/download/cert/<int:attempt_id>')
+def download_cert(attempt_id):
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        cursor.execute(CERTIFICATE_SQL, (attempt_id,))
+        data = cursor.fetchone()
+    conn.close()
+    
+    if not data or data['status'] != 'Completed': return "Exam not completed."
+    if data['certificate_approved'] == 0: return "<h1>Certificate Locked</h1><p>Contact Admin.</p>"
+
+    # Served from the on-disk certificate cache; rendered only on first download
+    pdf = lazy.load('certificate_generator').get_certificate_path(data['full_name'], data['title'], int(data['total_score']), datetime.now().strftime("%Y-%m-%d"), attempt_id)
+    return send_file(pdf, as_attachment=True, download_name=f"Certificate_{data['full_name']}.pdf", mimetype='application/pdf')
+
+@jobs.handler('bulk_certs')
+def bulk_certs_job(payload, job):
+    return lazy.load('cert_jobs').render_quiz_certificates(payload['quiz_id'], make_zip=payload['zip'], merged=payload['merged'], progress=job.progress)
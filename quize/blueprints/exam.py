@@ -0,0 +1,263 @@
+"""
+Student dashboard and the exam itself: the console, autosave, submit, code runs,
+live-update polls and the leaderboard. Nothing here needs the certificate or
+document libraries, so a worker serving exams never imports them.
+"""
+import time
+from datetime import datetime, timedelta
+from flask import Blueprint, current_app, request, redirect, session, render_template, jsonify
+from database import get_db_connection, backend, teardown_db
+from scoring import score_attempt
+import aggregates
+from answer_buffer import UPSERT_SQL
+from executor import get_executor, ExecutorBusy
+import code_grading
+import events
+from ordering import question_order, encode_order, decode_order, apply_order, option_order
+import state
+from state import (get_quiz_paper, get_schedule, get_announcement, attempt_deadline, attempt_owner, accepting_answers, time_up,
+                   lock_open_attempt, already_submitted)
+
+bp = Blueprint('exam', __name__)
+
+HISTORY_SQL = """SELECT q.title, a.total_score, a.status, a.attempt_id, a.certificate_approved
+                 FROM Quiz_Attempts a JOIN Quizzes q ON a.quiz_id=q.quiz_id WHERE a.user_id=%s"""
+ATTEMPT_SQL = "SELECT attempt_id, status, question_order, deadline, last_sync_seq FROM Quiz_Attempts WHERE user_id=%s AND quiz_id=%s"
+RESPONSES_SQL = "SELECT question_id, selected_option, is_flagged FROM Quiz_Responses WHERE attempt_id=%s"
+
+SAVE_ANSWER_SQL = backend.upsert('Quiz_Responses', ('attempt_id', 'question_id', 'selected_option', 'is_flagged'), ('attempt_id', 'question_id'),
+                                 "selected_option=NEW(selected_option), is_flagged=NEW(is_flagged)")
+
+
+# --- STUDENT & EXAM ---
+@bp.route('/student')
+def student_dashboard():
+    if session.get('role') != 'Student': return redirect('/')
+    now = datetime.now()
+    available = []
+    for q in get_schedule():
+        q = dict(q)  # cached rows are shared between requests
+        if not q['start_time'] or now >= q['start_time']:
+            q.update({'is_locked': False, 'time_msg': "Live Now", 'seconds_left': 0})
+        else:
+            diff = q['start_time'] - now
+            q.update({'is_locked': True, 'time_msg': f"Starts: {q['start_time']}", 'seconds_left': int(diff.total_seconds())})
+        available.append(q)
+
+    # Only the student's own history is read per visit
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        cursor.execute(HISTORY_SQL, (session['user_id'],))
+        history = cursor.fetchall()
+    conn.close()
+    return render_template('student_dashboard.html', quizzes=available, history=history, name=session['name'], winner_announce=get_announcement(),
+                           server_now=time.time())
+
+@bp.route('/quiz/<int:quiz_id>')
+def quiz_interface(quiz_id):
+    if 'user_id' not in session: return redirect('/')
+    paper = get_quiz_paper(quiz_id)
+    if paper is None: return "Not found", 404
+    meta = paper['meta']
+
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        cursor.execute(ATTEMPT_SQL, (session['user_id'], quiz_id))
+        existing = cursor.fetchone()
+        
+        if existing:
+            if existing['status'] != 'In-Progress': return "<h1>Exam Finished</h1><a href='/student'>Return</a>"
+            attempt_id = existing['attempt_id']
+            order = decode_order(existing['question_order'])
+            deadline = existing['deadline']
+            sync_seq = existing['last_sync_seq'] or 0
+        else:
+            started_at = datetime.now().replace(microsecond=0)
+            deadline = started_at + timedelta(minutes=meta['duration_minutes'] or 30)
+            cursor.execute("""INSERT INTO Quiz_Attempts (user_id, quiz_id, total_score, status, started_at, deadline)
+                              VALUES (%s, %s, 0, 'In-Progress', %s, %s)""", (session['user_id'], quiz_id, started_at, deadline))
+            attempt_id = cursor.lastrowid
+            order = None
+            sync_seq = 0
+            conn.commit()
+
+        # Order is fixed once per attempt (seeded by attempt_id), then only looked up
+        if not order:
+            order = question_order(attempt_id, [q['question_id'] for q in paper['questions']])
+            cursor.execute("UPDATE Quiz_Attempts SET question_order=%s WHERE attempt_id=%s", (encode_order(order), attempt_id))
+            conn.commit()
+        questions = apply_order(paper['questions'], order)
+        options = {q['question_id']: option_order(attempt_id, q['question_id']) for q in questions} if current_app.config['SHUFFLE_OPTIONS'] else {}
+
+        # Get saved answers
+        cursor.execute(RESPONSES_SQL, (attempt_id,))
+        saved = {row['question_id']: {'opt': row['selected_option'], 'flag': row['is_flagged']} for row in cursor.fetchall()}
+        if state.answer_buffer:
+            for qid, change in state.answer_buffer.pending_for(attempt_id).items():
+                saved.setdefault(qid, {'opt': None, 'flag': 0}).update(change)
+            sync_seq = max(sync_seq, state.answer_buffer.last_seq(attempt_id))
+
+    conn.close()
+    # A reload resumes the clock instead of restarting it
+    remaining = max(0, int(deadline.timestamp() - time.time())) if deadline else None
+    return render_template('exam_console.html', questions=questions, attempt_id=attempt_id, quiz_meta=meta, saved_responses=saved,
+                           option_orders=options, remaining=remaining, sync_seq=sync_seq)
+
+@bp.route('/api/save_answer', methods=['POST'])
+def save_answer():
+    data = request.json
+    if 'user_id' not in session or attempt_owner(data['attempt_id']) != session['user_id']: return "Denied", 403
+    if not accepting_answers(data['attempt_id']): return time_up()
+    if state.answer_buffer:
+        state.answer_buffer.put(data['attempt_id'], data['question_id'], data['option'], data.get('is_flagged', 0))
+        return jsonify({'status': 'success'})
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            if not lock_open_attempt(cursor, data['attempt_id']): return already_submitted()
+            cursor.execute(SAVE_ANSWER_SQL, (data['attempt_id'], data['question_id'], data['option'], data.get('is_flagged', 0)))
+        conn.commit()
+    finally:
+        conn.close()
+    return jsonify({'status': 'success'})
+
+@bp.route('/api/save_answers', methods=['POST'])
+def save_answers():
+    """
+    Batched autosave from the exam console.
+    Body: {attempt_id, seq, changes: [{question_id, option, is_flagged}, ...]}
+    `seq` increases with every batch the client sends; a batch whose seq was already
+    acknowledged is not re-applied, so the client can retry blindly. The reply is
+    {ack: highest seq applied, applied: whether this batch was}; a batch that wasn't
+    applied may also be one that reused a number another page of the attempt (the one
+    before a reload) took, so the console renumbers its changes above `ack` and
+    sends them again. Once the attempt is
+    submitted every batch is refused; with write-behind, answers buffered after the submit
+    are dropped when the buffer flushes (AnswerBuffer.flush).
+    """
+    data = request.json
+    aid, seq, changes = data['attempt_id'], int(data['seq']), data.get('changes', [])
+    if 'user_id' not in session or attempt_owner(aid) != session['user_id']: return "Denied", 403
+    if not accepting_answers(aid): return time_up()
+    if state.answer_buffer:
+        ack, applied = state.answer_buffer.put_batch(aid, seq, changes)
+        return jsonify({'status': 'success', 'ack': ack, 'applied': applied})
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            # Claim the sequence number first; 0 rows means this batch is stale or a retry
+            cursor.execute("UPDATE Quiz_Attempts SET last_sync_seq=%s WHERE attempt_id=%s AND last_sync_seq < %s AND status='In-Progress'", (seq, aid, seq))
+            if cursor.rowcount == 0:
+                cursor.execute("SELECT last_sync_seq, status FROM Quiz_Attempts WHERE attempt_id=%s", (aid,))
+                row = cursor.fetchone()
+                if row and row['status'] != 'In-Progress': return already_submitted()
+                return jsonify({'status': 'success', 'ack': row['last_sync_seq'] if row else 0, 'applied': False})
+            if changes:
+                # option may be null for flag-only changes; keep the stored answer then
+                cursor.executemany(UPSERT_SQL,
+                                   [(aid, c['question_id'], c.get('option'), 1 if c.get('is_flagged') else 0) for c in changes])
+        conn.commit()
+    finally:
+        conn.close()
+    return jsonify({'status': 'success', 'ack': seq, 'applied': True})
+
+@bp.route('/api/submit_quiz', methods=['POST'])
+def submit_quiz():
+    aid = request.json['attempt_id']
+    if state.answer_buffer: state.answer_buffer.flush(aid)  # score must see every acknowledged answer
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT quiz_id, user_id, status, total_score FROM Quiz_Attempts WHERE attempt_id=%s", (aid,))
+        attempt = cursor.fetchone()
+        if attempt and attempt['status'] == 'Completed':
+            # Double submit (e.g. timer + button): keep the recorded score, don't count it twice
+            conn.close()
+            return jsonify({'score': float(attempt['total_score'])})
+        score = score_attempt(cursor, aid)
+        if score is None:
+            # Finalized concurrently (sweeper or another tab) after the check above
+            conn.commit()
+            cursor.execute("SELECT total_score FROM Quiz_Attempts WHERE attempt_id=%s", (aid,))
+            row = cursor.fetchone()
+            conn.close()
+            return jsonify({'score': float(row['total_score']) if row else 0})
+        if attempt: aggregates.record_submission(cursor, attempt['quiz_id'], attempt['user_id'], aid, score)
+        conn.commit()
+        completed = aggregates.completed_count(cursor, attempt['quiz_id']) if attempt else 0
+    conn.close()
+    events.publish(f"attempt:{aid}", 'finished', {'attempt_id': aid})  # closes the exam in other tabs
+    if attempt: events.publish('submissions', 'submission', {'quiz_id': attempt['quiz_id'], 'completed': completed})
+    return jsonify({'score': score})
+
+@bp.route('/api/run_code', methods=['POST'])
+def run_code():
+    data = request.json
+    # Runs code on this host, so only for the student taking the attempt
+    if 'user_id' not in session or attempt_owner(data['attempt_id']) != session['user_id']: return "Denied", 403
+    if not accepting_answers(data['attempt_id']): return time_up()
+    try:
+        # Graded against the question's stored test cases; client-sent expectations are ignored
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            tests = code_grading.load_tests(cursor, data['question_id'])
+        if not tests: return jsonify({'status': 'error', 'output': 'Unknown question'})
+        teardown_db()  # no pooled connection is held while the code runs
+        result = code_grading.grade(get_executor(current_app.config['CODE_EXECUTOR']), data['question_id'], tests, data.get('code'), user_id=session['user_id'])
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            # The attempt may have been submitted while the code ran
+            if not lock_open_attempt(cursor, data['attempt_id']): return already_submitted()
+            code_grading.record(cursor, data['attempt_id'], data['question_id'], result)
+            conn.commit()
+        conn.close()
+        return jsonify({'status': 'success', 'output': result['output'], 'is_correct': result['is_correct'],
+                        'passed': result['passed'], 'total': result['total'], 'tests': result['tests'], 'cached': result['cached']})
+    except ExecutorBusy as e: return jsonify({'status': 'error', 'output': str(e)}), 429
+    except Exception as e: return jsonify({'status': 'error', 'output': str(e)})
+
+# --- LIVE UPDATES ---
+@bp.route('/api/events')
+def poll_events():
+    """
+    Live updates, polled (see events.py). ?since=<cursor> returns the events after it on
+    the caller's topics: 'announcement', 'quizzes' for the student dashboard, 'finished'
+    for ?attempt_id= and, for staff, 'submission' counts, waiting up to events.WAIT
+    seconds for one. Without `since` it answers at once with the current cursor. Every
+    reply carries the server clock (with ?attempt_id= also the seconds left) and the
+    delay before the next poll.
+    """
+    role = session.get('role')
+    if not role: return "Denied", 403
+    topics = {'announcements'}
+    if role == 'Student' and not request.args.get('attempt_id'): topics.add('quizzes')
+    if role in ['Admin', 'Coordinator']: topics.add('submissions')
+
+    clock = {'server_time': time.time()}
+    attempt_id = request.args.get('attempt_id', type=int)
+    if attempt_id:
+        if attempt_owner(attempt_id) != session.get('user_id'): return "Denied", 403
+        topics.add(f"attempt:{attempt_id}")
+    # The wait below needs no database; hand the request's connection back first
+    teardown_db()
+
+    since = request.args.get('since', type=int)
+    if since is None: found, cursor = [], events.broker.last_id
+    else: found, cursor = events.broker.wait(since, topics)
+    clock['server_time'] = time.time()
+    if attempt_id:
+        deadline = attempt_deadline(attempt_id)
+        clock['remaining'] = max(0, int(deadline - time.time())) if deadline else None
+    return jsonify({'cursor': cursor, 'events': [{'event': e, 'data': d} for e, d in found],
+                    'clock': clock, 'retry_ms': events.RETRY_MS})
+
+@bp.route('/api/leaderboard/<int:quiz_id>')
+def leaderboard(quiz_id):
+    if 'user_id' not in session: return redirect('/')
+    n = min(request.args.get('n', 10, type=int), 100)
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        top = aggregates.top_n(cursor, quiz_id, n)
+        hist = aggregates.histogram(cursor, quiz_id)
+    conn.close()
+    return jsonify({'quiz_id': quiz_id, 'top': top, 'histogram': hist})
@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize=128, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}  # key -> lock, so concurrent misses run the loader once
+        self._generation = 0  # bumped on invalidation so in-flight loads don't store stale data
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None: del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        """
+        Returns the cached value, calling loader() and caching its result on a miss.
+        Concurrent misses for the same key wait for a single loader() call.
+        """
+        value = self.get(key)
+        if value is not None: return value
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                item = self._data.get(key)
+            if item is not None and item[0] >= time.monotonic():
+                # Another thread loaded it while we waited; count it as a hit
+                with self._lock:
+                    self.misses -= 1
+                    self.hits += 1
+                return item[1]
+            generation = self._generation
+            value = loader()
+            if value is not None and generation == self._generation: self.set(key, value)
+        with self._lock:
+            self._loading.pop(key, None)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def metrics(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'size': len(self._data), 'maxsize': self.maxsize, 'ttl': self.ttl,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'hit_ratio': round(self.hits / total, 4) if total else 0.0}
@@ -0,0 +1,87 @@
+"""
+Bulk certificate rendering.
+
+render_quiz_certificates() approves every completed attempt of a quiz and renders all of their
+certificates across a process pool (ReportLab + qrcode are CPU-bound, so threads
+would serialise on the GIL). The batch is rendered into a directory of its own, so the
+certificate cache's eviction can't delete files before they are packed; optionally it
+is packed into a ZIP and/or a single merged PDF for printing, and the PDFs are then
+moved into the regular certificate cache, so later /download/cert requests are
+served from disk.
+"""
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from database import get_db_connection
+from certificate_generator import export_certificate, cache_certificates, generate_merged_pdf
+
+EXPORT_DIR = "cert_exports"
+MAX_WORKERS = os.cpu_count() or 2
+# spawn, not fork: the web process is multi-threaded and fork would copy held locks.
+# Children only import certificate_generator (plus the guarded main module), so starting
+# one never builds an app or starts job workers and a sweeper of its own.
+_mp = multiprocessing.get_context('spawn')
+
+def member_name(attempt_id, full_name):
+    """ZIP entry for one certificate; the name is reduced to characters safe in a file name."""
+    safe = re.sub(r'[^\w-]+', '_', str(full_name or '')).strip('_')[:80]
+    return f"Certificate_{attempt_id}_{safe or 'student'}.pdf"
+
+def render_quiz_certificates(quiz_id, make_zip=False, merged=False, progress=None):
+    """
+    Approves and renders every completed attempt's certificate for a quiz.
+    Runs as the 'bulk_certs' background job; `progress(done, total)` reports status.
+    Returns the paths of any ZIP / merged PDF produced.
+    """
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        cursor.execute("UPDATE Quiz_Attempts SET certificate_approved=1 WHERE quiz_id=%s AND status='Completed'", (quiz_id,))
+        conn.commit()
+        cursor.execute("""SELECT a.attempt_id, u.full_name, q.title, a.total_score FROM Quiz_Attempts a
+                          JOIN Users u ON a.user_id=u.user_id JOIN Quizzes q ON a.quiz_id=q.quiz_id
+                          WHERE a.quiz_id=%s AND a.status='Completed' ORDER BY a.attempt_id""", (quiz_id,))
+        rows = cursor.fetchall()
+    conn.close()
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    work = [(r['full_name'], r['title'], int(r['total_score']), today, r['attempt_id']) for r in rows]
+    if progress: progress(0, len(work))
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    tag = time.strftime("%Y%m%d%H%M%S")
+    batch_dir = tempfile.mkdtemp(prefix=f"quiz_{quiz_id}_{tag}_", dir=EXPORT_DIR)
+    try:
+        paths, failed = {}, 0
+        with ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=_mp) as pool:
+            futures = {pool.submit(export_certificate, os.path.join(batch_dir, f"{args[4]}.pdf"), *args): args[4] for args in work}
+            for f in as_completed(futures):
+                try:
+                    paths[futures[f]] = f.result()
+                except Exception as e:
+                    print(f"Cert Render Error: {e}")
+                    failed += 1
+                if progress: progress(len(paths) + failed, len(work))
+
+        result = {'total': len(work), 'rendered': len(paths), 'failed': failed}
+        if make_zip:
+            zip_path = os.path.abspath(os.path.join(EXPORT_DIR, f"quiz_{quiz_id}_{tag}.zip"))
+            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_STORED) as zf:  # PDFs are already compressed
+                for args in work:
+                    if args[4] in paths: zf.write(paths[args[4]], member_name(args[4], args[0]))
+            result['zip'] = zip_path
+        if merged:
+            merged_path = os.path.abspath(os.path.join(EXPORT_DIR, f"quiz_{quiz_id}_{tag}_print.pdf"))
+            with ProcessPoolExecutor(max_workers=1, mp_context=_mp) as pool:
+                pool.submit(generate_merged_pdf, merged_path, work).result()
+            result['merged'] = merged_path
+        try: cache_certificates([(paths[args[4]], args) for args in work if args[4] in paths])
+        except Exception as e: print(f"Cert Cache Error: {e}")  # the exports are done; warming the cache is a bonus
+    finally:
+        shutil.rmtree(batch_dir, ignore_errors=True)
+    return result
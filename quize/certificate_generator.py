@@ -7,9 +7,35 @@ from reportlab.pdfbase.ttfonts import TTFont
 import io
 import qrcode
 import os
+import hashlib
+import shutil
+import threading
+import time
+try:
+    import fcntl
+except ImportError:  # Windows: eviction is only serialised within a process
+    fcntl = None
+
+# Bump when the layout changes so cached PDFs are re-rendered
+TEMPLATE_VERSION = 1
+CERT_CACHE_DIR = "cert_cache"
+CERT_CACHE_MAX_BYTES = 200 * 1024 * 1024
+CERT_CACHE_LOW_WATER = 0.8  # eviction trims the cache to this share of the limit
+CERT_CACHE_RESCAN = 300     # seconds before the size estimate is re-read from disk
+
+_fonts = None
+_images = {}
+_cache_lock = threading.Lock()
+# This process's running estimate of the cache size (None until the first scan). Other
+# processes' additions only show up at the next scan, so the limit is a soft one.
+_cache_bytes = None
+_scanned_at = 0.0
 
 def register_fonts():
     """Attempts to register custom stylish fonts. Falls back to standard if not found."""
+    # TTF parsing is expensive; do it once per process
+    global _fonts
+    if _fonts is not None: return _fonts
     fonts = {
         "Cursive": "GreatVibes-Regular.ttf",  # Heading
         "Serif": "PlayfairDisplay-Bold.ttf", # Name
@@ -29,8 +55,15 @@ def register_fonts():
                 else: registered[name] = "Helvetica"
         except:
             registered[name] = "Helvetica"
+    _fonts = registered
     return registered
 
+def load_image(filename):
+    """Returns a cached ImageReader for a static asset, or None if the file is missing."""
+    if filename not in _images:
+        _images[filename] = ImageReader(filename) if os.path.exists(filename) else None
+    return _images[filename]
+
 def draw_modern_border(c, width, height):
     """Draws a sophisticated side-accent modern border."""
     # 1. Main Background Stroke
@@ -63,6 +96,21 @@ def draw_modern_border(c, width, height):
 def generate_certificate_pdf(student_name, course_name, score, date, attempt_id, cert_type="Completion"):
     buffer = io.BytesIO()
     c = canvas.Canvas(buffer, pagesize=landscape(letter))
+    draw_certificate(c, student_name, course_name, score, date, attempt_id, cert_type)
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+def generate_merged_pdf(path, certificates):
+    """Writes one multi-page PDF (one certificate per page) for printing.
+    `certificates` is an iterable of generate_certificate_pdf argument tuples."""
+    c = canvas.Canvas(path, pagesize=landscape(letter))
+    for args in certificates:
+        draw_certificate(c, *args)
+    c.save()
+
+def draw_certificate(c, student_name, course_name, score, date, attempt_id, cert_type="Completion"):
+    """Draws one certificate as the current page of canvas `c` and ends the page."""
     width, height = landscape(letter)
     
     # Register Fonts
@@ -142,13 +190,15 @@ def generate_certificate_pdf(student_name, course_name, score, date, attempt_id,
     
     # --- IMAGES (Signature, Stamp, QR) ---
     try:
-        if os.path.exists("signature.png"):
+        signature = load_image("signature.png")
+        if signature:
             # Adjusted position to sit on the line
-            c.drawImage("signature.png", width-280, footer_y, width=160, height=60, mask='auto')
+            c.drawImage(signature, width-280, footer_y, width=160, height=60, mask='auto')
             
-        if os.path.exists("stamp.png"):
+        stamp = load_image("stamp.png")
+        if stamp:
             # Stamp centered at bottom
-            c.drawImage("stamp.png", width/2 - 50, 40, width=100, height=100, mask='auto')
+            c.drawImage(stamp, width/2 - 50, 40, width=100, height=100, mask='auto')
             
         # QR Code (Verification)
         verify_url = f"http://127.0.0.1:5000/verify/{attempt_id}"
@@ -166,6 +216,94 @@ def generate_certificate_pdf(student_name, course_name, score, date, attempt_id,
         print(f"Image Error: {e}")
     
     c.showPage()
-    c.save()
-    buffer.seek(0)
-    return buffer
\ No newline at end of file
+
+def cache_path(student_name, course_name, score, attempt_id, cert_type="Completion"):
+    """
+    Where a certificate lives in the cache. Files are content-addressed by everything
+    printed on the certificate (except the issue date, which stays as first rendered)
+    plus TEMPLATE_VERSION.
+    """
+    key = f"{attempt_id}|{student_name}|{course_name}|{score}|{cert_type}|{TEMPLATE_VERSION}"
+    return os.path.abspath(os.path.join(CERT_CACHE_DIR, hashlib.sha256(key.encode('utf-8')).hexdigest() + ".pdf"))
+
+def write_certificate(path, student_name, course_name, score, date, attempt_id, cert_type="Completion"):
+    """Renders a certificate to `path`."""
+    pdf = generate_certificate_pdf(student_name, course_name, score, date, attempt_id, cert_type)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(pdf.getvalue())
+    os.replace(tmp, path)  # atomic: readers never see a half-written PDF
+
+def get_certificate_path(student_name, course_name, score, date, attempt_id, cert_type="Completion"):
+    """Returns the path of a rendered certificate, rendering it only on a cache miss."""
+    path = cache_path(student_name, course_name, score, attempt_id, cert_type)
+    try:
+        os.utime(path)  # mark as recently used for eviction
+        return path
+    except FileNotFoundError:
+        pass  # never rendered, or just evicted by another process
+
+    os.makedirs(CERT_CACHE_DIR, exist_ok=True)
+    write_certificate(path, student_name, course_name, score, date, attempt_id, cert_type)
+    _added(os.path.getsize(path))
+    return path
+
+def export_certificate(path, student_name, course_name, score, date, attempt_id, cert_type="Completion"):
+    """
+    Writes a certificate to `path`, outside the cache (bulk exports), copying the
+    cached PDF when there is one. Returns `path`.
+    """
+    try:
+        shutil.copyfile(cache_path(student_name, course_name, score, attempt_id, cert_type), path)
+    except FileNotFoundError:
+        write_certificate(path, student_name, course_name, score, date, attempt_id, cert_type)
+    return path
+
+def cache_certificates(exported):
+    """
+    Moves exported certificates into the cache (skipping ones already there), then
+    trims it once. `exported` is [(path, get_certificate_path argument tuple), ...].
+    """
+    os.makedirs(CERT_CACHE_DIR, exist_ok=True)
+    added = 0
+    for path, (student_name, course_name, score, date, attempt_id, *rest) in exported:
+        target = cache_path(student_name, course_name, score, attempt_id, *rest)
+        if os.path.exists(target): continue
+        added += os.path.getsize(path)
+        shutil.move(path, target)
+    _added(added)
+
+def _added(size):
+    """Counts a write against the size estimate; scans and evicts only once it is over the limit (or stale)."""
+    global _cache_bytes
+    with _cache_lock:
+        if _cache_bytes is not None: _cache_bytes += size
+        due = (_cache_bytes is None or _cache_bytes > CERT_CACHE_MAX_BYTES
+               or time.monotonic() - _scanned_at > CERT_CACHE_RESCAN)
+    if due: evict_cache()
+
+def evict_cache(max_bytes=None):
+    """
+    Scans the cache and, if it is over max_bytes, deletes least recently used
+    certificates until it is down to CERT_CACHE_LOW_WATER of that, so the next scan is
+    many renders away. Processes sharing the cache take turns through a lock file.
+    """
+    global _cache_bytes, _scanned_at
+    max_bytes = CERT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    os.makedirs(CERT_CACHE_DIR, exist_ok=True)
+    with _cache_lock, open(os.path.join(CERT_CACHE_DIR, '.evict.lock'), 'a') as lock:
+        if fcntl: fcntl.flock(lock, fcntl.LOCK_EX)
+        entries = []
+        for e in os.scandir(CERT_CACHE_DIR):
+            if not e.name.endswith('.pdf'): continue
+            try: st = e.stat()
+            except FileNotFoundError: continue
+            entries.append((st.st_mtime, st.st_size, e.path))
+        total = sum(size for _, size, _ in entries)
+        if total > max_bytes:
+            for _, size, path in sorted(entries):
+                if total <= max_bytes * CERT_CACHE_LOW_WATER: break
+                try: os.remove(path)
+                except OSError: continue
+                total -= size
+        _cache_bytes, _scanned_at = total, time.monotonic()
\ No newline at end of file
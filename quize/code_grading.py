@@ -0,0 +1,89 @@
+"""
+Server-side grading of CODE questions against multiple test cases.
+
+A question's test cases are its visible sample (Questions.test_input/test_output)
+plus any hidden rows in Question_Tests. Results are cached per
+(question_id, tests digest, normalized source digest), so pressing Run again on
+unchanged code returns instantly without touching the executor. One Run spends at most
+RUN_BUDGET seconds of wall time across all its test cases, queueing for the executor
+included, so a slow submission can't hold a request thread for test count x timeout.
+"""
+import hashlib
+import json
+import time
+from cache import TTLCache
+from database import backend
+
+RUN_BUDGET = 10  # seconds one Run may spend across all of its test cases
+
+TESTS_SQL = "SELECT input, expected_output FROM Question_Tests WHERE question_id=%s ORDER BY position, test_id"
+
+tests_cache = TTLCache(maxsize=512, ttl=300)
+results_cache = TTLCache(maxsize=5000, ttl=1800)
+
+def normalize_source(code):
+    """Ignores edits that can't change behaviour: line endings, trailing spaces, blank tail."""
+    lines = (code or '').replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip('\n')
+
+def normalize_output(text):
+    return '\n'.join(line.rstrip() for line in (text or '').replace('\r\n', '\n').split('\n')).strip()
+
+def load_tests(cursor, question_id):
+    """Returns {'digest', 'tests': [{'input', 'expected', 'hidden'}]} for a question (cached)."""
+    def load():
+        cursor.execute("SELECT test_input, test_output FROM Questions WHERE question_id=%s", (question_id,))
+        q = cursor.fetchone()
+        if not q: return None
+        tests = []
+        if q['test_output'] is not None:
+            tests.append({'input': q['test_input'] or '', 'expected': q['test_output'], 'hidden': False})
+        cursor.execute(TESTS_SQL, (question_id,))
+        tests.extend({'input': t['input'] or '', 'expected': t['expected_output'] or '', 'hidden': True} for t in cursor.fetchall())
+        digest = hashlib.sha256(json.dumps(tests, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        return {'digest': digest, 'tests': tests}
+    return tests_cache.get_or_load(int(question_id), load)
+
+def invalidate(question_id=None):
+    if question_id: tests_cache.invalidate(int(question_id))
+    else: tests_cache.clear()
+
+def grade(executor, question_id, tests, code, user_id=None, budget=RUN_BUDGET):
+    """Runs `code` against the test cases within `budget` seconds; returns a result dict (possibly cached)."""
+    source = normalize_source(code)
+    key = (int(question_id), tests['digest'], hashlib.sha256(source.encode('utf-8')).hexdigest())
+    cached = results_cache.get(key)
+    if cached is not None: return dict(cached, cached=True)
+
+    results, output = [], ''
+    deadline = time.monotonic() + budget
+    for i, t in enumerate(tests['tests']):
+        left = deadline - time.monotonic()
+        if left <= 0:
+            output = output or f"Time limit for this run exceeded ({budget}s)"
+            break
+        res = executor.run(source, t['input'], user_id=user_id, timeout=left)
+        actual = normalize_output(res['stdout']) if res['status'] == 'ok' else (res['stderr'].strip() or 'Error')
+        passed = res['status'] == 'ok' and actual == normalize_output(t['expected'])
+        results.append({'passed': passed, 'status': res['status'], 'time': res.get('time', 0), 'hidden': t['hidden']})
+        if i == 0: output = actual
+        # Runtime errors/timeouts on one case say enough; skip burning CPU on the rest
+        if res['status'] != 'ok': break
+
+    total = len(tests['tests'])
+    result = {'is_correct': total > 0 and len(results) == total and all(r['passed'] for r in results),
+              'passed': sum(r['passed'] for r in results), 'total': total, 'tests': results, 'output': output}
+    if time.monotonic() < deadline: results_cache.set(key, result)  # a run cut short by the budget may pass next time
+    return dict(result, cached=False)
+
+RECORD_SQL = backend.upsert('Quiz_Responses', ('attempt_id', 'question_id', 'selected_option', 'test_results', 'run_time_ms'),
+                            ('attempt_id', 'question_id'),
+                            """selected_option=CASE WHEN selected_option='CODE_SUCCESS' THEN selected_option ELSE NEW(selected_option) END,
+                               test_results=NEW(test_results), run_time_ms=NEW(run_time_ms)""")
+
+def record(cursor, attempt_id, question_id, result):
+    """Stores the latest run's per-test timing; a success, once reached, is kept. Caller commits."""
+    summary = json.dumps([{'passed': r['passed'], 'status': r['status'], 'time': r['time']} for r in result['tests']])
+    run_ms = int(sum(r['time'] for r in result['tests']) * 1000)
+    option = 'CODE_SUCCESS' if result['is_correct'] else 'CODE_FAIL'
+    cursor.execute(RECORD_SQL, (attempt_id, question_id, option, summary, run_ms))
@@ -1,4 +1,10 @@
+import os
 import pymysql
+import threading
+import time
+from flask import g, has_app_context
+import instrumentation
+import storage
 
 # Configuration matches XAMPP default
 DB_CONFIG = {
@@ -9,9 +15,189 @@ DB_CONFIG = {
     'cursorclass': pymysql.cursors.DictCursor
 }
 
+# Storage backend: 'mysql' (default) or 'sqlite' (embedded file in WAL mode, see storage.py)
+DB_BACKEND = os.environ.get('QCMS_DB_BACKEND', 'mysql')
+SQLITE_PATH = os.environ.get('QCMS_SQLITE_PATH', 'qcms.sqlite3')
+
+# Pool sizing (tune to stay well under MySQL max_connections per worker)
+POOL_CONFIG = {
+    'min_size': 2,            # connections kept warm even when idle
+    'max_size': 20,           # hard cap on open connections per process
+    'checkout_timeout': 10,   # seconds to wait for a free connection
+    'idle_timeout': 300,      # close idle connections above min_size after this
+    'ping_after': 30,         # health-check connections idle longer than this
+}
+
+
+class PooledConnection:
+    """Thin wrapper so existing `conn.close()` calls hand the connection back to the pool."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._bound = False  # True when owned by the Flask app context
+        self.last_used = time.monotonic()
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args):
+        # Timed and counted while a request is being traced (see instrumentation.py)
+        return instrumentation.wrap_cursor(self._raw.cursor(*args))
+
+    def close(self):
+        # Request-bound connections are released once in teardown instead
+        if not self._bound:
+            self._pool.release(self)
+
+
+class ConnectionPool:
+    def __init__(self, backend, min_size=2, max_size=20, checkout_timeout=10, idle_timeout=300, ping_after=30):
+        self.backend = backend
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self._idle = []
+        self._open = 0
+        self._cond = threading.Condition()
+        self.stats = {'created': 0, 'recycled': 0, 'evicted': 0, 'checkouts': 0,
+                      'timeouts': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+
+    def _connect(self):
+        conn = PooledConnection(self, self.backend.connect())
+        with self._cond:
+            self.stats['created'] += 1
+        return conn
+
+    def _discard(self, conn):
+        try: conn._raw.close()
+        except Exception: pass
+
+    def _evict_idle(self, now):
+        # Oldest connections sit at the front of the idle list
+        while len(self._idle) > 0 and self._open > self.min_size and now - self._idle[0].last_used > self.idle_timeout:
+            self._discard(self._idle.pop(0))
+            self._open -= 1
+            self.stats['evicted'] += 1
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+        with self._cond:
+            while True:
+                self._evict_idle(time.monotonic())
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise TimeoutError("DB pool exhausted")
+                self._cond.wait(remaining)
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+        elif time.monotonic() - conn.last_used > self.ping_after:
+            # Health-check stale connections; replace if MySQL dropped them
+            try:
+                conn._raw.ping(reconnect=False)
+            except Exception:
+                self._discard(conn)
+                with self._cond:
+                    self.stats['recycled'] += 1
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+
+        waited = time.monotonic() - started
+        with self._cond:
+            self.stats['checkouts'] += 1
+            self.stats['wait_total'] += waited
+            self.stats['wait_max'] = max(self.stats['wait_max'], waited)
+        conn._bound = False
+        return conn
+
+    def release(self, conn):
+        try:
+            # Drop any uncommitted work so the next borrower starts clean
+            conn._raw.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+        with self._cond:
+            if healthy:
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+            else:
+                self._discard(conn)
+                self._open -= 1
+                self.stats['recycled'] += 1
+            self._cond.notify()
+
+    def warm(self):
+        """Opens connections up to min_size so the first requests skip the handshake."""
+        while True:
+            with self._cond:
+                if self._open >= self.min_size: return
+                self._open += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                raise
+            self.release(conn)
+
+    def metrics(self):
+        with self._cond:
+            checkouts = self.stats['checkouts']
+            return dict(self.stats,
+                        open=self._open, idle=len(self._idle), in_use=self._open - len(self._idle),
+                        max_size=self.max_size,
+                        wait_avg=round(self.stats['wait_total'] / checkouts, 6) if checkouts else 0.0)
+
+
+# Dialect helpers for SQL that differs between backends (backend.upsert, backend.add_seconds, backend.name)
+backend = storage.SQLiteBackend(SQLITE_PATH) if DB_BACKEND == 'sqlite' else storage.MySQLBackend(DB_CONFIG)
+pool = ConnectionPool(backend, **POOL_CONFIG)
+
+
 def get_db_connection():
     try:
-        return pymysql.connect(**DB_CONFIG)
+        if has_app_context():
+            # One checkout per request; released in teardown_db()
+            if 'db_conn' not in g:
+                g.db_conn = pool.acquire()
+                g.db_conn._bound = True
+            return g.db_conn
+        return pool.acquire()
     except Exception as e:
         print(f"--- DB ERROR: {e} ---")
-        return None
\ No newline at end of file
+        return None
+
+
+def teardown_db(exc=None):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        conn._bound = False
+        pool.release(conn)
+
+
+def init_app(app):
+    app.teardown_appcontext(teardown_db)
\ No newline at end of file
@@ -0,0 +1,152 @@
+"""
+Live updates for the browser, shared by every worker process.
+
+Routes publish after they commit a change (a submission, an announcement). publish()
+writes the event to the Events table; each process runs one poller thread
+(start_poller, from start_services) that reads new rows every POLL_INTERVAL seconds
+into an in-memory log, so every worker sees every event, whichever process (or cron
+run of sweeper.py) published it.
+
+Browsers fetch /api/events?since=<cursor>: a short long-poll that returns as soon as
+the log has something newer on the caller's topics, or after WAIT seconds, and the
+page asks again RETRY_MS later. A viewer holds a server thread for at most WAIT
+seconds per poll, not for as long as the page is open.
+
+Topics:
+    'announcements'    - announcement set/cleared (everyone)
+    'quizzes'          - sessions created/edited/deleted (student dashboards reload)
+    'submissions'      - live completed-attempt counts per quiz (Admin/Coordinator)
+    'attempt:<id>'     - the attempt was submitted (closes the exam in other tabs)
+
+Cursors are Events.event_id values, so they mean the same in every process. On MySQL
+an event whose INSERT commits after a later one's can be skipped by a poller that
+already read past it; the pages refresh on their own as well, so that only delays an
+update. Rows older than RETAIN seconds are deleted by the pollers.
+"""
+import json
+import threading
+import time
+from collections import deque
+from database import get_db_connection, backend
+
+POLL_INTERVAL = 1     # seconds between reads of the Events table per process
+POLL_BATCH = 500      # rows per read
+WAIT = 2              # seconds a poll waits for an event before answering empty
+RETRY_MS = 8000       # delay before the browser polls again (pages add up to 25% jitter)
+LOG_SIZE = 1000       # events kept in memory per process for polls to catch up from
+RETAIN = 3600         # seconds an event stays in the table
+PRUNE_EVERY = 300     # seconds between deletes of expired rows
+
+PUBLISH_SQL = "INSERT INTO Events (topic, event, data, created_at) VALUES (%s, %s, %s, NOW())"
+POLL_SQL = "SELECT event_id, topic, event, data FROM Events WHERE event_id > %s ORDER BY event_id LIMIT %s"
+PRUNE_SQL = f"DELETE FROM Events WHERE created_at < {backend.add_seconds('NOW()', '%s')}"
+
+
+class Broker:
+    """This process's copy of the recent events, and the polls waiting on it."""
+
+    def __init__(self, size=LOG_SIZE):
+        self._cond = threading.Condition()
+        self._log = deque(maxlen=size)  # (event_id, topic, event, data), oldest first
+        self.last_id = 0
+        self.stats = {'received': 0, 'polls': 0, 'delivered': 0, 'waiting': 0}
+
+    def add(self, rows):
+        """Appends events read from the table (in event_id order) and wakes the waiting polls."""
+        with self._cond:
+            for row in rows:
+                if row[0] <= self.last_id: continue
+                self._log.append(row)
+                self.last_id = row[0]
+                self.stats['received'] += 1
+            self._cond.notify_all()
+
+    def _since(self, cursor, topics):
+        return [(event, data) for event_id, topic, event, data in self._log if event_id > cursor and topic in topics]
+
+    def wait(self, cursor, topics, timeout=WAIT):
+        """
+        Events on `topics` after `cursor`, waiting up to `timeout` seconds for one to arrive.
+        Returns ([(event, data), ...], cursor to poll from next).
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self.stats['waiting'] += 1
+            try:
+                while True:
+                    found = self._since(cursor, topics)
+                    left = deadline - time.monotonic()
+                    if found or left <= 0: break
+                    self._cond.wait(left)
+            finally:
+                self.stats['waiting'] -= 1
+            self.stats['polls'] += 1
+            self.stats['delivered'] += len(found)
+            # A cursor from a process that is ahead of this one is kept, not moved back
+            return found, max(cursor, self.last_id)
+
+    def metrics(self):
+        with self._cond:
+            return dict(self.stats, last_id=self.last_id, log=len(self._log))
+
+
+broker = Broker()
+_wake = threading.Event()
+_started = False
+_start_lock = threading.Lock()
+
+def publish(topic, event, data):
+    """Records an event for every process. Call after the change it announces is committed."""
+    conn = get_db_connection()
+    if conn is None: return
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(PUBLISH_SQL, (topic, event, json.dumps(data, default=str)))
+        conn.commit()
+    except Exception as e:
+        print(f"Events Error: {e}")  # a lost live update must not fail the request that caused it
+    finally:
+        conn.close()
+    _wake.set()  # this process's poller picks it up now instead of on its next tick
+
+def poll_once(cursor):
+    """Reads the next batch of new events into the broker; returns how many were read."""
+    cursor.execute(POLL_SQL, (broker.last_id, POLL_BATCH))
+    rows = [(r['event_id'], r['topic'], r['event'], json.loads(r['data'] or 'null')) for r in cursor.fetchall()]
+    broker.add(rows)
+    return len(rows)
+
+def _loop(interval):
+    pruned = time.monotonic()
+    while True:
+        _wake.wait(interval)
+        _wake.clear()
+        conn = get_db_connection()
+        if conn is None: continue
+        try:
+            with conn.cursor() as cursor:
+                while poll_once(cursor) == POLL_BATCH: pass
+                if time.monotonic() - pruned > PRUNE_EVERY:
+                    cursor.execute(PRUNE_SQL, (-RETAIN,))
+                    pruned = time.monotonic()
+            conn.commit()
+        except Exception as e:
+            print(f"Events Error: {e}")
+        finally:
+            conn.close()
+
+def start_poller(interval=POLL_INTERVAL):
+    """Starts this process's poller (idempotent); events published before it started are not replayed."""
+    global _started
+    with _start_lock:
+        if _started: return
+        _started = True
+    conn = get_db_connection()
+    if conn is not None:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT COALESCE(MAX(event_id), 0) AS last_id FROM Events")
+                broker.last_id = max(broker.last_id, cursor.fetchone()['last_id'])
+        finally:
+            conn.close()
+    threading.Thread(target=_loop, args=(interval,), name='event-poller', daemon=True).start()
@@ -0,0 +1,254 @@
+"""
+Code execution backends for /api/run_code.
+
+LocalExecutor keeps a pool of pre-started ("warm") Python interpreters. Each one isolates
+itself before it accepts code: an empty network namespace, a chroot into an empty
+read-only directory, no privileges (as `sandbox_user`, default nobody, when the server
+runs as root, otherwise as the server user inside a user namespace with every capability
+dropped) and resource limits (CPU, memory, file size, no child processes). If the kernel
+cannot provide the namespaces, the interpreter exits and runs fail (use 'piston' there).
+Only posix hosts are supported. A submission is handed to one warm interpreter, which runs it once and exits;
+a replacement is started in the background, so every run gets a fresh process without
+paying interpreter start-up on the request path.
+
+The isolation happens in the interpreter itself (BOOTSTRAP), not in a preexec_fn: the
+server is multi-threaded, and running Python between fork and exec there can deadlock.
+
+PistonExecutor is the original remote backend, now with a pooled HTTP session and
+timeouts.
+"""
+import atexit
+import json
+import os
+import queue
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+# Runs as the sandboxed interpreter (argv: jail, uid, gid, cpu seconds, memory bytes) while
+# it is still single-threaded. Loads the modules a submission may import, moves into new
+# namespaces, locks itself into the empty, read-only jail directory, gives up its
+# privileges, applies the resource limits, then blocks sockets, process creation, signals
+# and writes via an audit hook before reading {"code", "stdin"} from its stdin and
+# executing the code.
+BOOTSTRAP = r'''
+import io, json, os, sys, ctypes, resource
+import array, bisect, collections, copy, datetime, decimal, fractions, functools, heapq, itertools
+import math, operator, random, re, statistics, string, textwrap, traceback
+jail, uid, gid, cpu, memory = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4]), int(sys.argv[5])
+libc = ctypes.CDLL(None, use_errno=True)
+CLONE_NEWUSER, CLONE_NEWNET = 0x10000000, 0x40000000
+if uid >= 0:
+    if libc.unshare(CLONE_NEWNET) != 0: sys.exit("sandbox: cannot create a network namespace")
+else:
+    # Not root: a user namespace, in which we are root (so chroot works) mapped to the server user
+    outer_uid, outer_gid = os.geteuid(), os.getegid()
+    if libc.unshare(CLONE_NEWUSER | CLONE_NEWNET) != 0: sys.exit("sandbox: cannot create user/network namespaces")
+    for path, line in (("/proc/self/setgroups", "deny"), ("/proc/self/uid_map", f"0 {outer_uid} 1"), ("/proc/self/gid_map", f"0 {outer_gid} 1")):
+        with open(path, "w") as f: f.write(line)
+os.chroot(jail)
+os.chdir("/")
+if uid >= 0:
+    os.setgroups([]); os.setgid(gid); os.setuid(uid)
+else:
+    # root of our own user namespace only: drop every capability (capset v3, all sets empty)
+    header, data = (ctypes.c_uint32 * 2)(0x20080522, 0), (ctypes.c_uint32 * 6)()
+    if libc.capset(header, data) != 0: sys.exit("sandbox: cannot drop capabilities")
+# CPU: SIGXCPU at the soft limit (reported as a timeout), SIGKILL a second later
+resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+for limit, value in ((resource.RLIMIT_AS, memory), (resource.RLIMIT_FSIZE, 1024 * 1024), (resource.RLIMIT_NPROC, 0), (resource.RLIMIT_CORE, 0)):
+    resource.setrlimit(limit, (value, value))
+BLOCKED = ('socket.', 'subprocess.', 'os.system', 'os.exec', 'os.posix_spawn', 'os.fork', 'os.spawn', 'os.kill', 'os.killpg',
+           'signal.', 'pty.', 'ctypes.', 'resource.', 'os.chmod', 'os.chown', 'os.remove', 'os.rename', 'os.rmdir', 'os.mkdir',
+           'os.symlink', 'os.link')
+WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_APPEND | os.O_TRUNC
+def _guard(event, args):
+    if event.startswith(BLOCKED): raise PermissionError(f"{event} is not allowed")
+    if event == "open" and ((isinstance(args[1], str) and set(args[1]) & set("wax+")) or (args[2] or 0) & WRITE_FLAGS):
+        raise PermissionError("writing files is not allowed")
+sys.addaudithook(_guard)
+job = json.loads(sys.stdin.read())
+sys.stdin = io.StringIO(job.get("stdin") or "")
+exec(compile(job["code"], "<submission>", "exec"), {"__name__": "__main__"})
+'''
+
+class ExecutorBusy(Exception):
+    """Raised when the queue is full, a user is over their concurrency cap, or no slot frees up in time."""
+
+
+def _sandbox_ids(user):
+    """(uid, gid) the interpreters drop to; (-1, -1) when the server isn't root and can't switch users."""
+    if os.geteuid() != 0: return -1, -1
+    import pwd
+    entry = pwd.getpwnam(user)
+    if entry.pw_uid == 0: raise ValueError("the sandbox user must not be root")
+    return entry.pw_uid, entry.pw_gid
+
+def _make_jail():
+    """Empty directory the interpreters chroot into; mode 0555 so nothing can be written there."""
+    jail = tempfile.mkdtemp(prefix='qcms-sandbox-')
+    os.chmod(jail, 0o555)
+    atexit.register(os.rmdir, jail)
+    return jail
+
+
+class LocalExecutor:
+    def __init__(self, workers=None, wall_timeout=5, cpu_seconds=3, memory_mb=256,
+                 max_queue=200, per_user=2, max_output=64 * 1024, sandbox_user='nobody'):
+        if os.name != 'posix': raise RuntimeError("The local executor needs Linux namespaces; use CODE_EXECUTOR='piston'")
+        self.uid, self.gid = _sandbox_ids(sandbox_user)
+        self.jail = _make_jail()
+        self.workers = workers or os.cpu_count() or 2
+        self.wall_timeout = wall_timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_mb * 1024 * 1024
+        self.max_queue = max_queue
+        self.per_user = per_user
+        self.max_output = max_output
+        self._warm = queue.Queue()
+        self._slots = threading.Semaphore(self.workers)
+        self._lock = threading.Lock()
+        self._user_running = {}
+        self._waiting = 0
+        self._running = 0
+        self._latencies = deque(maxlen=1000)
+        self.stats = {'runs': 0, 'timeouts': 0, 'errors': 0, 'rejected': 0}
+        for _ in range(self.workers): self._spawn()
+
+    def _spawn(self):
+        proc = subprocess.Popen(
+            [sys.executable, '-I', '-S', '-c', BOOTSTRAP, self.jail, str(self.uid), str(self.gid),
+             str(self.cpu_seconds), str(self.memory_bytes)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            cwd=self.jail, env={'LANG': 'C.UTF-8'})
+        self._warm.put(proc)
+
+    def _replace(self):
+        try: self._spawn()
+        except Exception as e: print(f"Executor Error: {e}")  # _take gives up after wall_timeout
+
+    def _take(self, timeout):
+        while True:
+            try: proc = self._warm.get(timeout=timeout)
+            except queue.Empty:
+                threading.Thread(target=self._replace, daemon=True).start()
+                raise RuntimeError("No sandboxed interpreter available")
+            if proc.poll() is None: return proc
+            threading.Thread(target=self._replace, daemon=True).start()
+            # Died while idle: killed by the OS, or the sandbox could not be set up
+            err = proc.stderr.read().decode('utf-8', 'replace').strip()
+            if proc.returncode > 0 and err: raise RuntimeError(f"Sandbox failed to start: {err.splitlines()[-1]}")
+
+    def run(self, code, stdin='', user_id=None, timeout=None):
+        """
+        Runs `code` once in a fresh interpreter. `timeout` caps the seconds this call may take
+        in total, waiting for a free slot included (ExecutorBusy if none frees up in time);
+        without it the run itself is limited to wall_timeout and the wait is unbounded.
+        """
+        with self._lock:
+            if self._waiting >= self.max_queue or (user_id is not None and self._user_running.get(user_id, 0) >= self.per_user):
+                self.stats['rejected'] += 1
+                raise ExecutorBusy("Too many runs in progress, try again shortly")
+            self._waiting += 1
+            if user_id is not None: self._user_running[user_id] = self._user_running.get(user_id, 0) + 1
+
+        queued = time.monotonic()
+        try:
+            if not self._slots.acquire(timeout=timeout):
+                with self._lock:
+                    self._waiting -= 1
+                    self.stats['rejected'] += 1
+                raise ExecutorBusy("Too many runs in progress, try again shortly")
+            try:
+                with self._lock:
+                    self._waiting -= 1
+                    self._running += 1
+                started = time.monotonic()
+                limit = self.wall_timeout if timeout is None else max(0.1, min(self.wall_timeout, queued + timeout - started))
+                try:
+                    result = self._execute(code, stdin, limit)
+                finally:
+                    with self._lock: self._running -= 1
+            finally:
+                self._slots.release()
+            finished = time.monotonic()
+            result['time'] = round(finished - started, 4)
+            with self._lock:
+                self._latencies.append((started - queued, finished - queued))
+                self.stats['runs'] += 1
+                if result['status'] == 'timeout': self.stats['timeouts'] += 1
+                if result['status'] == 'error': self.stats['errors'] += 1
+            return result
+        finally:
+            if user_id is not None:
+                with self._lock:
+                    self._user_running[user_id] -= 1
+                    if not self._user_running[user_id]: del self._user_running[user_id]
+
+    def _execute(self, code, stdin, limit):
+        started = time.monotonic()
+        proc = self._take(limit)
+        threading.Thread(target=self._replace, daemon=True).start()  # replace it off the request path
+        payload = json.dumps({'code': code or '', 'stdin': stdin or ''})
+        try:
+            out, err = proc.communicate(payload.encode('utf-8'), timeout=max(0.1, started + limit - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            return {'status': 'timeout', 'stdout': '', 'stderr': f"Time limit exceeded ({round(limit, 1)}s)"}
+        if proc.returncode == -signal.SIGXCPU:
+            return {'status': 'timeout', 'stdout': '', 'stderr': f"CPU time limit exceeded ({self.cpu_seconds}s)"}
+        status = 'ok' if proc.returncode == 0 else 'error'
+        return {'status': status,
+                'stdout': out[:self.max_output].decode('utf-8', 'replace'),
+                'stderr': err[:self.max_output].decode('utf-8', 'replace')}
+
+    def metrics(self):
+        with self._lock:
+            waits = sorted(w for w, _ in self._latencies)
+            totals = sorted(t for _, t in self._latencies)
+            pct = lambda xs, p: round(xs[min(len(xs) - 1, int(p * len(xs)))], 4) if xs else 0.0
+            return dict(self.stats, backend='local', workers=self.workers, queue_depth=self._waiting, running=self._running,
+                        warm=self._warm.qsize(), wait_p50=pct(waits, 0.5), wait_p95=pct(waits, 0.95),
+                        latency_p50=pct(totals, 0.5), latency_p95=pct(totals, 0.95))
+
+
+class PistonExecutor:
+    URL = 'https://emkc.org/api/v2/piston/execute'
+
+    def __init__(self, timeout=15):
+        import requests
+        self.timeout = timeout
+        self.session = requests.Session()  # keep-alive across runs
+        self.stats = {'runs': 0, 'errors': 0}
+
+    def run(self, code, stdin='', user_id=None, timeout=None):
+        payload = {"language": "python", "version": "3.10.0", "files": [{"content": code}], "stdin": stdin}
+        started = time.monotonic()
+        res = self.session.post(self.URL, json=payload, timeout=(3, min(self.timeout, timeout or self.timeout))).json()
+        self.stats['runs'] += 1
+        run = res.get('run')
+        if not run:
+            self.stats['errors'] += 1
+            return {'status': 'error', 'stdout': '', 'stderr': res.get('message', 'Error'), 'time': 0}
+        return {'status': 'ok' if run.get('code', 0) == 0 else 'error', 'stdout': run.get('stdout', ''),
+                'stderr': run.get('stderr', ''), 'time': round(time.monotonic() - started, 4)}
+
+    def metrics(self):
+        return dict(self.stats, backend='piston')
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor(backend='local'):
+    """Process-wide executor, created on first use so workers only spawn when needed."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = PistonExecutor() if backend == 'piston' else LocalExecutor()
+        return _executor
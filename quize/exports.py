@@ -0,0 +1,109 @@
+"""
+Streaming results export.
+
+Rows are read through unbuffered (server-side) cursors and written to the client in
+chunks, so memory stays flat no matter how many attempts are exported. With a
+per-question breakdown, a second unbuffered cursor walks Quiz_Responses in the same
+attempt_id order and the two streams are merge-joined.
+"""
+import csv
+import io
+import zlib
+from datetime import datetime, timedelta
+import pymysql
+from database import pool
+
+CHUNK_ROWS = 500
+
+def _where(filters):
+    where, params = [], []
+    if filters.get('quiz_id'):
+        where.append("a.quiz_id = %s"); params.append(filters['quiz_id'])
+    if filters.get('status'):
+        where.append("a.status = %s"); params.append(filters['status'])
+    if filters.get('date_from'):
+        where.append("a.submitted_at >= %s"); params.append(filters['date_from'])
+    if filters.get('date_to'):
+        # inclusive end date: everything before the following midnight
+        try:
+            end = datetime.strptime(filters['date_to'], '%Y-%m-%d') + timedelta(days=1)
+        except ValueError:
+            end = None  # unparseable date matches nothing
+        where.append("a.submitted_at < %s"); params.append(end)
+    return (" WHERE " + " AND ".join(where) if where else ""), params
+
+def _question_ids(filters):
+    conn = pool.acquire()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT question_id FROM Questions WHERE quiz_id=%s ORDER BY question_id", (filters['quiz_id'],))
+            return [r['question_id'] for r in cursor.fetchall()]
+    finally:
+        conn.close()
+
+def _responses(conn, where, params):
+    """Yields (attempt_id, {question_id: selected_option}) in attempt_id order."""
+    cursor = conn.cursor(pymysql.cursors.SSCursor)
+    try:
+        cursor.execute(f"""SELECT r.attempt_id, r.question_id, r.selected_option
+                           FROM Quiz_Responses r JOIN Quiz_Attempts a ON r.attempt_id = a.attempt_id
+                           {where} ORDER BY r.attempt_id""", params)
+        current, answers = None, {}
+        for aid, qid, opt in cursor:
+            if aid != current:
+                if current is not None: yield current, answers
+                current, answers = aid, {}
+            answers[qid] = opt
+        if current is not None: yield current, answers
+    finally:
+        cursor.close()
+
+def iter_results_csv(filters, breakdown=False):
+    """Yields the results CSV as encoded chunks."""
+    where, params = _where(filters)
+    qids = _question_ids(filters) if breakdown and filters.get('quiz_id') else []
+
+    buf = io.StringIO()
+    cw = csv.writer(buf)
+    cw.writerow(['ID', 'Name', 'Email', 'Quiz', 'Score', 'Status', 'Submitted'] + [f"Q{q}" for q in qids])
+
+    conn = pool.acquire()
+    resp_conn = pool.acquire() if qids else None
+    cursor = conn.cursor(pymysql.cursors.SSCursor)
+    responses = None
+    try:
+        cursor.execute(f"""SELECT a.attempt_id, u.full_name, u.email, q.title, a.total_score, a.status, a.submitted_at
+                           FROM Quiz_Attempts a JOIN Users u ON a.user_id=u.user_id JOIN Quizzes q ON a.quiz_id=q.quiz_id
+                           {where} ORDER BY a.attempt_id""", params)
+        responses = _responses(resp_conn, where, params) if resp_conn else None
+        pending = next(responses, None) if responses else None
+
+        n = 0
+        for row in cursor:
+            row = list(row)
+            if responses:
+                # Advance the response stream up to this attempt (both are ordered by attempt_id)
+                while pending and pending[0] < row[0]:
+                    pending = next(responses, None)
+                answers = pending[1] if pending and pending[0] == row[0] else {}
+                row.extend(answers.get(q, '') for q in qids)
+            cw.writerow(row)
+            n += 1
+            if n % CHUNK_ROWS == 0:
+                yield buf.getvalue().encode('utf-8')
+                buf.seek(0); buf.truncate()
+        yield buf.getvalue().encode('utf-8')
+    finally:
+        # Closing an unbuffered cursor drains it so the connection can go back to the pool
+        cursor.close()
+        if responses: responses.close()
+        conn.close()
+        if resp_conn: resp_conn.close()
+
+def gzip_stream(chunks):
+    """Wraps a byte-chunk iterator in a streaming gzip encoder."""
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out: yield out
+    yield z.flush()
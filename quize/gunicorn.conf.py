@@ -0,0 +1,18 @@
+# gunicorn settings, read automatically when gunicorn is started from this directory:
+#   gunicorn 'app:create_app()'      or      gunicorn app:app
+# Building the app starts nothing; each worker starts its own background threads and
+# warm-up after the fork (post_worker_init), so --preload is safe as well.
+# QCMS_WRITE_BEHIND=1 needs WEB_CONCURRENCY=1 (see answer_buffer.py).
+import os
+
+bind = os.environ.get('QCMS_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+# Threaded workers: a live-update poll (/api/events) holds its thread for up to events.WAIT
+# seconds, then the page waits events.RETRY_MS before the next one
+worker_class = 'gthread'
+threads = int(os.environ.get('QCMS_THREADS', 32))
+
+
+def post_worker_init(worker):
+    from app import start_services
+    start_services(worker.wsgi, workers=worker.cfg.workers)
@@ -0,0 +1,257 @@
+"""
+Question bank import (DOCX, CSV, JSON / JSON Lines).
+
+Every format is turned into the same stream of raw row dicts, validated into
+records, de-duplicated against the quiz's existing questions by a hash of the
+normalised question text (Questions.text_hash), and inserted with executemany in
+chunks inside a single transaction. Each chunk is added to the search index, and
+rows that are near-duplicates of a question already in the bank (any session, or
+an earlier row of the same file) are flagged, not dropped. The caller gets back a summary:
+
+    {'imported': 480, 'duplicates': 15, 'invalid': 5, 'similar': 3,
+     'errors': [{'row': 12, 'error': '...'}],
+     'similar_rows': [{'row': 40, 'question_id': 9121, 'matches': [{'question_id': 310, 'similarity': 0.83}]}]}
+
+Every format is streamed, so even very large banks are never held in memory whole:
+DOCX is read straight from word/document.xml with iterparse, CSV and JSON Lines line by
+line, and JSON arrays one element at a time.
+
+DOCX tables use the original column layout (first row of each table is a header):
+    Question | Option A | Option B | Option C | Option D | Correct (A-D) | Marks
+CSV/JSON use field names: question_text, option_a..option_d, correct_option, marks,
+and optionally question_type ('MCQ' | 'CODE'), test_input, test_output.
+"""
+import csv
+import hashlib
+import json
+import zipfile
+import xml.etree.ElementTree as ET
+import search
+
+CHUNK_SIZE = 500
+JSON_READ_SIZE = 64 * 1024      # bytes read from a JSON upload at a time
+JSON_MAX_VALUE = 1024 * 1024    # a single question (or unparseable stretch) larger than this fails the import
+MAX_ERRORS = 50  # per-row errors (and near-duplicate flags) kept in the summary
+FORMATS = ('docx', 'csv', 'json', 'jsonl')
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_json_decoder = json.JSONDecoder()
+DOCX_FIELDS = ('question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_option', 'marks')
+
+
+def normalize_text(text):
+    return ' '.join((text or '').split()).casefold()
+
+def text_hash(text):
+    return hashlib.sha1(normalize_text(text).encode('utf-8')).hexdigest()
+
+def detect_format(filename):
+    ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return ext if ext in FORMATS else None
+
+
+# --- Readers: each yields (row_number, raw dict) ---
+def _cell_text(tc):
+    # Same as python-docx's cell.text: paragraphs joined with newlines
+    return '\n'.join(''.join(t.text or '' for t in p.iter(_W + 't')) for p in tc.iter(_W + 'p')).strip()
+
+def iter_docx_rows(path):
+    with zipfile.ZipFile(path) as zf, zf.open('word/document.xml') as xml:
+        row_no, depth, header = 0, 0, True
+        for event, el in ET.iterparse(xml, events=('start', 'end')):
+            if el.tag == _W + 'tbl':
+                depth += 1 if event == 'start' else -1
+                if event == 'start' and depth == 1: header = True
+                continue
+            if event != 'end' or el.tag != _W + 'tr' or depth != 1: continue
+            cells = [_cell_text(tc) for tc in el if tc.tag == _W + 'tc']
+            el.clear()
+            if header:
+                header = False
+                continue
+            row_no += 1
+            yield row_no, dict(zip(DOCX_FIELDS, cells)) if len(cells) >= 7 else None
+
+def iter_csv_rows(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for i, row in enumerate(csv.DictReader(f), 1):
+            yield i, {(k or '').strip().lower(): v for k, v in row.items()}
+
+class _JSONStream:
+    """Reads one JSON value at a time from a file, holding only the unread part of the current chunk."""
+
+    def __init__(self, f):
+        self.f, self.buf, self.pos = f, '', 0
+
+    def _fill(self):
+        more = self.f.read(JSON_READ_SIZE)
+        self.buf = self.buf[self.pos:] + more
+        self.pos = 0
+        if len(self.buf) > JSON_MAX_VALUE: raise ValueError("JSON value too large or malformed")
+        return bool(more)
+
+    def peek(self):
+        """Next non-whitespace character ('' at the end of the file)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n': self.pos += 1
+            if self.pos < len(self.buf): return self.buf[self.pos]
+            if not self._fill(): return ''
+
+    def take(self, char):
+        if self.peek() != char: raise ValueError(f"Malformed JSON: expected '{char}'")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _json_decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if self._fill(): continue  # cut off by the chunk boundary
+                raise
+            # A number ending exactly at the chunk boundary may continue in the next chunk
+            if end == len(self.buf) and self._fill(): continue
+            self.pos = end
+            return value
+
+def iter_json_rows(path, lines=False):
+    """JSON Lines, or a JSON array (bare or under a "questions" key) read element by element."""
+    with open(path, encoding='utf-8') as f:
+        if lines:
+            for i, line in enumerate(f, 1):
+                if not line.strip(): continue
+                try: yield i, json.loads(line)
+                except ValueError: yield i, None
+            return
+        stream = _JSONStream(f)
+        if stream.peek() == '{':
+            stream.take('{')
+            while True:  # skip other keys up to the questions array
+                if stream.peek() == '}': return
+                key = stream.value()
+                stream.take(':')
+                if key == 'questions' and stream.peek() == '[': break
+                stream.value()
+                if stream.peek() == ',': stream.take(',')
+        stream.take('[')
+        if stream.peek() == ']': return
+        i = 0
+        while True:
+            i += 1
+            yield i, stream.value()
+            if stream.peek() != ',': break
+            stream.take(',')
+        stream.take(']')
+
+def read_rows(path, fmt):
+    if fmt == 'docx': return iter_docx_rows(path)
+    if fmt == 'csv': return iter_csv_rows(path)
+    if fmt in ('json', 'jsonl'): return iter_json_rows(path, lines=fmt == 'jsonl')
+    raise ValueError(f"Unsupported format '{fmt}'")
+
+
+# --- Validation ---
+def validate(raw):
+    """Returns (record, None) or (None, error message)."""
+    if not isinstance(raw, dict): return None, "Row is malformed or has too few columns"
+    get = lambda k: str(raw.get(k) if raw.get(k) is not None else '').strip()
+    text = get('question_text')
+    if not text: return None, "Missing question text"
+    qtype = (get('question_type') or 'MCQ').upper()
+    if qtype not in ('MCQ', 'CODE'): return None, f"Unknown question type '{qtype}'"
+
+    marks = get('marks') or '1'
+    try:
+        marks = int(float(marks))
+    except (ValueError, OverflowError):  # OverflowError: 'inf'
+        return None, f"Marks '{marks}' is not a number"
+    if marks <= 0: return None, "Marks must be positive"
+
+    if qtype == 'CODE':
+        if not get('test_output'): return None, "CODE question needs test_output"
+        return {'question_type': 'CODE', 'question_text': text, 'option_a': None, 'option_b': None, 'option_c': None,
+                'option_d': None, 'correct_option': None, 'marks': marks,
+                'test_input': get('test_input'), 'test_output': get('test_output')}, None
+
+    options = [get(f'option_{k}') for k in 'abcd']
+    if not all(options): return None, "All four options are required"
+    correct = get('correct_option').upper()
+    if correct.startswith('OPTION '): correct = correct[7:].strip()
+    if correct not in ('A', 'B', 'C', 'D'): return None, f"Correct option '{get('correct_option')}' must be A, B, C or D"
+    return {'question_type': 'MCQ', 'question_text': text, 'option_a': options[0], 'option_b': options[1],
+            'option_c': options[2], 'option_d': options[3], 'correct_option': correct, 'marks': marks,
+            'test_input': None, 'test_output': None}, None
+
+
+# --- Import ---
+HASHES_SQL = "SELECT text_hash FROM Questions WHERE quiz_id=%s"
+
+def existing_hashes(cursor, quiz_id):
+    """Hashes of the quiz's current questions; fills in any rows saved before text_hash existed."""
+    cursor.execute("SELECT question_id, question_text FROM Questions WHERE quiz_id=%s AND text_hash IS NULL", (quiz_id,))
+    missing = [(text_hash(r['question_text']), r['question_id']) for r in cursor.fetchall()]
+    if missing:
+        cursor.executemany("UPDATE Questions SET text_hash=%s WHERE question_id=%s", missing)
+    cursor.execute(HASHES_SQL, (quiz_id,))
+    return {r['text_hash'] for r in cursor.fetchall()}
+
+INSERT_SQL = """INSERT INTO Questions (quiz_id, question_type, question_text, text_hash, option_a, option_b, option_c, option_d,
+                                      correct_option, marks, test_input, test_output)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
+
+def _index_chunk(cursor, quiz_id, rows_by_hash, summary):
+    """Indexes a just-inserted chunk and flags its near-duplicates."""
+    hashes = list(rows_by_hash)
+    cursor.execute(f"{search.QUESTION_SQL} WHERE quiz_id=%s AND text_hash IN ({','.join(['%s'] * len(hashes))})",
+                   (quiz_id, *hashes))
+    saved = cursor.fetchall()
+    search.index_questions(cursor, saved)
+    for row, matches in zip(saved, search.similar(cursor, saved, earlier_only=True)):
+        if not matches: continue
+        summary['similar'] += 1
+        if len(summary['similar_rows']) < MAX_ERRORS:
+            summary['similar_rows'].append({'row': rows_by_hash[text_hash(row['question_text'])],
+                                            'question_id': row['question_id'], 'matches': matches})
+
+def import_questions(conn, quiz_id, rows, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Validates, de-duplicates and inserts `rows` ((row_number, raw dict) pairs) into a quiz.
+    All chunks are committed together; any database error rolls the whole import back.
+    `progress(imported, 0, cursor)` is called after each chunk with the import's own cursor
+    (see jobs.Job.progress).
+    """
+    summary = {'imported': 0, 'duplicates': 0, 'invalid': 0, 'similar': 0, 'errors': [], 'similar_rows': []}
+    try:
+        with conn.cursor() as cursor:
+            seen = existing_hashes(cursor, quiz_id)
+            batch, batch_rows = [], {}
+            for row_no, raw in rows:
+                record, error = validate(raw)
+                if error:
+                    summary['invalid'] += 1
+                    if len(summary['errors']) < MAX_ERRORS: summary['errors'].append({'row': row_no, 'error': error})
+                    continue
+                h = text_hash(record['question_text'])
+                if h in seen:
+                    summary['duplicates'] += 1
+                    continue
+                seen.add(h)
+                batch_rows[h] = row_no
+                batch.append((quiz_id, record['question_type'], record['question_text'], h, record['option_a'], record['option_b'],
+                              record['option_c'], record['option_d'], record['correct_option'], record['marks'],
+                              record['test_input'], record['test_output']))
+                if len(batch) >= chunk_size:
+                    cursor.executemany(INSERT_SQL, batch)
+                    _index_chunk(cursor, quiz_id, batch_rows, summary)
+                    summary['imported'] += len(batch)
+                    batch, batch_rows = [], {}
+                    if progress: progress(summary['imported'], 0, cursor)
+            if batch:
+                cursor.executemany(INSERT_SQL, batch)
+                _index_chunk(cursor, quiz_id, batch_rows, summary)
+                summary['imported'] += len(batch)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return summary
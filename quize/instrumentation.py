@@ -0,0 +1,424 @@
+"""
+Per-request instrumentation.
+
+Every request gets a Trace for the thread serving it. Cursors handed out by
+database.PooledConnection while a trace is active are TracedCursor wrappers that add
+each statement's time and the rows it returned to the trace; after_request then files
+the totals under the route rule (e.g. '/quiz/<int:quiz_id>'):
+
+    wall time, DB time, query count, failed queries, rows fetched, response size
+
+A streamed response (the CSV export) produces its body, and runs its queries, after
+after_request; its trace stays open until the server closes the response and counts
+the bytes actually sent. Its X-DB-Queries/Server-Timing headers go out before the
+body, so they are left off.
+
+and they are exposed as:
+  /metrics                    Prometheus text format histograms per route, plus gauges
+                              registered with register_gauges() (Admin session, or
+                              'Authorization: Bearer <METRICS_TOKEN>' for a scraper)
+  X-DB-Queries, Server-Timing response headers (loadtest.py --url reads X-DB-Queries)
+  'qcms.slow' logger          requests slower than SLOW_REQUEST_MS, with their SQL
+                              (statement text only; parameters are never logged)
+  sampling profiler           PROFILE_ROUTE + PROFILE_SAMPLE_RATE, or armed for the next
+                              N requests with POST /admin/profile; writes folded stacks
+                              (flamegraph.pl / speedscope) to PROFILE_DIR
+
+Cursors used outside a request (job workers, the sweeper, CLIs) are not wrapped.
+"""
+import bisect
+import collections
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from flask import current_app, request, session, jsonify, Response
+
+SLOW_REQUEST_MS = 500      # default threshold for the slow log (0 = off)
+MAX_STATEMENTS = 100       # SQL kept per request for the slow log
+SQL_PREVIEW = 300          # characters of each statement kept
+SAMPLE_INTERVAL = 0.005    # seconds between profiler samples
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 1000)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+slow_log = logging.getLogger('qcms.slow')
+_local = threading.local()
+
+
+# --- Per-request trace ---
+class Trace:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.failed = 0
+        self.rows = 0
+        self.statements = []
+        self.sampler = None
+        self.streaming = False
+        self.streamed = 0  # bytes of a streamed body sent so far
+
+    def add_query(self, sql, elapsed, ok):
+        self.db_time += elapsed
+        self.queries += 1
+        if not ok: self.failed += 1
+        if len(self.statements) < MAX_STATEMENTS:
+            self.statements.append((elapsed, ' '.join(str(sql).split())[:SQL_PREVIEW], ok))
+
+def current():
+    return getattr(_local, 'trace', None)
+
+
+class TracedCursor:
+    """Cursor proxy that times statements and counts fetched rows into a Trace."""
+
+    def __init__(self, cursor, trace):
+        self._cursor = cursor
+        self._trace = trace
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def __iter__(self):
+        # Unbuffered cursors (exports) stream rows by iteration
+        for row in self._cursor:
+            self._trace.rows += 1
+            yield row
+
+    def _timed(self, method, query, args):
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = method(query, args)
+            ok = True
+            return result
+        finally:
+            self._trace.add_query(query, time.perf_counter() - started, ok)
+
+    def execute(self, query, args=None):
+        return self._timed(self._cursor.execute, query, args)
+
+    def executemany(self, query, args):
+        return self._timed(self._cursor.executemany, query, args)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None: self._trace.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size)
+        self._trace.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._trace.rows += len(rows)
+        return rows
+
+def wrap_cursor(cursor):
+    trace = current()
+    return TracedCursor(cursor, trace) if trace is not None else cursor
+
+
+# --- Aggregation ---
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RouteStats:
+    def __init__(self):
+        self.responses = collections.Counter()  # status code -> count
+        self.slow = 0
+        self.failed_queries = 0
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.db_duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(COUNT_BUCKETS)
+        self.rows = Histogram(COUNT_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._gauges = {}
+
+    def record(self, method, route, status, trace, wall, size, slow):
+        with self._lock:
+            stats = self._routes.get((method, route))
+            if stats is None: stats = self._routes[(method, route)] = RouteStats()
+            stats.responses[status] += 1
+            stats.slow += slow
+            stats.failed_queries += trace.failed
+            stats.duration.observe(wall)
+            stats.db_duration.observe(trace.db_time)
+            stats.queries.observe(trace.queries)
+            stats.rows.observe(trace.rows)
+            if size is not None: stats.size.observe(size)
+
+    def register_gauges(self, prefix, fn):
+        self._gauges[prefix] = fn
+
+    def render(self):
+        """Everything in Prometheus text exposition format (version 0.0.4)."""
+        out = []
+        with self._lock:
+            routes = sorted(self._routes.items())
+            _counter(out, 'qcms_http_requests_total', "Requests by route and status code.",
+                     [({'method': m, 'route': r, 'status': code}, n) for (m, r), s in routes for code, n in sorted(s.responses.items())])
+            _counter(out, 'qcms_http_slow_requests_total', "Requests slower than the slow-log threshold.",
+                     [({'method': m, 'route': r}, s.slow) for (m, r), s in routes])
+            _counter(out, 'qcms_http_db_errors_total', "Failed SQL statements.",
+                     [({'method': m, 'route': r}, s.failed_queries) for (m, r), s in routes])
+            for attr, name, help_text in (('duration', 'qcms_http_request_duration_seconds', "Wall time per request."),
+                                          ('db_duration', 'qcms_http_db_duration_seconds', "Time spent in SQL per request."),
+                                          ('queries', 'qcms_http_db_queries', "SQL statements per request."),
+                                          ('rows', 'qcms_http_db_rows_fetched', "Rows fetched per request."),
+                                          ('size', 'qcms_http_response_bytes', "Response (rendered template) size.")):
+                _histogram(out, name, help_text, [({'method': m, 'route': r}, getattr(s, attr)) for (m, r), s in routes])
+        for prefix, fn in sorted(self._gauges.items()):
+            try:
+                values = fn()
+            except Exception:
+                slow_log.exception("Metrics gauges '%s' failed", prefix)
+                continue
+            for key, value in sorted(values.items()):
+                # Nested and text values (topic maps, backend names) stay on the JSON endpoints
+                if isinstance(value, bool) or not isinstance(value, (int, float)): continue
+                name = f"qcms_{prefix}_{key}"
+                out.append(f"# TYPE {name} gauge")
+                out.append(f"{name} {_num(value)}")
+        return '\n'.join(out) + '\n'
+
+registry = Registry()
+
+def register_gauges(prefix, fn):
+    """`fn()` returns a flat dict; numeric values are exported as qcms_<prefix>_<key> gauges."""
+    registry.register_gauges(prefix, fn)
+
+def _num(value):
+    if value == float('inf'): return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _labels(labels):
+    esc = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{esc(v)}"' for k, v in labels.items()) + '}'
+
+def _counter(out, name, help_text, samples):
+    out.append(f"# HELP {name} {help_text}")
+    out.append(f"# TYPE {name} counter")
+    for labels, value in samples:
+        out.append(f"{name}{_labels(labels)} {_num(value)}")
+
+def _histogram(out, name, help_text, samples):
+    out.append(f"# HELP {name} {help_text}")
+    out.append(f"# TYPE {name} histogram")
+    for labels, h in samples:
+        if not h.count: continue
+        running = 0
+        for le, n in zip(h.buckets + (float('inf'),), h.counts):
+            running += n
+            out.append(f"{name}_bucket{_labels(dict(labels, le=_num(le)))} {running}")
+        out.append(f"{name}_sum{_labels(labels)} {_num(round(h.sum, 6))}")
+        out.append(f"{name}_count{_labels(labels)} {h.count}")
+
+
+# --- Sampling profiler ---
+class StackSampler:
+    """Samples one thread's Python stack every `interval` seconds from a helper thread."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack: self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        """Writes 'frame;frame;frame count' lines (Brendan Gregg's folded format)."""
+        with open(path, 'w') as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+class ProfileControl:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._armed = {}  # route rule or endpoint -> requests left
+
+    def arm(self, route, count):
+        with self._lock:
+            if count > 0: self._armed[route] = count
+            else: self._armed.pop(route, None)
+
+    def armed(self):
+        with self._lock:
+            return dict(self._armed)
+
+    def should_profile(self, keys, configured, rate):
+        with self._lock:
+            for key in keys:
+                left = self._armed.get(key)
+                if left:
+                    if left == 1: del self._armed[key]
+                    else: self._armed[key] = left - 1
+                    return True
+        return bool(configured) and configured in keys and random.random() < rate
+
+profiler = ProfileControl()
+
+
+# --- Flask wiring ---
+def _route():
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+def _start():
+    trace = _local.trace = Trace()
+    config = _app_config()
+    if profiler.should_profile((_route(), request.endpoint), config.get('PROFILE_ROUTE'), config.get('PROFILE_SAMPLE_RATE', 0.0)):
+        trace.sampler = StackSampler(threading.get_ident()).start()
+
+def _finish(status, response=None):
+    trace = current()
+    # A streamed response's trace is finished by the server closing it, not by teardown
+    if trace is None or trace.streaming: return
+    where = (request.method, request.path, _route(), request.endpoint)
+    config = _app_config()
+    if response is not None and response.is_streamed:
+        trace.streaming = True
+        response.response = _counted(response.response, trace)
+        response.call_on_close(lambda: _record(trace, where, status, trace.streamed, config))
+        return
+    wall = size = None
+    if response is not None:
+        wall = time.perf_counter() - trace.started
+        size = response.content_length
+        if size is None: size = response.calculate_content_length()
+        response.headers['X-DB-Queries'] = str(trace.queries)
+        response.headers['Server-Timing'] = f"db;dur={trace.db_time * 1000:.1f}, total;dur={wall * 1000:.1f}"
+    _record(trace, where, status, size, config, wall)
+
+def _counted(body, trace):
+    """Passes a streamed body through, adding the bytes sent to the trace."""
+    try:
+        for chunk in body:
+            trace.streamed += len(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+            yield chunk
+    finally:
+        if hasattr(body, 'close'): body.close()  # e.g. releases an export's unbuffered cursor
+
+def _record(trace, where, status, size, config, wall=None):
+    """Files a finished trace. `where` is (method, path, route, endpoint) of its request."""
+    if current() is trace: del _local.trace
+    if wall is None: wall = time.perf_counter() - trace.started
+    threshold = config.get('SLOW_REQUEST_MS', SLOW_REQUEST_MS)
+    slow = bool(threshold) and wall * 1000 >= threshold
+    registry.record(where[0], where[2], status, trace, wall, size, slow)
+    if slow: _log_slow(where, status, trace, wall)
+    if trace.sampler: _dump_profile(trace.sampler, where, config, wall)
+
+def _log_slow(where, status, trace, wall):
+    method, path, route, _ = where
+    lines = [f"{ms * 1000:8.1f} ms  {'' if ok else '[FAILED] '}{sql}" for ms, sql, ok in trace.statements]
+    if trace.queries > len(trace.statements): lines.append(f"... {trace.queries - len(trace.statements)} more")
+    slow_log.warning("Slow request %s %s (%s) %.0f ms total, %.0f ms in %d queries, %d rows\n%s",
+                     method, path, route, wall * 1000, trace.db_time * 1000,
+                     trace.queries, trace.rows, '\n'.join(lines))
+
+def _dump_profile(sampler, where, config, wall):
+    method, request_path, _, endpoint = where
+    sampler.stop()
+    directory = config.get('PROFILE_DIR', 'profiles')
+    try:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{endpoint or 'unmatched'}-{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}.folded")
+        sampler.dump(path)
+        slow_log.info("Profiled %s %s (%.0f ms, %d samples) -> %s", method, request_path,
+                      wall * 1000, sum(sampler.stacks.values()), path)
+    except OSError as e:
+        slow_log.warning("Profiler Error: %s", e)
+
+def _app_config():
+    return current_app.config
+
+
+def init_app(app):
+    app.config.setdefault('SLOW_REQUEST_MS', SLOW_REQUEST_MS)
+    app.config.setdefault('METRICS_TOKEN', os.environ.get('QCMS_METRICS_TOKEN'))
+    app.config.setdefault('PROFILE_ROUTE', None)         # route rule ('/quiz/<int:quiz_id>') or endpoint name
+    app.config.setdefault('PROFILE_SAMPLE_RATE', 0.01)   # share of that route's requests profiled
+    app.config.setdefault('PROFILE_DIR', 'profiles')
+
+    @app.before_request
+    def _instrument_start():
+        _start()
+
+    @app.after_request
+    def _instrument_finish(response):
+        _finish(response.status_code, response)
+        return response
+
+    @app.teardown_request
+    def _instrument_teardown(exc=None):
+        # Only still set when the view raised and after_request never ran
+        if current() is not None: _finish(500)
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        token = app.config['METRICS_TOKEN']
+        if session.get('role') != 'Admin' and not (token and request.headers.get('Authorization') == f"Bearer {token}"):
+            return "Denied", 403
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    @app.route('/admin/profile', methods=['GET', 'POST'])
+    def profile_route():
+        if session.get('role') != 'Admin': return "Denied"
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or request.form
+            route = (data.get('route') or '').strip()
+            if not route: return jsonify({'status': 'error', 'output': 'route is required'})
+            try:
+                count = int(data.get('requests', 1))
+            except (TypeError, ValueError):
+                return jsonify({'status': 'error', 'output': 'requests must be a number'})
+            profiler.arm(route, count)
+        return jsonify({'status': 'success', 'armed': profiler.armed(), 'directory': os.path.abspath(app.config['PROFILE_DIR'])})
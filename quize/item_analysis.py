@@ -0,0 +1,185 @@
+"""
+Item analysis for a quiz's completed attempts.
+
+One unbuffered query returns a row per completed attempt: its id, total score and
+its responses packed by the database into a comma-separated list of
+question_id * 8 + choice code. NumPy parses all of them in one pass into an
+attempts x questions matrix
+
+    choice[a, q]  0-3 for options A-D, 4 for a passing CODE run, 5 any other answer, -1 blank
+
+so the driver materialises one row per attempt instead of one per response, and
+every statistic below is computed on whole columns at once:
+
+  difficulty       share of attempts answering the question correctly (p)
+  discrimination   p in the top 27% of attempts by total score minus p in the bottom 27%
+  point_biserial   correlation of being right with the rest of the score (total minus this item)
+  omitted          share of attempts leaving it blank
+  options          per MCQ option: share choosing it overall / in the top and bottom groups;
+                   a distractor is effective when at least 5% choose it and the bottom
+                   group chooses it more often than the top group
+
+Results are cached per quiz (state.analysis_cache) and recomputed when the quiz's
+completed-attempt count changes or a regrade/question edit invalidates them.
+
+NumPy is only imported here, and this module is loaded through lazy.load().
+
+CLI:  python item_analysis.py <quiz_id>
+"""
+import json
+import sys
+import time
+import numpy as np
+import pymysql
+from database import get_db_connection, backend
+from state import analysis_cache
+
+GROUP_SHARE = 0.27        # Kelley's upper/lower groups
+DISTRACTOR_MIN = 0.05     # share of attempts a distractor needs to count as plausible
+EASY, HARD, POOR_DISCRIMINATION = 0.9, 0.2, 0.2
+FETCH_ROWS = 1000
+OPTION_CODES = {'A': 0, 'B': 1, 'C': 2, 'D': 3}
+CODE_PASS, OTHER, BLANK = 4, 5, -1
+
+_CODE = f"""CASE WHEN r.selected_option IS NULL OR r.selected_option = '' THEN {BLANK}
+                 WHEN r.selected_option = 'A' THEN 0 WHEN r.selected_option = 'B' THEN 1
+                 WHEN r.selected_option = 'C' THEN 2 WHEN r.selected_option = 'D' THEN 3
+                 WHEN r.selected_option = 'CODE_SUCCESS' THEN {CODE_PASS} ELSE {OTHER} END"""
+
+# codes -1..5 are stored +1 in the low 3 bits
+ATTEMPTS_SQL = f"""
+    SELECT a.attempt_id, a.total_score, COUNT(r.question_id), GROUP_CONCAT(r.question_id * 8 + {_CODE} + 1)
+    FROM Quiz_Attempts a LEFT JOIN Quiz_Responses r ON r.attempt_id = a.attempt_id
+    WHERE a.quiz_id = %s AND a.status = 'Completed'
+    GROUP BY a.attempt_id, a.total_score"""
+
+
+# --- Loading ---
+def _stream_attempts(conn, quiz_id):
+    """(attempt_ids, scores, row index per response, packed responses), read in FETCH_ROWS chunks."""
+    cursor = conn.cursor(pymysql.cursors.SSCursor)
+    ids, scores, counts, packed = [], [], [], []
+    try:
+        if backend.name == 'mysql':
+            cursor.execute("SET SESSION group_concat_max_len = 16777216")  # default 1024 truncates at ~150 answers
+        cursor.execute(ATTEMPTS_SQL, (quiz_id,))
+        while True:
+            rows = cursor.fetchmany(FETCH_ROWS)
+            if not rows: break
+            for attempt_id, score, n, values in rows:
+                ids.append(attempt_id)
+                scores.append(float(score or 0))
+                counts.append(n)
+                if n: packed.append(values)
+    finally:
+        cursor.close()
+    values = np.fromstring(','.join(packed), dtype=np.int64, sep=',') if packed else np.empty(0, dtype=np.int64)
+    rows = np.repeat(np.arange(len(ids)), counts)
+    return np.array(ids, dtype=np.int64), np.array(scores, dtype=np.float64), rows, values
+
+def load_matrix(conn, quiz_id):
+    """Returns (questions, attempt_ids, scores, choice) for the quiz's completed attempts."""
+    with conn.cursor() as cursor:
+        cursor.execute("""SELECT question_id, question_text, question_type, correct_option, marks FROM Questions
+                          WHERE quiz_id=%s ORDER BY question_id""", (quiz_id,))
+        questions = cursor.fetchall()
+    attempt_ids, scores, rows, values = _stream_attempts(conn, quiz_id)
+
+    question_ids = np.array([q['question_id'] for q in questions], dtype=np.int64)
+    choice = np.full((len(attempt_ids), len(question_ids)), BLANK, dtype=np.int8)
+    if len(values) and len(question_ids):
+        qids, codes = values >> 3, (values & 7) - 1
+        cols = np.searchsorted(question_ids, qids).clip(0, len(question_ids) - 1)
+        known = question_ids[cols] == qids  # questions added since the first query are left out
+        choice[rows[known], cols[known]] = codes[known]
+    return questions, attempt_ids, scores, choice
+
+
+# --- Statistics ---
+def _num(value):
+    return None if np.isnan(value) else round(float(value), 3)
+
+def _column_corr(x, y):
+    """Pearson correlation of matching columns of x and y; NaN where either column is constant."""
+    xm, ym = x - x.mean(axis=0), y - y.mean(axis=0)
+    denom = np.sqrt((xm ** 2).sum(axis=0) * (ym ** 2).sum(axis=0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denom > 0, (xm * ym).sum(axis=0) / denom, np.nan)
+
+def compute(questions, scores, choice):
+    """Item statistics for every question; `choice` is attempts x questions."""
+    n_attempts = choice.shape[0]
+    if not n_attempts or not questions:
+        return {'attempts': n_attempts, 'questions': []}
+    is_code = np.array([q['question_type'] == 'CODE' for q in questions])
+    key = np.array([CODE_PASS if code else OPTION_CODES.get((q['correct_option'] or '').strip().upper(), BLANK)
+                    for q, code in zip(questions, is_code)], dtype=np.int8)
+    marks = np.array([float(q['marks'] or 0) for q in questions])
+
+    correct = (choice == key) & (key != BLANK)
+    right = correct.astype(np.float64)
+    difficulty = right.mean(axis=0)
+    omitted = (choice == BLANK).mean(axis=0)
+
+    order = np.argsort(scores, kind='stable')
+    k = max(1, int(round(GROUP_SHARE * n_attempts)))
+    lower, upper = order[:k], order[-k:]
+    discrimination = right[upper].mean(axis=0) - right[lower].mean(axis=0)
+    point_biserial = _column_corr(right, scores[:, None] - right * marks)
+
+    # attempts x questions x 4 options -> shares per question and option
+    picks = choice[:, :, None] == np.arange(4, dtype=np.int8)
+    share, share_upper, share_lower = picks.mean(axis=0), picks[upper].mean(axis=0), picks[lower].mean(axis=0)
+
+    items = []
+    for i, q in enumerate(questions):
+        item = {'question_id': q['question_id'], 'question_text': q['question_text'], 'question_type': q['question_type'],
+                'difficulty': _num(difficulty[i]), 'discrimination': _num(discrimination[i]),
+                'point_biserial': _num(point_biserial[i]), 'omitted': _num(omitted[i]), 'flags': []}
+        if difficulty[i] > EASY: item['flags'].append('too_easy')
+        if difficulty[i] < HARD: item['flags'].append('too_hard')
+        if discrimination[i] < POOR_DISCRIMINATION: item['flags'].append('poor_discrimination')
+        if not is_code[i]:
+            item['options'] = {}
+            for letter, o in OPTION_CODES.items():
+                is_key = key[i] == o
+                item['options'][letter] = {
+                    'share': _num(share[i, o]), 'upper': _num(share_upper[i, o]), 'lower': _num(share_lower[i, o]),
+                    'correct': bool(is_key),
+                    'effective': None if is_key else bool(share[i, o] >= DISTRACTOR_MIN and share_lower[i, o] > share_upper[i, o])}
+            if any(o['effective'] is False for o in item['options'].values()):
+                item['flags'].append('weak_distractors')
+        items.append(item)
+    return {'attempts': n_attempts, 'questions': items}
+
+
+# --- Cached entry point ---
+def analyze(quiz_id):
+    """Item analysis for a quiz, from the cache unless its completed-attempt count has moved."""
+    quiz_id = int(quiz_id)
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT attempts FROM Quiz_Stats WHERE quiz_id=%s", (quiz_id,))
+            row = cursor.fetchone()
+        completed = row['attempts'] if row else 0
+        cached = analysis_cache.get(quiz_id)  # (completed attempts it was computed at, result)
+        if cached is not None and cached[0] == completed:
+            return cached[1]
+
+        started = time.perf_counter()
+        questions, _, scores, choice = load_matrix(conn, quiz_id)
+        loaded = time.perf_counter()
+        result = compute(questions, scores, choice)
+        result.update(quiz_id=quiz_id, load_ms=round((loaded - started) * 1000, 1),
+                      compute_ms=round((time.perf_counter() - loaded) * 1000, 1))
+    finally:
+        conn.close()
+    analysis_cache.set(quiz_id, (completed, result))
+    return result
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or not sys.argv[1].isdigit():
+        sys.exit("usage: python item_analysis.py <quiz_id>")
+    print(json.dumps(analyze(int(sys.argv[1])), indent=2, default=str))
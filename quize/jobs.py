@@ -0,0 +1,178 @@
+"""
+Background job queue for heavy admin operations.
+
+Jobs live in the MySQL `Jobs` table, so they survive restarts and any worker process
+can pick them up. Worker threads claim a job with a single conditional UPDATE (no
+SELECT ... FOR UPDATE needed), run the registered handler, and record the result.
+Failed jobs are retried with exponential backoff up to max_attempts.
+
+    @jobs.handler('import_questions')
+    def import_questions(payload, job):
+        job.progress(10, 100)
+        return {'imported': 10}
+
+    job_id = jobs.enqueue('import_questions', {'path': ...})
+"""
+import json
+import threading
+import time
+import uuid
+from database import get_db_connection, backend
+
+POLL_INTERVAL = 1.0     # seconds between queue checks when idle
+STALE_AFTER = 15 * 60   # Running jobs older than this are assumed orphaned by a dead worker
+
+_handlers = {}
+_wake = threading.Event()
+_started = False
+_start_lock = threading.Lock()
+
+
+def handler(kind):
+    """Registers `fn(payload, job)` as the handler for jobs of this kind."""
+    def register(fn):
+        _handlers[kind] = fn
+        return fn
+    return register
+
+
+PROGRESS_SQL = "UPDATE Jobs SET progress_done=%s, progress_total=%s WHERE job_id=%s"
+
+
+class Job:
+    def __init__(self, row):
+        self.job_id = row['job_id']
+        self.kind = row['kind']
+        self.attempts = row['attempts']
+        self._last_progress = 0.0
+
+    def progress(self, done, total, cursor=None):
+        """
+        Records progress (total 0 = unknown). `cursor` is the caller's open write transaction,
+        if it has one: on SQLite the row is updated through it, since any other connection
+        would wait for that transaction's lock (and fail after busy_timeout); it then shows
+        up when the caller commits. On MySQL progress is written on its own connection, so
+        it is visible while the job runs.
+        """
+        # Throttled so tight loops don't turn into a write per item; the final count always goes through
+        now = time.monotonic()
+        if now - self._last_progress < 0.5 and not 0 < total <= done: return
+        self._last_progress = now
+        if cursor is not None and backend.name == 'sqlite':
+            cursor.execute(PROGRESS_SQL, (done, total, self.job_id))
+            return
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(PROGRESS_SQL, (done, total, self.job_id))
+        conn.commit()
+        conn.close()
+
+def enqueue(kind, payload, max_attempts=3, user_id=None):
+    if kind not in _handlers: raise ValueError(f"No handler for job kind '{kind}'")
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        cursor.execute("""INSERT INTO Jobs (kind, payload, status, attempts, max_attempts, created_by, created_at, run_after)
+                          VALUES (%s, %s, 'Queued', 0, %s, %s, NOW(), NOW())""", (kind, json.dumps(payload), max_attempts, user_id))
+        job_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+    _wake.set()
+    return job_id
+
+def _decode(row):
+    row = dict(row)
+    row.pop('payload', None)
+    row.pop('claim_token', None)
+    row['result'] = json.loads(row['result']) if row.get('result') else None
+    return row
+
+def job_status(cursor, job_id):
+    cursor.execute("SELECT * FROM Jobs WHERE job_id=%s", (job_id,))
+    row = cursor.fetchone()
+    return _decode(row) if row else None
+
+def recent_jobs(cursor, limit=20):
+    cursor.execute("SELECT * FROM Jobs ORDER BY job_id DESC LIMIT %s", (limit,))
+    return [_decode(r) for r in cursor.fetchall()]
+
+
+if backend.name == 'sqlite':
+    # No UPDATE ... LIMIT in stock SQLite; the UPDATE holds the write lock, so the subquery can't race
+    CLAIM_SQL = """UPDATE Jobs SET status='Running', claim_token=%s, started_at=NOW(), attempts=attempts+1
+                   WHERE job_id = (SELECT job_id FROM Jobs WHERE status='Queued' AND run_after <= NOW() ORDER BY job_id LIMIT 1)"""
+else:
+    CLAIM_SQL = """UPDATE Jobs SET status='Running', claim_token=%s, started_at=NOW(), attempts=attempts+1
+                   WHERE status='Queued' AND run_after <= NOW() ORDER BY job_id LIMIT 1"""
+CLAIMED_SQL = "SELECT * FROM Jobs WHERE claim_token=%s"
+
+def _claim():
+    token = uuid.uuid4().hex
+    conn = get_db_connection()
+    if conn is None: return None, None
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(CLAIM_SQL, (token,))
+            conn.commit()
+            if cursor.rowcount == 0: return None, None
+            cursor.execute(CLAIMED_SQL, (token,))
+            row = cursor.fetchone()
+            return row, (json.loads(row['payload']) if row['payload'] else {})
+    finally:
+        conn.close()
+
+def _finish(job_id, ok, result=None, error=None, retry_in=None):
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        if ok:
+            cursor.execute("UPDATE Jobs SET status='Completed', result=%s, error=NULL, finished_at=NOW() WHERE job_id=%s",
+                           (json.dumps(result, default=str), job_id))
+        elif retry_in is not None:
+            cursor.execute(f"UPDATE Jobs SET status='Queued', error=%s, run_after={backend.add_seconds('NOW()', '%s')} WHERE job_id=%s",
+                           (error, retry_in, job_id))
+        else:
+            cursor.execute("UPDATE Jobs SET status='Failed', error=%s, finished_at=NOW() WHERE job_id=%s", (error, job_id))
+    conn.commit()
+    conn.close()
+
+def run_one():
+    """Claims and runs a single job. Returns False if the queue was empty."""
+    row, payload = _claim()
+    if not row: return False
+    job = Job(row)
+    try:
+        result = _handlers[row['kind']](payload, job)
+        _finish(job.job_id, True, result=result)
+    except Exception as e:
+        print(f"Job {job.job_id} ({job.kind}) Error: {e}")
+        retry = 2 ** job.attempts * 5 if job.attempts < row['max_attempts'] else None
+        _finish(job.job_id, False, error=str(e)[:2000], retry_in=retry)
+    return True
+
+def _worker():
+    while True:
+        try:
+            if run_one(): continue
+        except Exception as e:
+            print(f"Job Worker Error: {e}")
+        _wake.wait(POLL_INTERVAL)
+        _wake.clear()
+
+def _requeue_stale():
+    conn = get_db_connection()
+    if conn is None: return
+    with conn.cursor() as cursor:
+        cursor.execute(f"""UPDATE Jobs SET status='Queued', run_after=NOW()
+                          WHERE status='Running' AND started_at < {backend.add_seconds('NOW()', '%s')}""", (-STALE_AFTER,))
+    conn.commit()
+    conn.close()
+
+def start_workers(count=2):
+    """Starts `count` daemon worker threads in this process (idempotent)."""
+    global _started
+    with _start_lock:
+        if _started: return
+        _started = True
+    try: _requeue_stale()
+    except Exception as e: print(f"Job Worker Error: {e}")
+    for i in range(count):
+        threading.Thread(target=_worker, name=f"job-worker-{i}", daemon=True).start()
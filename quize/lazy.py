@@ -0,0 +1,30 @@
+"""
+Deferred, timed imports.
+
+certificate_generator pulls in ReportLab, qrcode and PIL, which take longer to import
+than the whole exam path, so code that needs them calls lazy.load('certificate_generator')
+at first use instead of importing at module load (item_analysis and NumPy likewise). Every import made through load()
+(including the blueprints create_app registers) is timed into IMPORT_TIMES, served on
+/admin/metrics/startup. For a full breakdown run `python -X importtime app.py`.
+"""
+import importlib
+import sys
+import threading
+import time
+
+HEAVY = ('certificate_generator', 'item_analysis', 'numpy', 'reportlab', 'qrcode', 'PIL', 'requests')  # reported on /admin/metrics/startup
+IMPORT_TIMES = {}  # module name -> seconds spent importing it (and whatever it imported first)
+
+_lock = threading.Lock()
+_loaded = set()
+
+
+def load(name):
+    # sys.modules alone isn't enough: another thread may still be executing the module
+    if name in _loaded: return sys.modules[name]
+    with _lock:
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        IMPORT_TIMES.setdefault(name, round(time.perf_counter() - started, 4))
+        _loaded.add(name)
+    return module
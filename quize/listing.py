@@ -0,0 +1,133 @@
+"""
+Keyset (seek) pagination for the dashboard tables.
+
+Each page is `ORDER BY <sort>, <pk> LIMIT n` continued from the last row of the
+previous page via an opaque `after` cursor, so page 500 costs the same as page 1
+(no OFFSET scans). Sort keys and filters are whitelisted per resource.
+"""
+import base64
+import json
+import search
+
+PAGE_SIZE = 50
+PAGE_MAX = 200
+
+def _quiz_filter(value):
+    # '0' means questions not attached to any session ("General")
+    if str(value) == '0': return "(q.quiz_id IS NULL OR q.quiz_id = 0)", ()
+    return "q.quiz_id = %s", (value,)
+
+# sorts: name -> (SQL expression, row key, value the expression yields for NULL)
+RESOURCES = {
+    'questions': {
+        'roles': ('Admin', 'Coordinator'),
+        'select': """SELECT q.question_id, q.question_text, q.question_type, q.marks, q.quiz_id,
+                            COALESCE(z.title, 'General') AS session_name, COALESCE(q.quiz_id, 0) AS quiz_id_safe
+                     FROM Questions q LEFT JOIN Quizzes z ON q.quiz_id = z.quiz_id""",
+        'base': None,
+        'pk': ('q.question_id', 'question_id'),
+        'sorts': {'id': ('q.question_id', 'question_id', None), 'marks': ('COALESCE(q.marks, 0)', 'marks', 0)},
+        'default': ('id', 'desc'),
+        'filters': {
+            'quiz_id': _quiz_filter,
+            'category': lambda v: ("z.category = %s", (v,)),
+            'type': lambda v: ("q.question_type = %s", (v,)),
+            'q': search.match_filter,  # every word, through the search index
+        },
+    },
+    'students': {
+        'roles': ('Admin', 'Coordinator'),
+        'select': """SELECT u.user_id, u.full_name, u.email, u.is_blocked, u.selected_session FROM Users u""",
+        'base': "u.role = 'Student'",
+        'pk': ('u.user_id', 'user_id'),
+        'sorts': {'id': ('u.user_id', 'user_id', None), 'name': ("COALESCE(u.full_name, '')", 'full_name', '')},
+        'default': ('id', 'asc'),
+        'filters': {
+            'category': lambda v: ("u.selected_session = %s", (v,)),
+            'status': lambda v: ("u.is_blocked = %s", (1 if v == 'blocked' else 0,)),
+        },
+    },
+    'attempts': {
+        'roles': ('Admin', 'Coordinator'),
+        'select': """SELECT a.attempt_id, a.user_id, a.quiz_id, a.total_score, a.status, a.certificate_approved,
+                            u.full_name, q.title
+                     FROM Quiz_Attempts a JOIN Users u ON a.user_id = u.user_id JOIN Quizzes q ON a.quiz_id = q.quiz_id""",
+        'base': None,
+        'pk': ('a.attempt_id', 'attempt_id'),
+        'sorts': {'score': ('a.total_score', 'total_score', 0), 'id': ('a.attempt_id', 'attempt_id', None)},
+        'default': ('score', 'desc'),
+        'filters': {
+            'quiz_id': lambda v: ("a.quiz_id = %s", (v,)),
+            'status': lambda v: ("a.status = %s", (v,)),
+            'category': lambda v: ("q.category = %s", (v,)),
+        },
+    },
+}
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+def decode_cursor(token):
+    """[sort value, pk] from an `after` token; ValueError for anything else (bad base64/JSON included)."""
+    values = json.loads(base64.urlsafe_b64decode(token.encode()))
+    if not (isinstance(values, list) and len(values) == 2
+            and all(v is None or isinstance(v, (str, int, float)) for v in values)):
+        raise ValueError("bad cursor")
+    return values
+
+def page_query(resource, args):
+    """(sql, params, limit) for one page of `resource`; the statement fetch_page runs (limit + 1 rows)."""
+    spec = RESOURCES[resource]
+    sort = args.get('sort') or spec['default'][0]
+    order = (args.get('order') or spec['default'][1]).lower()
+    if sort not in spec['sorts'] or order not in ('asc', 'desc'): raise ValueError("bad sort")
+    limit = max(1, min(int(args.get('limit') or PAGE_SIZE), PAGE_MAX))
+    sort_expr = spec['sorts'][sort][0]
+    pk_expr = spec['pk'][0]
+
+    where, params = [], []
+    if spec['base']: where.append(spec['base'])
+    for name, build in spec['filters'].items():
+        value = args.get(name)
+        if value not in (None, '', 'all'):
+            sql, p = build(value)
+            where.append(sql)
+            params.extend(p)
+
+    if args.get('after'):
+        last_sort, last_pk = decode_cursor(args['after'])
+        op = '<' if order == 'desc' else '>'
+        if sort_expr == pk_expr:
+            where.append(f"{pk_expr} {op} %s")
+            params.append(last_pk)
+        else:
+            where.append(f"({sort_expr} {op} %s OR ({sort_expr} = %s AND {pk_expr} {op} %s))")
+            params.extend([last_sort, last_sort, last_pk])
+
+    sql = spec['select']
+    if where: sql += " WHERE " + " AND ".join(where)
+    tiebreak = f", {pk_expr} {order}" if sort_expr != pk_expr else ""
+    sql += f" ORDER BY {sort_expr} {order}{tiebreak} LIMIT %s"
+    params.append(limit + 1)
+    return sql, params, limit
+
+def fetch_page(cursor, resource, args):
+    """
+    Returns {'items': [...], 'next': cursor-or-None} for one page of `resource`.
+    `args` is request.args: sort, order (asc|desc), limit, after, plus the resource's filters.
+    Raises KeyError/ValueError for unknown resources, sorts or malformed cursors.
+    """
+    sql, params, limit = page_query(resource, args)
+    spec = RESOURCES[resource]
+    _, sort_key, null_as = spec['sorts'][args.get('sort') or spec['default'][0]]
+    pk_key = spec['pk'][1]
+
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    nxt = None
+    if has_more:
+        last = rows[-1][sort_key]
+        nxt = encode_cursor([null_as if last is None else last, rows[-1][pk_key]])
+    return {'items': rows, 'next': nxt}
@@ -0,0 +1,247 @@
+"""
+Exam-window load test.
+
+Seeds a bench quiz with N students, then replays the exam-start burst: every student
+logs in, opens the dashboard and the exam, autosaves answers one by one, submits and
+downloads the certificate, with `--concurrency` students in flight at once. Reports
+p50/p95/p99 latency, throughput and DB queries per request for each route, and can
+save the numbers as JSON and compare a run against a saved baseline.
+
+Two drivers:
+  in-process (default)  Flask test client
+  --url http://host     real HTTP against a running server
+Queries per request come from the X-DB-Queries response header (instrumentation.py).
+
+With QCMS_DB_BACKEND=sqlite (after `python migrations.py migrate`) the whole run uses
+an embedded database file, no MySQL server needed.
+
+CLI:
+  python loadtest.py seed --students 500 --questions 40
+  python loadtest.py run --students 500 --concurrency 100 --answers 40 [--url URL] [--out run.json] [--baseline base.json]
+  python loadtest.py reset
+
+Bench rows are recognisable by the 'Bench Quiz' title and @bench.local emails and are
+removed by `reset` (and before every `seed`).
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from database import get_db_connection
+import aggregates
+
+QUIZ_TITLE = 'Bench Quiz'
+EMAIL = 'bench_student_{}@bench.local'
+PASSWORD = 'bench'
+
+_ATTEMPT_RE = re.compile(r'const ATTEMPT_ID = (\d+);')
+_QUESTIONS_RE = re.compile(r'const questions = (.*);')
+
+
+# --- Seeding ---
+def reset(cursor):
+    cursor.execute("SELECT quiz_id FROM Quizzes WHERE title=%s", (QUIZ_TITLE,))
+    for row in cursor.fetchall():
+        quiz_id = row['quiz_id']
+        cursor.execute("DELETE FROM Quiz_Responses WHERE attempt_id IN (SELECT attempt_id FROM Quiz_Attempts WHERE quiz_id=%s)", (quiz_id,))
+        cursor.execute("DELETE FROM Quiz_Attempts WHERE quiz_id=%s", (quiz_id,))
+        cursor.execute("DELETE FROM Questions WHERE quiz_id=%s", (quiz_id,))
+        cursor.execute("DELETE FROM Quizzes WHERE quiz_id=%s", (quiz_id,))
+        aggregates.forget_quiz(cursor, quiz_id)
+    # '!' as the escape character: a backslash literal is spelled differently in MySQL and SQLite
+    cursor.execute("DELETE FROM Users WHERE email LIKE %s ESCAPE '!'", ('bench!_student!_%@bench.local',))
+
+def seed(students, questions, duration=60):
+    """Creates the bench quiz, its questions and students; returns the quiz_id."""
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        reset(cursor)
+        cursor.execute("""INSERT INTO Quizzes (title, category, duration_minutes, total_marks, start_time)
+                          VALUES (%s, 'Bench', %s, %s, NULL)""", (QUIZ_TITLE, duration, questions))
+        quiz_id = cursor.lastrowid
+        cursor.executemany("""INSERT INTO Questions (quiz_id, question_type, question_text, option_a, option_b, option_c, option_d, correct_option, marks)
+                              VALUES (%s, 'MCQ', %s, 'a', 'b', 'c', 'd', %s, 1)""",
+                           [(quiz_id, f"Bench question {i}", 'ABCD'[i % 4]) for i in range(questions)])
+        cursor.executemany("INSERT INTO Users (full_name, email, password_hash, role) VALUES (%s, %s, %s, 'Student')",
+                           [(f"Bench Student {i}", EMAIL.format(i), PASSWORD) for i in range(students)])
+    conn.commit()
+    conn.close()
+    return quiz_id
+
+def bench_quiz_id():
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT quiz_id FROM Quizzes WHERE title=%s ORDER BY quiz_id DESC LIMIT 1", (QUIZ_TITLE,))
+        row = cursor.fetchone()
+    conn.close()
+    return row['quiz_id'] if row else None
+
+def approve(attempt_id):
+    # Done by an admin in real life; kept out of the timings
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        cursor.execute("UPDATE Quiz_Attempts SET certificate_approved=1 WHERE attempt_id=%s", (attempt_id,))
+    conn.commit()
+    conn.close()
+
+
+# --- Drivers ---
+def _queries(res):
+    queries = res.headers.get('X-DB-Queries')
+    return int(queries) if queries is not None else None
+
+class InProcessClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, form=None, json_body=None):
+        res = self.client.open(path, method=method, data=form, json=json_body)
+        return res.status_code, res.get_data().decode('utf-8', 'replace'), _queries(res)  # certificates are binary
+
+class HttpClient:
+    def __init__(self, url):
+        import requests
+        self.url = url.rstrip('/')
+        self.session = requests.Session()
+
+    def request(self, method, path, form=None, json_body=None):
+        res = self.session.request(method, self.url + path, data=form, json=json_body, allow_redirects=False, timeout=60)
+        return res.status_code, res.text, _queries(res)
+
+
+# --- Recording ---
+def _json_error(body):
+    if not body.startswith('{'): return False
+    try: return json.loads(body).get('status') == 'error'
+    except ValueError: return False
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def timed(self, client, route, method, path, **kwargs):
+        started = time.perf_counter()
+        status, body, queries = client.request(method, path, **kwargs)
+        elapsed = (time.perf_counter() - started) * 1000
+        ok = status < 400 and 'Login Failed' not in body and not _json_error(body)
+        with self._lock:
+            self.samples.setdefault(route, []).append((elapsed, queries, ok))
+        return status, body
+
+def _pct(xs, p):
+    return round(xs[min(len(xs) - 1, int(p * len(xs)))], 2) if xs else 0.0
+
+def summarize(samples, wall):
+    report = {}
+    for route, rows in samples.items():
+        times = sorted(t for t, _, _ in rows)
+        queries = [q for _, q, _ in rows if q is not None]
+        report[route] = {'n': len(rows), 'errors': sum(1 for _, _, ok in rows if not ok),
+                         'p50': _pct(times, 0.50), 'p95': _pct(times, 0.95), 'p99': _pct(times, 0.99), 'max': round(times[-1], 2),
+                         'rps': round(len(rows) / wall, 1) if wall else 0.0,
+                         'queries': round(sum(queries) / len(queries), 1) if queries else None}
+    return report
+
+
+# --- Exam flow ---
+def student_flow(client, rec, index, quiz_id, answers, think):
+    rec.timed(client, 'POST /', 'POST', '/', form={'email': EMAIL.format(index), 'password': PASSWORD})
+    rec.timed(client, 'GET /student', 'GET', '/student')
+    status, page = rec.timed(client, 'GET /quiz/<id>', 'GET', f'/quiz/{quiz_id}')
+    match = _ATTEMPT_RE.search(page)
+    if status != 200 or not match: return
+    attempt_id = int(match.group(1))
+    questions = json.loads(_QUESTIONS_RE.search(page).group(1))
+    for q in questions[:answers]:
+        rec.timed(client, 'POST /api/save_answer', 'POST', '/api/save_answer',
+                  json_body={'attempt_id': attempt_id, 'question_id': q['question_id'], 'option': random.choice('ABCD')})
+        if think: time.sleep(think / 1000)
+    rec.timed(client, 'POST /api/submit_quiz', 'POST', '/api/submit_quiz', json_body={'attempt_id': attempt_id})
+    approve(attempt_id)
+    rec.timed(client, 'GET /download/cert/<id>', 'GET', f'/download/cert/{attempt_id}')
+
+def run(students, concurrency, answers, url=None, think=0):
+    quiz_id = bench_quiz_id()
+    if not quiz_id: sys.exit("No bench data: run `python loadtest.py seed` first")
+    if url:
+        make_client = lambda: HttpClient(url)
+    else:
+        from app import create_app, start_services
+        app = create_app()
+        start_services(app)
+        make_client = lambda: InProcessClient(app)
+
+    # Attempts from a previous run would make /quiz/<id> answer "Exam Finished"
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        cursor.execute("DELETE FROM Quiz_Responses WHERE attempt_id IN (SELECT attempt_id FROM Quiz_Attempts WHERE quiz_id=%s)", (quiz_id,))
+        cursor.execute("DELETE FROM Quiz_Attempts WHERE quiz_id=%s", (quiz_id,))
+        aggregates.forget_quiz(cursor, quiz_id)
+    conn.commit()
+    conn.close()
+
+    rec = Recorder()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(student_flow, make_client(), rec, i, quiz_id, answers, think) for i in range(students)]
+        failed = 0
+        for f in futures:
+            try: f.result()
+            except Exception as e:
+                failed += 1
+                print(f"Flow Error: {e}")
+    wall = time.perf_counter() - started
+    return {'config': {'students': students, 'concurrency': concurrency, 'answers': answers, 'driver': url or 'in-process'},
+            'wall_seconds': round(wall, 2), 'failed_flows': failed, 'routes': summarize(rec.samples, wall)}
+
+def print_report(result, baseline=None):
+    print(f"{result['config']}  wall {result['wall_seconds']}s  failed flows {result['failed_flows']}")
+    print(f"{'route':28} {'n':>6} {'err':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'req/s':>7} {'q/req':>6}" + ('  p95 vs base' if baseline else ''))
+    for route, r in result['routes'].items():
+        line = (f"{route:28} {r['n']:>6} {r['errors']:>5} {r['p50']:>8} {r['p95']:>8} {r['p99']:>8} {r['max']:>8} {r['rps']:>7} "
+                f"{r['queries'] if r['queries'] is not None else '-':>6}")
+        base = (baseline or {}).get('routes', {}).get(route)
+        if base and base['p95']:
+            line += f"  {(r['p95'] - base['p95']) / base['p95'] * 100:+.0f}%"
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Exam-window load test")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_seed = sub.add_parser('seed')
+    p_seed.add_argument('--students', type=int, default=200)
+    p_seed.add_argument('--questions', type=int, default=30)
+    p_seed.add_argument('--duration', type=int, default=60, help="quiz duration in minutes")
+    p_run = sub.add_parser('run')
+    p_run.add_argument('--students', type=int, default=200)
+    p_run.add_argument('--concurrency', type=int, default=50)
+    p_run.add_argument('--answers', type=int, default=30, help="autosaves per student")
+    p_run.add_argument('--think', type=int, default=0, help="ms between autosaves")
+    p_run.add_argument('--url', help="drive a running server instead of the in-process test client")
+    p_run.add_argument('--out', help="write the results as JSON")
+    p_run.add_argument('--baseline', help="compare p95 against a previous --out file")
+    sub.add_parser('reset')
+    args = parser.parse_args()
+
+    if args.command == 'seed':
+        print(f"Seeded bench quiz {seed(args.students, args.questions, args.duration)} with {args.students} students")
+    elif args.command == 'reset':
+        conn = get_db_connection()
+        with conn.cursor() as cursor: reset(cursor)
+        conn.commit()
+        conn.close()
+        print("Bench data removed")
+    else:
+        result = run(args.students, args.concurrency, args.answers, url=args.url, think=args.think)
+        baseline = None
+        if args.baseline:
+            with open(args.baseline) as f: baseline = json.load(f)
+        print_report(result, baseline)
+        if args.out:
+            with open(args.out, 'w') as f: json.dump(result, f, indent=2)
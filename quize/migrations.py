@@ -0,0 +1,312 @@
+"""
+Versioned schema migrations.
+
+`migrate` first runs schema.sql (CREATE TABLE IF NOT EXISTS, so a no-op for tables that
+already exist) and then every migration below whose version isn't yet recorded in
+Schema_Migrations. Migrations check information_schema before each change, so they
+are safe on databases that were created by hand and already have some of it.
+
+`check` runs EXPLAIN on the statements behind the hot routes (taken from the modules
+that execute them) and fails if any of them scans a whole table: on MySQL when no index
+can serve it or the scan is estimated above SCAN_ROWS rows.
+
+On the embedded SQLite backend, schema_sqlite.sql already creates the final shape, so
+`migrate` only records the versions (run `python search.py rebuild` there to index
+questions saved before the search tables existed), and `check` reads EXPLAIN QUERY PLAN instead.
+
+CLI:  python migrations.py [migrate | status | check]
+"""
+import os
+import sys
+from database import get_db_connection, backend
+import listing
+import search
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), backend.schema_file())
+
+MIGRATIONS = []
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+# --- information_schema helpers ---
+def columns(cursor, table):
+    cursor.execute("""SELECT COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH FROM information_schema.COLUMNS
+                      WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s""", (table,))
+    return {r['COLUMN_NAME'].lower(): r for r in cursor.fetchall()}
+
+def indexes(cursor, table):
+    cursor.execute("""SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS
+                      WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s""", (table,))
+    return {r['INDEX_NAME'].lower() for r in cursor.fetchall()}
+
+def foreign_keys(cursor, table):
+    cursor.execute("""SELECT CONSTRAINT_NAME FROM information_schema.TABLE_CONSTRAINTS
+                      WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND CONSTRAINT_TYPE = 'FOREIGN KEY'""", (table,))
+    return {r['CONSTRAINT_NAME'].lower() for r in cursor.fetchall()}
+
+def add_column(cursor, table, name, ddl):
+    if name.lower() not in columns(cursor, table):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+
+def add_index(cursor, table, name, ddl):
+    """`ddl` is e.g. 'INDEX (a, b)' or 'UNIQUE INDEX (a)'; the name is inserted."""
+    if name.lower() not in indexes(cursor, table):
+        kind, cols = ddl.split('(', 1)
+        cursor.execute(f"ALTER TABLE {table} ADD {kind.strip()} {name} ({cols}")
+
+def add_foreign_key(cursor, table, name, ddl):
+    if name.lower() not in foreign_keys(cursor, table):
+        cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {ddl}")
+
+
+# --- Migrations (append only; never edit one that has shipped) ---
+@migration(1, "Bring columns in line with the application code")
+def sync_columns(cursor):
+    for name, ddl in [('email', 'VARCHAR(150)'), ('password_hash', 'VARCHAR(255)'),
+                      ('selected_session', 'VARCHAR(100)'), ('is_blocked', 'BOOLEAN DEFAULT 0')]:
+        add_column(cursor, 'Users', name, ddl)
+    for name, ddl in [('category', 'VARCHAR(100)'), ('duration_minutes', 'INT'), ('total_marks', 'INT'), ('start_time', 'VARCHAR(30)')]:
+        add_column(cursor, 'Quizzes', name, ddl)
+    for name, ddl in [('quiz_id', 'INT'), ('question_type', "VARCHAR(10) DEFAULT 'MCQ'"), ('text_hash', 'CHAR(40)'),
+                      ('option_a', 'TEXT'), ('option_b', 'TEXT'), ('option_c', 'TEXT'), ('option_d', 'TEXT'),
+                      ('test_input', 'TEXT'), ('test_output', 'TEXT')]:
+        add_column(cursor, 'Questions', name, ddl)
+    for name, ddl in [('quiz_id', 'INT'), ('certificate_approved', 'BOOLEAN DEFAULT 0'), ('last_sync_seq', 'INT DEFAULT 0'),
+                      ('question_order', 'TEXT'), ('submitted_at', 'DATETIME')]:
+        add_column(cursor, 'Quiz_Attempts', name, ddl)
+    for name, ddl in [('is_flagged', 'BOOLEAN DEFAULT 0'), ('test_results', 'TEXT'), ('run_time_ms', 'INT')]:
+        add_column(cursor, 'Quiz_Responses', name, ddl)
+    # 'CODE_SUCCESS' doesn't fit the original VARCHAR(1)
+    col = columns(cursor, 'Quiz_Responses')['selected_option']
+    if (col['CHARACTER_MAXIMUM_LENGTH'] or 0) < 20:
+        cursor.execute("ALTER TABLE Quiz_Responses MODIFY selected_option VARCHAR(20)")
+    cursor.execute("INSERT IGNORE INTO Announcements (id, message, is_active) VALUES (1, '', 0)")
+
+@migration(2, "Unique and secondary indexes for the hot queries")
+def add_indexes(cursor):
+    cursor.execute("SELECT email, COUNT(*) AS n FROM Users WHERE email IS NOT NULL GROUP BY email HAVING n > 1 LIMIT 10")
+    dupes = [r['email'] for r in cursor.fetchall()]
+    if dupes:
+        raise RuntimeError(f"Users.email has duplicates, merge them before migrating: {', '.join(dupes)}")
+    # Without the unique key, ON DUPLICATE KEY upserts inserted extra rows; keep the newest
+    cursor.execute("""DELETE r FROM Quiz_Responses r JOIN Quiz_Responses newer
+                      ON newer.attempt_id = r.attempt_id AND newer.question_id = r.question_id AND newer.response_id > r.response_id""")
+    add_index(cursor, 'Users', 'uq_users_email', 'UNIQUE INDEX (email)')
+    add_index(cursor, 'Users', 'idx_users_role', 'INDEX (role)')
+    add_index(cursor, 'Questions', 'idx_questions_quiz', 'INDEX (quiz_id, text_hash)')
+    if 'idx_questions_hash' in indexes(cursor, 'Questions'):
+        cursor.execute("ALTER TABLE Questions DROP INDEX idx_questions_hash")  # covered by idx_questions_quiz
+    add_index(cursor, 'Quiz_Attempts', 'idx_attempts_user', 'INDEX (user_id, quiz_id)')
+    add_index(cursor, 'Quiz_Attempts', 'idx_attempts_board', 'INDEX (quiz_id, status, total_score)')
+    add_index(cursor, 'Quiz_Responses', 'uq_responses_attempt_question', 'UNIQUE INDEX (attempt_id, question_id)')
+    add_index(cursor, 'Quiz_Responses', 'idx_responses_question', 'INDEX (question_id)')
+    add_index(cursor, 'Question_Tests', 'idx_tests_question', 'INDEX (question_id, position)')
+
+@migration(3, "Foreign keys between users, quizzes, questions, attempts and responses")
+def add_foreign_keys(cursor):
+    for table in ('Users', 'Quizzes', 'Questions', 'Quiz_Attempts', 'Quiz_Responses', 'Question_Tests'):
+        cursor.execute(f"ALTER TABLE {table} ENGINE=InnoDB")
+    # Rows the application already treats as gone would block the constraints
+    cursor.execute("UPDATE Questions SET quiz_id = NULL WHERE quiz_id = 0")
+    cursor.execute("DELETE q FROM Questions q LEFT JOIN Quizzes z ON q.quiz_id = z.quiz_id WHERE q.quiz_id IS NOT NULL AND z.quiz_id IS NULL")
+    cursor.execute("UPDATE Quiz_Attempts a LEFT JOIN Users u ON a.user_id = u.user_id SET a.user_id = NULL WHERE a.user_id IS NOT NULL AND u.user_id IS NULL")
+    cursor.execute("DELETE a FROM Quiz_Attempts a LEFT JOIN Quizzes z ON a.quiz_id = z.quiz_id WHERE a.quiz_id IS NOT NULL AND z.quiz_id IS NULL")
+    cursor.execute("DELETE r FROM Quiz_Responses r LEFT JOIN Quiz_Attempts a ON r.attempt_id = a.attempt_id WHERE a.attempt_id IS NULL")
+    cursor.execute("DELETE r FROM Quiz_Responses r LEFT JOIN Questions q ON r.question_id = q.question_id WHERE q.question_id IS NULL")
+    cursor.execute("DELETE t FROM Question_Tests t LEFT JOIN Questions q ON t.question_id = q.question_id WHERE q.question_id IS NULL")
+
+    add_foreign_key(cursor, 'Questions', 'fk_questions_quiz', "FOREIGN KEY (quiz_id) REFERENCES Quizzes (quiz_id) ON DELETE CASCADE")
+    add_foreign_key(cursor, 'Quiz_Attempts', 'fk_attempts_user', "FOREIGN KEY (user_id) REFERENCES Users (user_id) ON DELETE SET NULL")
+    add_foreign_key(cursor, 'Quiz_Attempts', 'fk_attempts_quiz', "FOREIGN KEY (quiz_id) REFERENCES Quizzes (quiz_id) ON DELETE CASCADE")
+    add_foreign_key(cursor, 'Quiz_Responses', 'fk_responses_attempt', "FOREIGN KEY (attempt_id) REFERENCES Quiz_Attempts (attempt_id) ON DELETE CASCADE")
+    add_foreign_key(cursor, 'Quiz_Responses', 'fk_responses_question', "FOREIGN KEY (question_id) REFERENCES Questions (question_id) ON DELETE CASCADE")
+    add_foreign_key(cursor, 'Question_Tests', 'fk_tests_question', "FOREIGN KEY (question_id) REFERENCES Questions (question_id) ON DELETE CASCADE")
+
+@migration(4, "Record when each attempt started (drives the live exam clock)")
+def attempt_started_at(cursor):
+    add_column(cursor, 'Quiz_Attempts', 'started_at', 'DATETIME')
+
+@migration(5, "Attempt deadlines for the server-side timer and auto-submit sweeper")
+def attempt_deadlines(cursor):
+    add_column(cursor, 'Quiz_Attempts', 'deadline', 'DATETIME')
+    add_index(cursor, 'Quiz_Attempts', 'idx_attempts_deadline', 'INDEX (status, deadline)')
+    # Open attempts from before the timer existed get a full window from now, then the sweeper closes them
+    cursor.execute("UPDATE Quiz_Attempts SET started_at = NOW() WHERE status = 'In-Progress' AND started_at IS NULL")
+    cursor.execute("""UPDATE Quiz_Attempts a JOIN Quizzes q ON a.quiz_id = q.quiz_id
+                      SET a.deadline = a.started_at + INTERVAL COALESCE(q.duration_minutes, 30) MINUTE
+                      WHERE a.status = 'In-Progress' AND a.deadline IS NULL""")
+
+@migration(6, "Quizzes.start_time as a native DATETIME")
+def start_time_datetime(cursor):
+    if columns(cursor, 'Quizzes')['start_time']['DATA_TYPE'].lower() != 'datetime':
+        # Stored strings are 'YYYY-MM-DD HH:MM:SS' or datetime-local 'YYYY-MM-DDTHH:MM'
+        cursor.execute("UPDATE Quizzes SET start_time = NULL WHERE TRIM(start_time) = ''")
+        cursor.execute("UPDATE Quizzes SET start_time = REPLACE(TRIM(start_time), 'T', ' ') WHERE start_time IS NOT NULL")
+        cursor.execute("UPDATE Quizzes SET start_time = CONCAT(start_time, ':00') WHERE LENGTH(start_time) = 16")
+        cursor.execute("SELECT quiz_id, start_time FROM Quizzes WHERE start_time IS NOT NULL AND STR_TO_DATE(start_time, '%%Y-%%m-%%d %%H:%%i:%%s') IS NULL", ())
+        bad = cursor.fetchall()
+        if bad:
+            raise RuntimeError(f"Unparseable Quizzes.start_time values: {[(r['quiz_id'], r['start_time']) for r in bad]}")
+        cursor.execute("ALTER TABLE Quizzes MODIFY start_time DATETIME")
+    add_index(cursor, 'Quizzes', 'idx_quizzes_start', 'INDEX (start_time)')
+
+@migration(7, "Backfill the question search and near-duplicate index")
+def search_index(cursor):
+    # The tables come from schema.sql; existing questions are indexed here, new ones as they are saved
+    print(f"  indexed {search.rebuild(cursor)} question(s)")
+
+@migration(8, "Indexes for the results listing sorted by score and filtered by category")
+def listing_indexes(cursor):
+    add_index(cursor, 'Quiz_Attempts', 'idx_attempts_score', 'INDEX (total_score)')
+    add_index(cursor, 'Quizzes', 'idx_quizzes_category', 'INDEX (category)')
+
+
+# --- Runner ---
+def _schema_statements():
+    with open(SCHEMA_FILE, encoding='utf-8') as f:
+        lines = [line for line in f if not line.lstrip().startswith('--')]
+    return [s.strip() for s in ''.join(lines).split(';') if s.strip()]
+
+def applied_versions(cursor):
+    cursor.execute("""CREATE TABLE IF NOT EXISTS Schema_Migrations (
+                          version INT PRIMARY KEY, description VARCHAR(200), applied_at DATETIME)""")
+    cursor.execute("SELECT version FROM Schema_Migrations")
+    return {r['version'] for r in cursor.fetchall()}
+
+def migrate(conn):
+    """Applies pending migrations in order; returns the versions applied."""
+    done = []
+    with conn.cursor() as cursor:
+        for stmt in _schema_statements():
+            cursor.execute(stmt)
+        applied = applied_versions(cursor)
+        for version, description, fn in MIGRATIONS:
+            if version in applied: continue
+            print(f"Applying {version}: {description}")
+            if backend.name == 'mysql':
+                fn(cursor)  # DDL commits implicitly in MySQL; data fixes are committed with the version row
+            cursor.execute("INSERT INTO Schema_Migrations (version, description, applied_at) VALUES (%s, %s, NOW())", (version, description))
+            conn.commit()
+            done.append(version)
+    return done
+
+
+# --- EXPLAIN check ---
+SCAN_ROWS = 1000  # MySQL: a full scan estimated above this many rows fails even when indexes exist
+
+# A sample value per listing filter, to EXPLAIN each one
+LISTING_SAMPLES = {'quiz_id': '1', 'category': 'General', 'type': 'MCQ', 'q': 'python loop', 'status': 'Completed'}
+# Accepted scans per (resource, sort): COALESCE(marks, 0) would need an expression index,
+# which MariaDB lacks; the question bank is read this way by staff only
+LISTING_SCANS = {('questions', 'marks'): ('q',)}
+
+def _listing_queries():
+    for resource, spec in listing.RESOURCES.items():
+        for sort in spec['sorts']:
+            scan_ok = LISTING_SCANS.get((resource, sort), ())
+            for order in ('asc', 'desc'):
+                args = {'sort': sort, 'order': order}
+                yield (f"{resource} page ({sort} {order})", *listing.page_query(resource, args)[:2], scan_ok)
+                args['after'] = listing.encode_cursor([1, 1])
+                yield (f"{resource} next page ({sort} {order})", *listing.page_query(resource, args)[:2], scan_ok)
+        for name in spec['filters']:
+            sql, params, _ = listing.page_query(resource, {name: LISTING_SAMPLES[name]})
+            yield (f"{resource} filtered by {name}", sql, params, ())
+
+def hot_queries():
+    """
+    (name, sql, params, tables allowed to be read in full) for the busiest routes, built
+    from the statements those routes execute (module constants and the builders
+    listing.py / search.py use), so the check can't drift from the code.
+    """
+    from blueprints import admin, auth, certificates, exam
+    import aggregates, answer_buffer, code_grading, events, importer, jobs, scoring, state
+    ratio = scoring.NEGATIVE_MARK_RATIO
+    return [
+        ('login', auth.LOGIN_SQL, ('a@b.c', 'x'), ()),
+        ('register: email check', auth.EMAIL_SQL, ('a@b.c',), ()),
+        ('coordinators', admin.COORDINATORS_SQL, (), ()),
+        ('quiz paper', state.PAPER_SQL, (1,), ()),
+        ('question -> quiz', state.QUESTION_QUIZ_SQL, (1,), ()),
+        ('student quiz list (cached)', state.SCHEDULE_SQL, (), ('Quizzes',)),
+        ('attempt deadline', state.DEADLINE_SQL, (1,), ()),
+        ('open attempt', state.OPEN_ATTEMPT_SQL, (1,), ()),
+        ('buffer flush: open attempts', answer_buffer.open_attempts_sql(2), (1, 2), ()),
+        ('import dedup', importer.HASHES_SQL, (1,), ()),
+        ('attempt lookup', exam.ATTEMPT_SQL, (1, 1), ()),
+        ('attempt responses', exam.RESPONSES_SQL, (1,), ()),
+        ('student history', exam.HISTORY_SQL, (1,), ()),
+        ('score attempt', scoring.SUBMIT_SQL, (ratio, 1, 1), ()),
+        ('regrade quiz', scoring.REGRADE_SQL, (ratio, 1, 1), ()),
+        ('expired attempts', scoring.EXPIRED_SQL, (-30, 500), ()),
+        ('leaderboard', aggregates.TOP_SQL, (1, 10), ()),
+        ('quiz stats', aggregates.HISTOGRAM_SQL, (1,), ()),
+        ('certificate', certificates.CERTIFICATE_SQL, (1,), ()),
+        ('code tests', code_grading.TESTS_SQL, (1,), ()),
+        ('job claim', jobs.CLAIM_SQL, ('x',), ()),
+        ('job by token', jobs.CLAIMED_SQL, ('x',), ()),
+        ('event poll', events.POLL_SQL, (1, events.POLL_BATCH), ()),
+        ('event prune', events.PRUNE_SQL, (-events.RETAIN,), ()),
+        ('search postings', search.df_sql(2), ('loop', 'python'), ()),
+        ('search: bank size', search.COUNT_SQL, (), ('Questions',)),
+        ('search ranking', search.rank_sql(2), ('loop', 1.0, 'python', 1.0, 'loop', 'python', 20), ()),
+        ('search ranking in quiz', search.rank_sql(2, in_quiz=True), ('loop', 1.0, 'python', 1.0, 'loop', 'python', 1, 20), ()),
+        ('near-duplicate buckets', search.buckets_sql(2), (1, 2), ()),
+        *_listing_queries(),
+    ]
+
+def explain_check(cursor, queries=None):
+    """Returns a list of problems: queries that scan a whole table instead of using an index."""
+    problems = []
+    for name, sql, params, scan_ok in queries or hot_queries():
+        if backend.name == 'sqlite':
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            details = [row['detail'] for row in cursor.fetchall()]
+            # A SCAN (of the table or a whole index) reads every row, unless it already walks in
+            # ORDER BY order (no temp b-tree) and LIMIT stops it after the first page
+            walk = 'LIMIT' in sql.upper() and not any('FOR ORDER BY' in d for d in details)
+            for detail in details:
+                words = detail.split()
+                if words[0] == 'SCAN' and not walk and words[1] not in scan_ok:
+                    problems.append(f"{name}: full scan of {words[1]}")
+            continue
+        cursor.execute("EXPLAIN " + sql, params)
+        for row in cursor.fetchall():
+            table = row.get('table') or ''
+            if row.get('type') != 'ALL' or table in scan_ok or table.startswith('<'): continue
+            # No usable index at all, or one the optimiser still skips on a table of real size
+            if not row.get('possible_keys') or (row.get('rows') or 0) > SCAN_ROWS:
+                problems.append(f"{name}: full scan of {table} (~{row.get('rows')} rows)")
+    return problems
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) == 2 else None
+    if command not in ('migrate', 'status', 'check'):
+        sys.exit("usage: python migrations.py [migrate | status | check]")
+    conn = get_db_connection()
+    if conn is None: sys.exit(1)
+    if command == 'migrate':
+        done = migrate(conn)
+        print(f"Applied {len(done)} migration(s)" if done else "Schema is up to date")
+    elif command == 'status':
+        with conn.cursor() as cursor:
+            applied = applied_versions(cursor)
+        for version, description, _ in MIGRATIONS:
+            print(f"[{'x' if version in applied else ' '}] {version}: {description}")
+    else:
+        queries = hot_queries()
+        with conn.cursor() as cursor:
+            problems = explain_check(cursor, queries)
+        conn.close()
+        for p in problems: print(p)
+        if problems: sys.exit(f"{len(problems)} full table scan(s) found")
+        print(f"OK: {len(queries)} queries checked")
+        sys.exit(0)
+    conn.close()
@@ -0,0 +1,33 @@
+import random
+
+# Per-attempt paper order. Everything here is seeded from the attempt_id, so the
+# same attempt always sees the same order and nothing needs re-shuffling on reload.
+
+def question_order(attempt_id, question_ids):
+    """Seeded permutation of question_ids for one attempt."""
+    order = sorted(question_ids)  # seed must not depend on fetch order
+    random.Random(int(attempt_id)).shuffle(order)
+    return order
+
+def encode_order(order):
+    """Compact form stored in Quiz_Attempts.question_order."""
+    return ','.join(str(qid) for qid in order)
+
+def decode_order(text):
+    return [int(x) for x in text.split(',')] if text else []
+
+def apply_order(questions, order):
+    """
+    Returns the shared question dicts re-arranged by `order` (no copies are made).
+    Questions added after the order was stored go last; deleted ones are skipped.
+    """
+    by_id = {q['question_id']: q for q in questions}
+    ordered = [by_id.pop(qid) for qid in order if qid in by_id]
+    ordered.extend(by_id.values())
+    return ordered
+
+def option_order(attempt_id, question_id):
+    """Seeded order of the MCQ option letters, e.g. 'CADB'."""
+    letters = list('ABCD')
+    random.Random(f"{attempt_id}:{question_id}").shuffle(letters)
+    return ''.join(letters)
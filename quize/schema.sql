@@ -1,33 +1,167 @@
+-- Fresh installs: `python migrations.py migrate` creates these tables and then applies
+-- the versioned migrations in migrations.py (which bring older databases to the same shape).
+
 CREATE TABLE IF NOT EXISTS Users (
     user_id INT PRIMARY KEY AUTO_INCREMENT,
     full_name VARCHAR(100),
-    role ENUM('Admin', 'Coordinator', 'Student')
+    email VARCHAR(150),
+    password_hash VARCHAR(255),
+    role ENUM('Admin', 'Coordinator', 'Student'),
+    selected_session VARCHAR(100),
+    is_blocked BOOLEAN DEFAULT 0,
+    UNIQUE INDEX uq_users_email (email),
+    INDEX idx_users_role (role)
 );
 
 CREATE TABLE IF NOT EXISTS Quizzes (
     quiz_id INT PRIMARY KEY AUTO_INCREMENT,
     title VARCHAR(200),
-    marks INT
+    category VARCHAR(100),
+    duration_minutes INT,
+    total_marks INT,
+    start_time DATETIME,
+    marks INT,
+    INDEX idx_quizzes_start (start_time),
+    INDEX idx_quizzes_category (category)
+);
+
+CREATE TABLE IF NOT EXISTS Questions (
+    question_id INT PRIMARY KEY AUTO_INCREMENT,
+    quiz_id INT,
+    question_type VARCHAR(10) DEFAULT 'MCQ',
+    question_text TEXT,
+    text_hash CHAR(40),  -- sha1 of normalised question_text, for import de-duplication
+    option_a TEXT,
+    option_b TEXT,
+    option_c TEXT,
+    option_d TEXT,
+    correct_option VARCHAR(1),
+    marks INT,
+    test_input TEXT,
+    test_output TEXT,
+    INDEX idx_questions_quiz (quiz_id, text_hash),
+    CONSTRAINT fk_questions_quiz FOREIGN KEY (quiz_id) REFERENCES Quizzes (quiz_id) ON DELETE CASCADE
 );
 
 CREATE TABLE IF NOT EXISTS Quiz_Attempts (
     attempt_id INT PRIMARY KEY AUTO_INCREMENT,
     user_id INT,
+    quiz_id INT,
     total_score DECIMAL(5,2),
-    status VARCHAR(20)
+    status VARCHAR(20),
+    certificate_approved BOOLEAN DEFAULT 0,
+    last_sync_seq INT DEFAULT 0,
+    question_order TEXT,
+    started_at DATETIME,
+    deadline DATETIME,
+    submitted_at DATETIME,
+    INDEX idx_attempts_user (user_id, quiz_id),
+    INDEX idx_attempts_deadline (status, deadline),
+    INDEX idx_attempts_board (quiz_id, status, total_score),
+    INDEX idx_attempts_score (total_score),
+    CONSTRAINT fk_attempts_user FOREIGN KEY (user_id) REFERENCES Users (user_id) ON DELETE SET NULL,
+    CONSTRAINT fk_attempts_quiz FOREIGN KEY (quiz_id) REFERENCES Quizzes (quiz_id) ON DELETE CASCADE
 );
 
 CREATE TABLE IF NOT EXISTS Quiz_Responses (
     response_id INT PRIMARY KEY AUTO_INCREMENT,
     attempt_id INT,
     question_id INT,
-    selected_option VARCHAR(1),
-    is_attempted BOOLEAN
+    selected_option VARCHAR(20),  -- A-D, or CODE_SUCCESS / CODE_FAIL
+    is_attempted BOOLEAN,
+    is_flagged BOOLEAN DEFAULT 0,
+    test_results TEXT,
+    run_time_ms INT,
+    UNIQUE INDEX uq_responses_attempt_question (attempt_id, question_id),
+    INDEX idx_responses_question (question_id),
+    CONSTRAINT fk_responses_attempt FOREIGN KEY (attempt_id) REFERENCES Quiz_Attempts (attempt_id) ON DELETE CASCADE,
+    CONSTRAINT fk_responses_question FOREIGN KEY (question_id) REFERENCES Questions (question_id) ON DELETE CASCADE
 );
 
-CREATE TABLE IF NOT EXISTS Questions (
-    question_id INT PRIMARY KEY AUTO_INCREMENT,
-    question_text TEXT,
-    correct_option VARCHAR(1),
-    marks INT
+CREATE TABLE IF NOT EXISTS Announcements (
+    id INT PRIMARY KEY,
+    message TEXT,
+    is_active BOOLEAN DEFAULT 0
+);
+
+-- Precomputed result aggregates (maintained by aggregates.py)
+CREATE TABLE IF NOT EXISTS Quiz_Stats (
+    quiz_id INT PRIMARY KEY,
+    attempts INT NOT NULL DEFAULT 0,
+    score_sum DECIMAL(12,2) NOT NULL DEFAULT 0,
+    score_max DECIMAL(5,2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS Quiz_Score_Histogram (
+    quiz_id INT,
+    bucket INT,
+    n INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (quiz_id, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS Global_Stats (
+    id INT PRIMARY KEY,
+    students INT NOT NULL DEFAULT 0
+);
+
+-- Hidden test cases for CODE questions (the visible sample stays on Questions)
+CREATE TABLE IF NOT EXISTS Question_Tests (
+    test_id INT PRIMARY KEY AUTO_INCREMENT,
+    question_id INT,
+    position INT DEFAULT 0,
+    input TEXT,
+    expected_output TEXT,
+    INDEX idx_tests_question (question_id, position),
+    CONSTRAINT fk_tests_question FOREIGN KEY (question_id) REFERENCES Questions (question_id) ON DELETE CASCADE
+);
+
+-- Search index (search.py): postings for full-text search and MinHash/LSH buckets for
+-- near-duplicate detection. Binary collation: terms are already case-folded, and
+-- accent-insensitive comparison would make two distinct terms collide on the key.
+CREATE TABLE IF NOT EXISTS Question_Terms (
+    term VARCHAR(40) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+    question_id INT NOT NULL,
+    tf INT NOT NULL DEFAULT 1,
+    PRIMARY KEY (term, question_id),
+    INDEX idx_terms_question (question_id),
+    CONSTRAINT fk_terms_question FOREIGN KEY (question_id) REFERENCES Questions (question_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS Question_Buckets (
+    bucket BIGINT NOT NULL,
+    question_id INT NOT NULL,
+    PRIMARY KEY (bucket, question_id),
+    INDEX idx_buckets_question (question_id),
+    CONSTRAINT fk_buckets_question FOREIGN KEY (question_id) REFERENCES Questions (question_id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS Jobs (
+    job_id INT PRIMARY KEY AUTO_INCREMENT,
+    kind VARCHAR(50) NOT NULL,
+    payload TEXT,
+    status VARCHAR(20) DEFAULT 'Queued',
+    attempts INT DEFAULT 0,
+    max_attempts INT DEFAULT 3,
+    claim_token CHAR(32),
+    created_by INT,
+    created_at DATETIME,
+    started_at DATETIME,
+    finished_at DATETIME,
+    run_after DATETIME,
+    progress_done INT DEFAULT 0,
+    progress_total INT DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    INDEX idx_jobs_queue (status, run_after),
+    INDEX idx_jobs_claim (claim_token)
+);
+
+-- Live updates (events.py): every worker's poller reads the new rows, old ones are pruned
+CREATE TABLE IF NOT EXISTS Events (
+    event_id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    topic VARCHAR(100) NOT NULL,
+    event VARCHAR(30) NOT NULL,
+    data TEXT,
+    created_at DATETIME,
+    INDEX idx_events_created (created_at)
 );
\ No newline at end of file
@@ -0,0 +1,156 @@
+-- Embedded (QCMS_DB_BACKEND=sqlite) schema: the same tables, columns and indexes as
+-- schema.sql after every migration. `python migrations.py migrate` creates them and
+-- records the migrations as applied. DATETIME columns keep that declared type so
+-- storage.py converts them to datetime objects.
+
+CREATE TABLE IF NOT EXISTS Users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    full_name VARCHAR(100),
+    email VARCHAR(150),
+    password_hash VARCHAR(255),
+    role VARCHAR(20) CHECK (role IN ('Admin', 'Coordinator', 'Student')),
+    selected_session VARCHAR(100),
+    is_blocked BOOLEAN DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_users_email ON Users (email);
+CREATE INDEX IF NOT EXISTS idx_users_role ON Users (role);
+
+CREATE TABLE IF NOT EXISTS Quizzes (
+    quiz_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title VARCHAR(200),
+    category VARCHAR(100),
+    duration_minutes INT,
+    total_marks INT,
+    start_time DATETIME,
+    marks INT
+);
+CREATE INDEX IF NOT EXISTS idx_quizzes_start ON Quizzes (start_time);
+CREATE INDEX IF NOT EXISTS idx_quizzes_category ON Quizzes (category);
+
+CREATE TABLE IF NOT EXISTS Questions (
+    question_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    quiz_id INT REFERENCES Quizzes (quiz_id) ON DELETE CASCADE,
+    question_type VARCHAR(10) DEFAULT 'MCQ',
+    question_text TEXT,
+    text_hash CHAR(40),
+    option_a TEXT,
+    option_b TEXT,
+    option_c TEXT,
+    option_d TEXT,
+    correct_option VARCHAR(1),
+    marks INT,
+    test_input TEXT,
+    test_output TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_questions_quiz ON Questions (quiz_id, text_hash);
+
+CREATE TABLE IF NOT EXISTS Quiz_Attempts (
+    attempt_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT REFERENCES Users (user_id) ON DELETE SET NULL,
+    quiz_id INT REFERENCES Quizzes (quiz_id) ON DELETE CASCADE,
+    total_score DECIMAL(5,2),
+    status VARCHAR(20),
+    certificate_approved BOOLEAN DEFAULT 0,
+    last_sync_seq INT DEFAULT 0,
+    question_order TEXT,
+    started_at DATETIME,
+    deadline DATETIME,
+    submitted_at DATETIME
+);
+CREATE INDEX IF NOT EXISTS idx_attempts_user ON Quiz_Attempts (user_id, quiz_id);
+CREATE INDEX IF NOT EXISTS idx_attempts_deadline ON Quiz_Attempts (status, deadline);
+CREATE INDEX IF NOT EXISTS idx_attempts_board ON Quiz_Attempts (quiz_id, status, total_score);
+CREATE INDEX IF NOT EXISTS idx_attempts_score ON Quiz_Attempts (total_score);
+
+CREATE TABLE IF NOT EXISTS Quiz_Responses (
+    response_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    attempt_id INT REFERENCES Quiz_Attempts (attempt_id) ON DELETE CASCADE,
+    question_id INT REFERENCES Questions (question_id) ON DELETE CASCADE,
+    selected_option VARCHAR(20),
+    is_attempted BOOLEAN,
+    is_flagged BOOLEAN DEFAULT 0,
+    test_results TEXT,
+    run_time_ms INT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_responses_attempt_question ON Quiz_Responses (attempt_id, question_id);
+CREATE INDEX IF NOT EXISTS idx_responses_question ON Quiz_Responses (question_id);
+
+CREATE TABLE IF NOT EXISTS Announcements (
+    id INT PRIMARY KEY,
+    message TEXT,
+    is_active BOOLEAN DEFAULT 0
+);
+INSERT OR IGNORE INTO Announcements (id, message, is_active) VALUES (1, '', 0);
+
+CREATE TABLE IF NOT EXISTS Quiz_Stats (
+    quiz_id INT PRIMARY KEY,
+    attempts INT NOT NULL DEFAULT 0,
+    score_sum DECIMAL(12,2) NOT NULL DEFAULT 0,
+    score_max DECIMAL(5,2) NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS Quiz_Score_Histogram (
+    quiz_id INT,
+    bucket INT,
+    n INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (quiz_id, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS Global_Stats (
+    id INT PRIMARY KEY,
+    students INT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS Question_Tests (
+    test_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    question_id INT REFERENCES Questions (question_id) ON DELETE CASCADE,
+    position INT DEFAULT 0,
+    input TEXT,
+    expected_output TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tests_question ON Question_Tests (question_id, position);
+
+CREATE TABLE IF NOT EXISTS Question_Terms (
+    term VARCHAR(40) NOT NULL,
+    question_id INT NOT NULL REFERENCES Questions (question_id) ON DELETE CASCADE,
+    tf INT NOT NULL DEFAULT 1,
+    PRIMARY KEY (term, question_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_terms_question ON Question_Terms (question_id);
+
+CREATE TABLE IF NOT EXISTS Question_Buckets (
+    bucket BIGINT NOT NULL,
+    question_id INT NOT NULL REFERENCES Questions (question_id) ON DELETE CASCADE,
+    PRIMARY KEY (bucket, question_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_buckets_question ON Question_Buckets (question_id);
+
+CREATE TABLE IF NOT EXISTS Jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind VARCHAR(50) NOT NULL,
+    payload TEXT,
+    status VARCHAR(20) DEFAULT 'Queued',
+    attempts INT DEFAULT 0,
+    max_attempts INT DEFAULT 3,
+    claim_token CHAR(32),
+    created_by INT,
+    created_at DATETIME,
+    started_at DATETIME,
+    finished_at DATETIME,
+    run_after DATETIME,
+    progress_done INT DEFAULT 0,
+    progress_total INT DEFAULT 0,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON Jobs (status, run_after);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON Jobs (claim_token);
+
+CREATE TABLE IF NOT EXISTS Events (
+    event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    topic VARCHAR(100) NOT NULL,
+    event VARCHAR(30) NOT NULL,
+    data TEXT,
+    created_at DATETIME
+);
+CREATE INDEX IF NOT EXISTS idx_events_created ON Events (created_at);
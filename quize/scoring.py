@@ -0,0 +1,97 @@
+"""
+Set-based scoring for quiz attempts.
+
+A response earns the question's `marks` when it is correct (MCQ: selected_option
+matches correct_option, CODE: selected_option is 'CODE_SUCCESS'). Wrong MCQ answers
+lose NEGATIVE_MARK_RATIO * marks. Totals never go below zero.
+
+Scores are computed and written by a single UPDATE ... JOIN per call (a correlated
+UPDATE on SQLite), whether it covers one attempt (submit) or every attempt of a quiz (regrade).
+
+CLI:  python scoring.py regrade <quiz_id>
+"""
+import sys
+from database import get_db_connection, backend
+
+NEGATIVE_MARK_RATIO = 0.0  # e.g. 0.25 deducts a quarter of the marks per wrong MCQ
+
+RESPONSE_POINTS = """
+    CASE
+        WHEN q.question_type = 'CODE' AND r.selected_option = 'CODE_SUCCESS' THEN COALESCE(q.marks, 0)
+        WHEN q.question_type <> 'CODE' AND r.selected_option = q.correct_option THEN COALESCE(q.marks, 0)
+        WHEN q.question_type <> 'CODE' AND r.selected_option IS NOT NULL AND r.selected_option <> '' THEN -COALESCE(q.marks, 0) * %s
+        ELSE 0
+    END"""
+
+def scores_sql(where, inner_where, complete=False):
+    """UPDATE scoring the attempts matching `where`. Params: (NEGATIVE_MARK_RATIO, *inner params, *where params)."""
+    if backend.name == 'sqlite':
+        # No UPDATE ... JOIN in SQLite: the same sum as a correlated subquery per attempt
+        status = ", status='Completed', submitted_at=NOW()" if complete else ""
+        return f"""
+            UPDATE Quiz_Attempts AS a
+            SET total_score = GREATEST(0, COALESCE((SELECT SUM({RESPONSE_POINTS})
+                                                    FROM Quiz_Responses r JOIN Questions q ON r.question_id = q.question_id
+                                                    WHERE r.attempt_id = a.attempt_id AND {inner_where}), 0)){status}
+            WHERE {where}"""
+    status = ", a.status='Completed', a.submitted_at=NOW()" if complete else ""
+    return f"""
+        UPDATE Quiz_Attempts a
+        LEFT JOIN (SELECT r.attempt_id, SUM({RESPONSE_POINTS}) AS score
+                   FROM Quiz_Responses r JOIN Questions q ON r.question_id = q.question_id
+                   WHERE {inner_where}
+                   GROUP BY r.attempt_id) s ON s.attempt_id = a.attempt_id
+        SET a.total_score = GREATEST(0, COALESCE(s.score, 0)){status}
+        WHERE {where}"""
+
+# Params: (NEGATIVE_MARK_RATIO, attempt_id, attempt_id) and (NEGATIVE_MARK_RATIO, quiz_id, quiz_id)
+SUBMIT_SQL = scores_sql("a.attempt_id = %s AND a.status = 'In-Progress'", "r.attempt_id = %s", complete=True)
+REGRADE_SQL = scores_sql("a.quiz_id = %s AND a.status = 'Completed'", "q.quiz_id = %s")
+EXPIRED_SQL = f"""SELECT attempt_id, quiz_id, user_id FROM Quiz_Attempts
+                  WHERE status = 'In-Progress' AND deadline < {backend.add_seconds('NOW()', '%s')}
+                  ORDER BY deadline LIMIT %s FOR UPDATE"""
+
+def score_attempt(cursor, attempt_id):
+    """
+    Scores one In-Progress attempt, marks it Completed and returns the score.
+    Returns None if it was already completed (double submit, or finalized by the sweeper). Caller commits.
+    """
+    cursor.execute(SUBMIT_SQL, (NEGATIVE_MARK_RATIO, attempt_id, attempt_id))
+    if not cursor.rowcount: return None
+    cursor.execute("SELECT total_score FROM Quiz_Attempts WHERE attempt_id=%s", (attempt_id,))
+    row = cursor.fetchone()
+    return float(row['total_score']) if row else 0
+
+def finalize_expired(cursor, grace=0, limit=500):
+    """
+    Scores and completes up to `limit` In-Progress attempts whose deadline passed more
+    than `grace` seconds ago, with one UPDATE for the whole batch. The rows are locked
+    first, so a concurrent submit or a second sweeper can't finalize them twice.
+    Returns [{attempt_id, quiz_id, user_id, score}]. Caller commits.
+    """
+    cursor.execute(EXPIRED_SQL, (-grace, limit))
+    rows = cursor.fetchall()
+    if not rows: return []
+    ids = [r['attempt_id'] for r in rows]
+    fmt = ','.join(['%s'] * len(ids))
+    cursor.execute(scores_sql(f"a.attempt_id IN ({fmt})", f"r.attempt_id IN ({fmt})", complete=True), (NEGATIVE_MARK_RATIO, *ids, *ids))
+    cursor.execute(f"SELECT attempt_id, total_score FROM Quiz_Attempts WHERE attempt_id IN ({fmt})", ids)
+    scores = {r['attempt_id']: float(r['total_score']) for r in cursor.fetchall()}
+    return [dict(r, score=scores.get(r['attempt_id'], 0)) for r in rows]
+
+def regrade_quiz(cursor, quiz_id):
+    """Re-scores every completed attempt of a quiz in one statement. Returns rows touched. Caller commits."""
+    cursor.execute(REGRADE_SQL, (NEGATIVE_MARK_RATIO, quiz_id, quiz_id))
+    return cursor.rowcount
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3 or sys.argv[1] != 'regrade':
+        sys.exit("usage: python scoring.py regrade <quiz_id>")
+    conn = get_db_connection()
+    if conn is None: sys.exit(1)
+    with conn.cursor() as cursor:
+        n = regrade_quiz(cursor, int(sys.argv[2]))
+    conn.commit()
+    conn.close()
+    print(f"Regraded quiz {sys.argv[2]}: {n} attempt(s) changed")
@@ -0,0 +1,248 @@
+"""
+Question bank search and near-duplicate detection.
+
+Two index tables are kept next to Questions and written in the same transaction as
+the question itself (add, edit, import), so every worker process sees the same index
+on both storage backends. Rows go away with their question through the foreign keys.
+
+  Question_Terms    inverted index: (term, question_id, tf) over the question text and
+                    the options. A search intersects the postings of the query terms
+                    and ranks by tf * idf, all inside one indexed GROUP BY.
+  Question_Buckets  MinHash / LSH: the question text is cut into word 3-shingles, a
+                    64-value MinHash signature is split into 16 bands of 4, and each
+                    band is hashed to one bucket. Questions sharing a bucket are
+                    candidates; candidates are confirmed by exact shingle Jaccard.
+                    A lookup reads 16 buckets, not the whole bank.
+
+With 16 bands of 4 rows, a pair at Jaccard 0.7 shares a bucket ~98% of the time, a
+pair at 0.3 ~12% of the time (and is then dropped by the exact check).
+
+CLI (backfill after deploying):  python search.py rebuild
+                                 python search.py query <text>
+"""
+import hashlib
+import math
+import random
+import re
+import sys
+from database import get_db_connection
+
+TEXT_WEIGHT = 2          # a term in the question text counts twice one in an option
+MAX_TERM = 40            # Question_Terms.term is VARCHAR(40)
+SEARCH_LIMIT = 20
+SEARCH_MAX = 100
+SIMILAR_THRESHOLD = 0.7  # shingle Jaccard at or above which two questions are flagged
+MAX_CANDIDATES = 200     # per question, most shared buckets first; bounds generic wordings
+LOOKUP_BATCH = 50        # questions per bucket lookup (16 placeholders each)
+
+# Signatures are stored, so these must never change without `python search.py rebuild`
+SHINGLE = 3
+BANDS, ROWS = 16, 4
+_PRIME = (1 << 61) - 1
+_rng = random.Random(7919)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(BANDS * ROWS)]
+
+STOPWORDS = frozenset("""a an and are as at be by for from has how in is it its of on or that the this to
+                         was what when where which who why will with""".split())
+_WORD = re.compile(r'\w+')
+OPTIONS = ('option_a', 'option_b', 'option_c', 'option_d')
+
+
+# --- Text ---
+def words(text):
+    return _WORD.findall((text or '').casefold())
+
+def terms(text):
+    return [w[:MAX_TERM] for w in words(text) if w not in STOPWORDS and (len(w) > 1 or w.isdigit())]
+
+def shingles(text):
+    ws = words(text)
+    if len(ws) <= SHINGLE: return {' '.join(ws)} if ws else set()
+    return {' '.join(ws[i:i + SHINGLE]) for i in range(len(ws) - SHINGLE + 1)}
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+def _hash64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
+
+def buckets(shingle_set):
+    """One LSH bucket per band (the band number is part of the hash, so buckets never collide across bands)."""
+    if not shingle_set: return []
+    hashes = [_hash64(s.encode('utf-8')) for s in shingle_set]
+    sig = [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS]
+    return [_hash64(repr((band, sig[band * ROWS:(band + 1) * ROWS])).encode()) >> 1 for band in range(BANDS)]
+
+
+# --- Index maintenance ---
+def _postings(row):
+    counts = {}
+    for t in terms(row['question_text']):
+        counts[t] = counts.get(t, 0) + TEXT_WEIGHT
+    for col in OPTIONS:
+        for t in terms(row.get(col)):
+            counts[t] = counts.get(t, 0) + 1
+    return counts
+
+def _insert(cursor, rows):
+    term_rows, bucket_rows = [], []
+    for r in rows:
+        term_rows.extend((t, r['question_id'], tf) for t, tf in _postings(r).items())
+        bucket_rows.extend((b, r['question_id']) for b in set(buckets(shingles(r['question_text']))))
+    cursor.executemany("INSERT INTO Question_Terms (term, question_id, tf) VALUES (%s, %s, %s)", term_rows)
+    cursor.executemany("INSERT INTO Question_Buckets (bucket, question_id) VALUES (%s, %s)", bucket_rows)
+
+def forget(cursor, ids):
+    if not ids: return
+    fmt = ','.join(['%s'] * len(ids))
+    cursor.execute(f"DELETE FROM Question_Terms WHERE question_id IN ({fmt})", tuple(ids))
+    cursor.execute(f"DELETE FROM Question_Buckets WHERE question_id IN ({fmt})", tuple(ids))
+
+def index_questions(cursor, rows):
+    """(Re)indexes rows with question_id, question_text and option_a..option_d. Caller commits."""
+    forget(cursor, [r['question_id'] for r in rows])
+    _insert(cursor, rows)
+
+QUESTION_SQL = "SELECT question_id, quiz_id, question_text, option_a, option_b, option_c, option_d FROM Questions"
+
+def reindex(cursor, ids):
+    """Reindexes questions by id, reading their saved text; returns the rows. Caller commits."""
+    if not ids: return []
+    cursor.execute(f"{QUESTION_SQL} WHERE question_id IN ({','.join(['%s'] * len(ids))})", tuple(ids))
+    rows = cursor.fetchall()
+    index_questions(cursor, rows)
+    return rows
+
+def rebuild(cursor, chunk=1000):
+    """Drops and rebuilds the whole index in question_id order; returns the number of questions."""
+    cursor.execute("DELETE FROM Question_Terms")
+    cursor.execute("DELETE FROM Question_Buckets")
+    last, total = 0, 0
+    while True:
+        cursor.execute(f"{QUESTION_SQL} WHERE question_id > %s ORDER BY question_id LIMIT %s", (last, chunk))
+        rows = cursor.fetchall()
+        if not rows: return total
+        _insert(cursor, rows)
+        last, total = rows[-1]['question_id'], total + len(rows)
+
+
+# --- Queries ---
+def _in(n):
+    return ','.join(['%s'] * n)
+
+_DETAIL_SQL = """SELECT q.question_id, q.question_text, q.question_type, q.marks, q.quiz_id,
+                        COALESCE(z.title, 'General') AS session_name
+                 FROM Questions q LEFT JOIN Quizzes z ON q.quiz_id = z.quiz_id"""
+
+def _details(cursor, ids):
+    if not ids: return {}
+    cursor.execute(f"{_DETAIL_SQL} WHERE q.question_id IN ({','.join(['%s'] * len(ids))})", tuple(ids))
+    return {r['question_id']: r for r in cursor.fetchall()}
+
+def match_filter(text):
+    """listing.py filter: questions containing every term of `text`."""
+    ts = sorted(set(terms(text)))
+    if not ts: return "1=1", ()
+    return (f"""q.question_id IN (SELECT question_id FROM Question_Terms WHERE term IN ({_in(len(ts))})
+                                  GROUP BY question_id HAVING COUNT(*) = {len(ts)})""", tuple(ts))
+
+# Statement builders shared with migrations.py's EXPLAIN check (n = number of query terms)
+def df_sql(n):
+    return f"SELECT term, COUNT(*) AS df FROM Question_Terms WHERE term IN ({_in(n)}) GROUP BY term"
+
+COUNT_SQL = "SELECT COUNT(*) AS n FROM Questions"
+
+def rank_sql(n, in_quiz=False):
+    """Params: (term, idf) per term, the terms, [quiz_id], limit."""
+    weight = "CASE t.term " + " ".join("WHEN %s THEN %s" for _ in range(n)) + " END"
+    sql = f"SELECT t.question_id, SUM(t.tf * {weight}) AS score FROM Question_Terms t"
+    if in_quiz: sql += " JOIN Questions q ON q.question_id = t.question_id"
+    sql += f" WHERE t.term IN ({_in(n)})"
+    if in_quiz: sql += " AND q.quiz_id = %s"
+    return sql + f" GROUP BY t.question_id HAVING COUNT(*) = {n} ORDER BY score DESC, t.question_id DESC LIMIT %s"
+
+def buckets_sql(n):
+    return f"SELECT bucket, question_id FROM Question_Buckets WHERE bucket IN ({_in(n)})"
+
+def search(cursor, text, quiz_id=None, limit=SEARCH_LIMIT):
+    """Questions containing every term of `text`, best tf-idf first, with a 'score' each."""
+    ts = sorted(set(terms(text)))
+    if not ts: return []
+    cursor.execute(df_sql(len(ts)), tuple(ts))
+    df = {r['term']: r['df'] for r in cursor.fetchall()}
+    if len(df) < len(ts): return []  # some term matches nothing
+    cursor.execute(COUNT_SQL)
+    n = cursor.fetchone()['n']
+    idf = {t: math.log(1 + (n - df[t] + 0.5) / (df[t] + 0.5)) for t in ts}
+
+    params = [v for t in ts for v in (t, idf[t])] + list(ts)
+    if quiz_id is not None: params.append(quiz_id)
+    params.append(max(1, min(int(limit), SEARCH_MAX)))
+    cursor.execute(rank_sql(len(ts), quiz_id is not None), params)
+    scores = [(r['question_id'], float(r['score'])) for r in cursor.fetchall()]
+
+    rows = _details(cursor, [qid for qid, _ in scores])
+    return [dict(rows[qid], score=round(score, 3)) for qid, score in scores if qid in rows]
+
+def similar(cursor, rows, threshold=SIMILAR_THRESHOLD, limit=5, earlier_only=False):
+    """
+    Near-duplicates already in the index for each of `rows` (dicts with question_text and,
+    for saved questions, question_id). Returns one list per row of {'question_id', 'similarity'},
+    most similar first. A row never matches itself; with earlier_only it only matches lower ids,
+    so a batch that was just indexed reports each pair once.
+    """
+    sets = [shingles(r['question_text']) for r in rows]
+    keys = [buckets(s) for s in sets]
+    hits = [{} for _ in rows]  # per row: question_id -> shared buckets
+    for start in range(0, len(rows), LOOKUP_BATCH):
+        wanted = {}
+        for i in range(start, min(start + LOOKUP_BATCH, len(rows))):
+            for b in keys[i]: wanted.setdefault(b, []).append(i)
+        if not wanted: continue
+        cursor.execute(buckets_sql(len(wanted)), tuple(wanted))
+        for r in cursor.fetchall():
+            for i in wanted[r['bucket']]:
+                hits[i][r['question_id']] = hits[i].get(r['question_id'], 0) + 1
+
+    candidates = []
+    for row, h in zip(rows, hits):
+        own = row.get('question_id')
+        ids = [qid for qid in h if qid != own and not (earlier_only and own is not None and qid > own)]
+        candidates.append(sorted(ids, key=lambda qid: -h[qid])[:MAX_CANDIDATES])
+
+    texts = {}
+    wanted_ids = sorted({qid for ids in candidates for qid in ids})
+    for start in range(0, len(wanted_ids), 500):
+        chunk = wanted_ids[start:start + 500]
+        cursor.execute(f"SELECT question_id, question_text FROM Questions WHERE question_id IN ({','.join(['%s'] * len(chunk))})",
+                       tuple(chunk))
+        texts.update((r['question_id'], shingles(r['question_text'])) for r in cursor.fetchall())
+
+    result = []
+    for s, ids in zip(sets, candidates):
+        found = [(qid, jaccard(s, texts[qid])) for qid in ids if qid in texts]
+        found = sorted(((qid, sim) for qid, sim in found if sim >= threshold), key=lambda m: (-m[1], m[0]))[:limit]
+        result.append([{'question_id': qid, 'similarity': round(sim, 3)} for qid, sim in found])
+    return result
+
+def similar_questions(cursor, text, exclude=None, limit=5):
+    """similar() for one piece of text, with each match's text and session for display."""
+    matches = similar(cursor, [{'question_text': text, 'question_id': exclude}], limit=limit)[0]
+    rows = _details(cursor, [m['question_id'] for m in matches])
+    return [dict(rows[m['question_id']], similarity=m['similarity']) for m in matches if m['question_id'] in rows]
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) >= 2 else None
+    if command not in ('rebuild', 'query') or (command == 'query') != (len(sys.argv) > 2):
+        sys.exit("usage: python search.py [rebuild | query <text>]")
+    conn = get_db_connection()
+    if conn is None: sys.exit(1)
+    with conn.cursor() as cursor:
+        if command == 'rebuild':
+            print(f"Indexed {rebuild(cursor)} question(s)")
+            conn.commit()
+        else:
+            for r in search(cursor, ' '.join(sys.argv[2:])):
+                print(f"#{r['question_id']:<7} {r['score']:>7}  [{r['session_name']}] {r['question_text'][:80]}")
+    conn.close()
@@ -0,0 +1,122 @@
+"""
+State shared by the blueprints: the in-memory caches in front of the exam-critical
+reads, the write-behind answer buffer (set up by create_app when WRITE_BEHIND is on)
+and small helpers several route modules need.
+"""
+import time
+from datetime import datetime
+from flask import jsonify
+from database import get_db_connection
+from cache import TTLCache
+import sweeper
+
+answer_buffer = None  # AnswerBuffer when write-behind autosave is enabled
+
+PAPER_SQL = "SELECT * FROM Questions WHERE quiz_id=%s"
+SCHEDULE_SQL = "SELECT * FROM Quizzes ORDER BY start_time ASC"
+DEADLINE_SQL = "SELECT deadline, user_id FROM Quiz_Attempts WHERE attempt_id=%s"
+QUESTION_QUIZ_SQL = "SELECT quiz_id FROM Questions WHERE question_id=%s"
+OPEN_ATTEMPT_SQL = "SELECT attempt_id FROM Quiz_Attempts WHERE attempt_id=%s AND status='In-Progress' FOR UPDATE"
+
+# Quiz papers are identical for every student, so exam start is served from memory
+quiz_cache = TTLCache(maxsize=64, ttl=600)
+
+def get_quiz_paper(quiz_id):
+    """Quiz meta + question list for the exam console, with answer keys stripped; None for an unknown quiz."""
+    def load():
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT * FROM Quizzes WHERE quiz_id=%s", (quiz_id,))
+            meta = cursor.fetchone()
+            cursor.execute(PAPER_SQL, (quiz_id,))
+            questions = cursor.fetchall()
+        conn.close()
+        if meta is None: return None  # not cached, so a quiz created later is found
+        for q in questions: q.pop('correct_option', None)
+        return {'meta': meta, 'questions': questions}
+    return quiz_cache.get_or_load(int(quiz_id), load)
+
+def invalidate_quiz(quiz_id=None):
+    """Drops one cached paper, or all of them when the quiz isn't known."""
+    if quiz_id: quiz_cache.invalidate(int(quiz_id))
+    else: quiz_cache.clear()
+
+# Student dashboard: the quiz schedule and the announcement are the same for everyone
+dashboard_cache = TTLCache(maxsize=4, ttl=300)
+
+def get_schedule():
+    """All quizzes ordered by start_time (native DATETIME, NULL = always open)."""
+    def load():
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(SCHEDULE_SQL)
+            rows = cursor.fetchall()
+        conn.close()
+        return tuple(rows)
+    return dashboard_cache.get_or_load('schedule', load)
+
+def get_announcement():
+    """Active announcement message, or None."""
+    def load():
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT message, is_active FROM Announcements WHERE id=1")
+            ann = cursor.fetchone()
+        conn.close()
+        return (ann['message'] if (ann and ann['is_active']) else None,)  # wrapped so "no announcement" is cached too
+    return dashboard_cache.get_or_load('announcement', load)[0]
+
+def parse_start_time(value):
+    """datetime-local form value ('2024-05-01T10:00') -> datetime; blank means no schedule."""
+    return datetime.fromisoformat(value) if value else None
+
+# Item analysis (item_analysis.py) per quiz; dropped on regrade and question edits
+analysis_cache = TTLCache(maxsize=32, ttl=3600)
+
+# An attempt's deadline and owner never change, so the autosave and event checks stay off the database
+deadline_cache = TTLCache(maxsize=20000, ttl=3600)
+
+def _attempt_facts(attempt_id):
+    """(deadline as epoch seconds or None, user_id) for an attempt, or None if it doesn't exist."""
+    def load():
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(DEADLINE_SQL, (attempt_id,))
+            row = cursor.fetchone()
+        conn.close()
+        if not row: return None
+        return (row['deadline'].timestamp() if row['deadline'] else None, row['user_id'])
+    return deadline_cache.get_or_load(int(attempt_id), load)
+
+def attempt_deadline(attempt_id):
+    """Epoch seconds when an attempt runs out of time, or None if it has no deadline."""
+    found = _attempt_facts(attempt_id)
+    return found[0] if found else None
+
+def attempt_owner(attempt_id):
+    """user_id of the student taking an attempt, or None if there is no such attempt."""
+    found = _attempt_facts(attempt_id)
+    return found[1] if found else None
+
+def accepting_answers(attempt_id):
+    deadline = attempt_deadline(attempt_id)
+    return deadline is None or time.time() <= deadline + sweeper.GRACE_SECONDS
+
+def time_up():
+    return jsonify({'status': 'error', 'output': 'Time is up'}), 403
+
+def lock_open_attempt(cursor, attempt_id):
+    """
+    True if the attempt is still in progress, holding its row until the caller commits,
+    so an answer written next can't land after a concurrent submit has scored it.
+    """
+    cursor.execute(OPEN_ATTEMPT_SQL, (attempt_id,))
+    return cursor.fetchone() is not None
+
+def already_submitted():
+    return jsonify({'status': 'error', 'output': 'Already submitted'}), 403
+
+def quiz_of_question(cursor, q_id):
+    cursor.execute(QUESTION_QUIZ_SQL, (q_id,))
+    row = cursor.fetchone()
+    return row['quiz_id'] if row else None
@@ -0,0 +1,218 @@
+"""
+Storage backends.
+
+database.py opens every connection through the backend chosen by QCMS_DB_BACKEND:
+
+  mysql   (default) pymysql against DB_CONFIG
+  sqlite  an embedded database file (QCMS_SQLITE_PATH) in WAL mode: in-process storage
+          with no server and no network hop, for a single-node offline exam hall and
+          for running the load test against a fast local database
+
+Both hand out connections with the pymysql API the rest of the code is written
+against (dict rows, %s placeholders, lastrowid/rowcount, commit/rollback, unbuffered
+cursors for exports). SQL that differs between the two goes through the backend:
+
+  upsert(table, columns, keys, update)   INSERT that updates the existing row on a key
+                                         conflict; NEW(col) in `update` is the incoming value
+  add_seconds(expr, seconds)             datetime arithmetic
+  name                                   'mysql' | 'sqlite', for the few statements
+                                         that need two versions (UPDATE ... JOIN, UPDATE ... LIMIT)
+
+Bulk inserts are plain executemany on both: pymysql folds INSERT ... VALUES into
+multi-row statements, SQLite reuses one prepared statement inside the transaction.
+
+On SQLite, NOW(), GREATEST(), FLOOR() and ADD_SECONDS() are provided as SQL functions,
+SELECT ... FOR UPDATE takes the write lock before reading (SQLite has one writer, so
+that serialises the same read-modify-write the row lock does on MySQL), and DATETIME
+columns round-trip as datetime objects.
+"""
+import functools
+import math
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+import pymysql
+
+_NEW = re.compile(r'\bNEW\((\w+)\)')
+_FOR_UPDATE = re.compile(r'\s+FOR\s+UPDATE\s*$', re.I)
+_WRITES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class MySQLBackend:
+    name = 'mysql'
+
+    def __init__(self, config):
+        self.config = config
+
+    def connect(self):
+        return pymysql.connect(**self.config)
+
+    def upsert(self, table, columns, keys, update, values=None):
+        """`values` overrides the '%s' placeholders per column, e.g. ('%s', '1')."""
+        update = _NEW.sub(r'VALUES(\1)', update)
+        return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(values or ['%s'] * len(columns))}) "
+                f"ON DUPLICATE KEY UPDATE {update}")
+
+    def add_seconds(self, expr, seconds):
+        return f"({expr} + INTERVAL {seconds} SECOND)"
+
+    def schema_file(self):
+        return 'schema.sql'
+
+
+class SQLiteBackend:
+    name = 'sqlite'
+
+    def __init__(self, path, busy_timeout=10, synchronous='NORMAL'):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.synchronous = synchronous  # NORMAL is crash-safe in WAL mode; FULL also survives power loss
+        self._wal_lock = threading.Lock()
+        self._wal_set = False
+
+    def connect(self):
+        raw = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                              check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        with self._wal_lock:
+            # journal_mode is stored in the file; set it once per process
+            if not self._wal_set:
+                raw.execute("PRAGMA journal_mode=WAL")
+                self._wal_set = True
+        raw.execute(f"PRAGMA synchronous={self.synchronous}")
+        raw.execute("PRAGMA foreign_keys=ON")
+        raw.create_function('NOW', 0, _now)
+        raw.create_function('GREATEST', -1, _greatest, deterministic=True)
+        raw.create_function('FLOOR', 1, _floor, deterministic=True)
+        raw.create_function('ADD_SECONDS', 2, _add_seconds, deterministic=True)
+        return SQLiteConnection(raw)
+
+    def upsert(self, table, columns, keys, update, values=None):
+        update = _NEW.sub(r'excluded.\1', update)
+        return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(values or ['%s'] * len(columns))}) "
+                f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {update}")
+
+    def add_seconds(self, expr, seconds):
+        return f"ADD_SECONDS({expr}, {seconds})"
+
+    def schema_file(self):
+        return 'schema_sqlite.sql'
+
+
+# --- SQLite: SQL functions and type conversion ---
+_TS = '%Y-%m-%d %H:%M:%S'
+
+def _now():
+    return datetime.now().strftime(_TS)
+
+def _greatest(*args):
+    return None if any(a is None for a in args) else max(args)
+
+def _floor(x):
+    return None if x is None else math.floor(x)
+
+def _add_seconds(ts, seconds):
+    if ts is None or seconds is None: return None
+    return (datetime.fromisoformat(ts) + timedelta(seconds=float(seconds))).strftime(_TS)
+
+def _to_datetime(raw):
+    return datetime.fromisoformat(raw.decode())
+
+sqlite3.register_adapter(datetime, lambda d: d.strftime(_TS) if not d.microsecond else d.isoformat(' '))
+sqlite3.register_converter('DATETIME', _to_datetime)
+sqlite3.register_converter('TIMESTAMP', _to_datetime)
+
+
+@functools.lru_cache(maxsize=1024)
+def _translate(query, has_args):
+    """pymysql-style SQL -> sqlite3: %s placeholders become ?, FOR UPDATE becomes an up-front write lock."""
+    lock = bool(_FOR_UPDATE.search(query))
+    if lock: query = _FOR_UPDATE.sub('', query)
+    if has_args: query = query.replace('%s', '?').replace('%%', '%')
+    write = lock or query.lstrip().split(None, 1)[0].upper() in _WRITES
+    return query, write
+
+
+class SQLiteConnection:
+    """sqlite3 connection with the slice of the pymysql connection API the app uses."""
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def cursor(self, cursorclass=None):
+        # pymysql.cursors.SSCursor / Cursor ask for tuple rows; the default is dicts
+        dict_rows = cursorclass is None or issubclass(cursorclass, pymysql.cursors.DictCursorMixin)
+        return SQLiteCursor(self, dict_rows)
+
+    def _begin(self, write):
+        # Writers take the lock when their transaction starts, so they queue on
+        # busy_timeout instead of failing when a read-only snapshot can't be upgraded
+        if write and not self._raw.in_transaction:
+            self._raw.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        if self._raw.in_transaction: self._raw.execute("COMMIT")
+
+    def rollback(self):
+        if self._raw.in_transaction: self._raw.execute("ROLLBACK")
+
+    def ping(self, reconnect=False):
+        self._raw.execute("SELECT 1")
+
+    def close(self):
+        self._raw.close()
+
+
+class SQLiteCursor:
+    def __init__(self, conn, dict_rows):
+        self._conn = conn
+        self._cur = conn._raw.cursor()
+        self._dict = dict_rows
+        self._names = None
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _done(self):
+        self._names = [d[0] for d in self._cur.description] if self._cur.description else None
+        self.rowcount = self._cur.rowcount
+        self.lastrowid = self._cur.lastrowid
+        return self.rowcount
+
+    def _row(self, row):
+        return dict(zip(self._names, row)) if self._dict and row is not None else row
+
+    def execute(self, query, args=None):
+        sql, write = _translate(query, args is not None)
+        self._conn._begin(write)
+        self._cur.execute(sql, tuple(args) if args is not None else ())
+        return self._done()
+
+    def executemany(self, query, args):
+        args = [tuple(a) for a in args]
+        if not args: return 0
+        sql, write = _translate(query, True)
+        self._conn._begin(write)
+        self._cur.executemany(sql, args)
+        return self._done()
+
+    def fetchone(self):
+        return self._row(self._cur.fetchone())
+
+    def fetchmany(self, size=None):
+        return [self._row(r) for r in self._cur.fetchmany(size or self._cur.arraysize)]
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cur.fetchall()]
+
+    def __iter__(self):
+        for row in self._cur:
+            yield self._row(row)
+
+    def close(self):
+        self._cur.close()
@@ -0,0 +1,71 @@
+"""
+Auto-submit for attempts that ran out of time.
+
+Every INTERVAL seconds one pass finalizes (scores + marks Completed) every In-Progress
+attempt whose deadline passed more than GRACE_SECONDS ago, in batches of BATCH_SIZE
+via scoring.finalize_expired, then updates the aggregates and notifies open consoles
+and dashboards. Safe to run in several processes at once (rows are locked per batch).
+
+CLI:  python sweeper.py        (one pass, e.g. from cron when the web app runs no sweeper)
+"""
+import threading
+from database import get_db_connection
+from scoring import finalize_expired
+import aggregates
+import events
+
+INTERVAL = 30
+GRACE_SECONDS = 30   # late autosaves within this window are still accepted (network lag)
+BATCH_SIZE = 500
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def sweep_once(answer_buffer=None):
+    """Runs one pass; returns the number of attempts finalized."""
+    if answer_buffer: answer_buffer.flush()  # scores must include acknowledged answers
+    total = 0
+    while True:
+        conn = get_db_connection()
+        if conn is None: return total
+        try:
+            with conn.cursor() as cursor:
+                finalized = finalize_expired(cursor, grace=GRACE_SECONDS, limit=BATCH_SIZE)
+                for a in finalized:
+                    aggregates.record_submission(cursor, a['quiz_id'], a['user_id'], a['attempt_id'], a['score'])
+                conn.commit()
+                counts = {q: aggregates.completed_count(cursor, q) for q in {a['quiz_id'] for a in finalized}}
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        for a in finalized:
+            events.publish(f"attempt:{a['attempt_id']}", 'finished', {'attempt_id': a['attempt_id']})
+        for quiz_id, completed in counts.items():
+            events.publish('submissions', 'submission', {'quiz_id': quiz_id, 'completed': completed})
+        total += len(finalized)
+        if len(finalized) < BATCH_SIZE: return total
+
+def _loop(interval, answer_buffer):
+    stop = threading.Event()
+    while not stop.wait(interval):
+        try:
+            n = sweep_once(answer_buffer)
+            if n: print(f"Sweeper: finalized {n} expired attempt(s)")
+        except Exception as e:
+            print(f"Sweeper Error: {e}")
+
+def start(interval=INTERVAL, answer_buffer=None):
+    """Starts the sweeper thread in this process (idempotent)."""
+    global _started
+    with _start_lock:
+        if _started: return
+        _started = True
+    threading.Thread(target=_loop, args=(interval, answer_buffer), name='attempt-sweeper', daemon=True).start()
+
+
+if __name__ == '__main__':
+    print(f"Finalized {sweep_once()} expired attempt(s)")
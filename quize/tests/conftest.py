@@ -0,0 +1,86 @@
+"""
+Tests run against the embedded SQLite backend: a throwaway database file is created and
+migrated once per session, and every test starts from empty tables (ids keep counting up,
+so the in-memory caches never see a reused id).
+
+    cd quize && python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+
+# Must be set before anything imports database.py
+os.environ['QCMS_DB_BACKEND'] = 'sqlite'
+os.environ['QCMS_SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='qcms-tests-'), 'qcms.sqlite3')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from database import get_db_connection
+import migrations
+import state
+
+TABLES = ('Question_Buckets', 'Question_Terms', 'Question_Tests', 'Quiz_Responses', 'Quiz_Attempts', 'Questions',
+          'Quiz_Score_Histogram', 'Quiz_Stats', 'Global_Stats', 'Quizzes', 'Users', 'Jobs', 'Events')
+
+
+@pytest.fixture(scope='session')
+def migrated():
+    conn = get_db_connection()
+    migrations.migrate(conn)
+    conn.close()
+
+
+@pytest.fixture
+def conn(migrated):
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        for table in TABLES: cursor.execute(f"DELETE FROM {table}")
+    conn.commit()
+    for cache in (state.quiz_cache, state.dashboard_cache, state.deadline_cache, state.analysis_cache): cache.clear()
+    yield conn
+    conn.rollback()
+    conn.close()
+
+
+@pytest.fixture
+def cursor(conn):
+    with conn.cursor() as cursor:
+        yield cursor
+
+
+@pytest.fixture(scope='session')
+def app(migrated):
+    from app import create_app
+    return create_app({'TESTING': True})  # no start_services: no buffer, job workers or sweeper
+
+
+def login(client, user_id, role='Student', name='Test'):
+    with client.session_transaction() as s:
+        s.update(user_id=user_id, role=role, name=name)
+
+
+# --- Rows ---
+def make_quiz(cursor, title='Quiz', duration=30, category='General'):
+    cursor.execute("INSERT INTO Quizzes (title, category, duration_minutes) VALUES (%s, %s, %s)", (title, category, duration))
+    return cursor.lastrowid
+
+def make_question(cursor, quiz_id, correct='A', marks=1, qtype='MCQ', text=None):
+    cursor.execute("""INSERT INTO Questions (quiz_id, question_type, question_text, option_a, option_b, option_c, option_d,
+                                            correct_option, marks)
+                      VALUES (%s, %s, %s, 'a', 'b', 'c', 'd', %s, %s)""",
+                   (quiz_id, qtype, text or f"Question {marks} {correct}", None if qtype == 'CODE' else correct, marks))
+    return cursor.lastrowid
+
+def make_user(cursor, name='Student', role='Student'):
+    cursor.execute("INSERT INTO Users (full_name, email, role) VALUES (%s, %s, %s)", (name, f"{name.lower()}@test.local", role))
+    return cursor.lastrowid
+
+def make_attempt(cursor, user_id, quiz_id, answers=(), status='In-Progress', score=0):
+    """`answers` is [(question_id, selected_option), ...]."""
+    cursor.execute("INSERT INTO Quiz_Attempts (user_id, quiz_id, total_score, status) VALUES (%s, %s, %s, %s)",
+                   (user_id, quiz_id, score, status))
+    attempt_id = cursor.lastrowid
+    for question_id, option in answers:
+        cursor.execute("INSERT INTO Quiz_Responses (attempt_id, question_id, selected_option) VALUES (%s, %s, %s)",
+                       (attempt_id, question_id, option))
+    return attempt_id
@@ -0,0 +1,114 @@
+import json
+import os
+import re
+import pytest
+import answer_buffer
+import state
+from answer_buffer import AnswerBuffer
+from conftest import login, make_quiz, make_question, make_user, make_attempt
+
+DEAD_PID = 4194304 + 1  # above Linux's pid_max, so never a running process
+
+
+@pytest.fixture
+def exam(conn, cursor):
+    quiz = make_quiz(cursor)
+    questions = [make_question(cursor, quiz, 'A', 1, text=f"Q{i}") for i in range(3)]
+    user = make_user(cursor)
+    attempt = make_attempt(cursor, user, quiz)
+    conn.commit()
+    return quiz, questions, user, attempt
+
+@pytest.fixture
+def journal(tmp_path):
+    return str(tmp_path / 'answers.journal')
+
+@pytest.fixture
+def started(journal):
+    buffers = []
+    def start(**kwargs):
+        buffer = AnswerBuffer(journal_path=journal, flush_interval=3600, **kwargs)
+        buffer.start()
+        buffers.append(buffer)
+        return buffer
+    yield start
+    for buffer in buffers: buffer.shutdown()
+
+
+def lines(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+def stored(cursor, attempt):
+    cursor.execute("SELECT question_id, selected_option, is_flagged FROM Quiz_Responses WHERE attempt_id=%s", (attempt,))
+    return {r['question_id']: (r['selected_option'], r['is_flagged']) for r in cursor.fetchall()}
+
+
+def test_journal_starts_over_at_every_flush(started, cursor, exam):
+    quiz, (q1, q2, q3), _, attempt = exam
+    buffer = started()
+    for option in 'ABCD': buffer.put(attempt, q1, option)
+    buffer.put(attempt, q2, 'B')
+    assert len(lines(buffer.journal_path)) == 5
+    assert buffer.flush() == 2
+    assert lines(buffer.journal_path) == []
+    assert not os.path.exists(buffer.journal_path + '.flushing')
+    buffer.put(attempt, q3, 'C')
+    assert lines(buffer.journal_path) == [[attempt, q3, 'C', 0]]
+    assert stored(cursor, attempt) == {q1: ('D', 0), q2: ('B', 0)}
+
+def test_flushing_one_attempt_keeps_the_others_journaled(started, cursor, conn, exam):
+    quiz, (q1, *_), _, attempt = exam
+    other = make_attempt(cursor, make_user(cursor, 'Other'), quiz)
+    conn.commit()
+    buffer = started()
+    buffer.put(attempt, q1, 'A')
+    buffer.put(other, q1, 'B')
+    assert buffer.flush(attempt) == 1
+    assert lines(buffer.journal_path) == [[other, q1, 'B', 0]]
+
+def test_failed_flush_keeps_the_batch_journaled(started, monkeypatch, exam):
+    quiz, (q1, q2, _), _, attempt = exam
+    buffer = started()
+    buffer.put(attempt, q1, 'A')
+    buffer.put(attempt, q2, 'B')
+    monkeypatch.setattr(answer_buffer, 'get_db_connection', lambda: None)
+    with pytest.raises(AttributeError):
+        buffer.flush()
+    assert sorted(lines(buffer.journal_path)) == sorted([[attempt, q1, 'A', 0], [attempt, q2, 'B', 0]])
+    assert not os.path.exists(buffer.journal_path + '.flushing')
+    assert buffer.stats['errors'] == 1 and len(buffer.pending_for(attempt)) == 2
+
+def test_journals_of_a_crashed_process_are_replayed(started, journal, cursor, exam):
+    quiz, (q1, q2, q3), _, attempt = exam
+    # Crashed mid-flush: the journal being flushed and the newer live one
+    with open(f"{journal}.{DEAD_PID}.flushing", 'w', encoding='utf-8') as f:
+        f.write(json.dumps([attempt, q1, 'A', 0]) + '\n' + json.dumps([attempt, q2, 'A', 0]) + '\n')
+    with open(f"{journal}.{DEAD_PID}", 'w', encoding='utf-8') as f:
+        f.write(json.dumps([attempt, q2, 'C', 1]) + '\n' + json.dumps([attempt, q3, 'D', 0]) + '\n' + '[1, 2, "to')  # torn last line
+    buffer = started()
+    assert stored(cursor, attempt) == {q1: ('A', 0), q2: ('C', 1), q3: ('D', 0)}
+    assert os.listdir(os.path.dirname(journal)) == [os.path.basename(buffer.journal_path)]
+
+def test_running_process_journal_is_left_alone(started, journal):
+    live = f"{journal}.{os.getppid()}"
+    with open(live, 'w', encoding='utf-8') as f: f.write(json.dumps([1, 1, 'A', 0]) + '\n')
+    buffer = started()
+    assert buffer.pending_for(1) == {} and os.path.exists(live)
+
+def test_flag_only_change_keeps_the_stored_answer_on_reload(app, conn, cursor, exam):
+    quiz, (q1, *_), user, attempt = exam
+    cursor.execute("INSERT INTO Quiz_Responses (attempt_id, question_id, selected_option, is_attempted) VALUES (%s, %s, 'B', 1)",
+                   (attempt, q1))
+    conn.commit()
+    state.answer_buffer = AnswerBuffer(durability='none')
+    try:
+        state.answer_buffer.put(attempt, q1, None, 1)
+        assert state.answer_buffer.pending_for(attempt) == {q1: {'flag': 1}}
+        client = app.test_client()
+        login(client, user)
+        page = client.get(f'/quiz/{quiz}').get_data(as_text=True)
+        saved = json.loads(re.search(r'const savedData = (.*?); //', page).group(1))
+        assert saved[str(q1)] == {'opt': 'B', 'flag': 1}
+    finally:
+        state.answer_buffer = None
@@ -0,0 +1,38 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+import app as app_module
+import lazy
+
+QUIZE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BUILD = """
+import json, sys, threading
+from app import create_app
+app = create_app({'TESTING': True})
+print(json.dumps({'threads': [t.name for t in threading.enumerate()], 'heavy': sorted(m for m in %r if m in sys.modules)}))
+"""
+
+
+def test_building_the_app_starts_nothing():
+    # A fresh interpreter: the test session has already imported the heavy modules
+    out = subprocess.run([sys.executable, '-c', BUILD % (lazy.HEAVY,)], cwd=QUIZE, env=os.environ,
+                         capture_output=True, text=True, timeout=60, check=True).stdout
+    built = json.loads(out.splitlines()[-1])
+    assert built == {'threads': ['MainThread'], 'heavy': []}
+
+def test_write_behind_refuses_several_workers():
+    app = app_module.create_app({'TESTING': True, 'WRITE_BEHIND': True})
+    with pytest.raises(RuntimeError, match='single worker'):
+        app_module.start_services(app, workers=2)
+    assert not app.extensions.get('services_started')
+
+def test_services_start_once(monkeypatch):
+    polls = []
+    monkeypatch.setattr(app_module.events, 'start_poller', polls.append)
+    app = app_module.create_app({'TESTING': True, 'JOB_WORKERS': 0, 'SWEEPER_INTERVAL': 0, 'WARM_UP': False})
+    app_module.start_services(app)
+    app_module.start_services(app)
+    assert polls == [app.config['EVENT_POLL_INTERVAL']]
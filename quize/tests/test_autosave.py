@@ -0,0 +1,137 @@
+import re
+import pytest
+import scoring
+import state
+from answer_buffer import AnswerBuffer
+from conftest import login, make_quiz, make_question, make_user, make_attempt
+
+
+@pytest.fixture
+def exam(conn, cursor):
+    quiz = make_quiz(cursor)
+    questions = [make_question(cursor, quiz, 'A', 1, text=f"Q{i}") for i in range(3)]
+    user = make_user(cursor)
+    attempt = make_attempt(cursor, user, quiz)
+    conn.commit()
+    return quiz, questions, user, attempt
+
+@pytest.fixture
+def client(app, exam):
+    client = app.test_client()
+    login(client, exam[2])
+    return client
+
+@pytest.fixture
+def buffer():
+    state.answer_buffer = AnswerBuffer(durability='none')
+    yield state.answer_buffer
+    state.answer_buffer = None
+
+
+def save(client, attempt, seq, *changes):
+    res = client.post('/api/save_answers', json={'attempt_id': attempt, 'seq': seq,
+                                                 'changes': [{'question_id': q, 'option': o, 'is_flagged': 0} for q, o in changes]})
+    assert res.status_code == 200
+    return res.get_json()['ack']
+
+def stored(cursor, attempt):
+    cursor.execute("SELECT question_id, selected_option FROM Quiz_Responses WHERE attempt_id=%s", (attempt,))
+    return {r['question_id']: r['selected_option'] for r in cursor.fetchall()}
+
+def page_seq(client, quiz):
+    res = client.get(f'/quiz/{quiz}')
+    assert res.status_code == 200
+    return int(re.search(r'let syncSeq = (\d+);', res.get_data(as_text=True)).group(1))
+
+
+def test_batches_are_acknowledged_in_order(client, cursor, exam):
+    quiz, (q1, q2, q3), _, attempt = exam
+    assert save(client, attempt, 1, (q1, 'A'), (q2, 'B')) == 1
+    assert save(client, attempt, 2, (q2, 'C')) == 2
+    assert stored(cursor, attempt) == {q1: 'A', q2: 'C'}
+
+def test_retry_and_stale_batches_are_not_reapplied(client, cursor, exam):
+    quiz, (q1, q2, q3), _, attempt = exam
+    save(client, attempt, 1, (q1, 'A'))
+    save(client, attempt, 2, (q1, 'B'))
+    assert save(client, attempt, 1, (q1, 'A')) == 2  # late retry of batch 1
+    assert save(client, attempt, 2, (q1, 'B')) == 2
+    assert stored(cursor, attempt) == {q1: 'B'}
+
+def test_reload_continues_after_the_acknowledged_sequence(client, cursor, exam):
+    quiz, (q1, q2, q3), _, attempt = exam
+    assert page_seq(client, quiz) == 0
+    save(client, attempt, 1, (q1, 'A'))
+    save(client, attempt, 2, (q2, 'B'))
+    # A reloaded console numbers its next batch from here, so it isn't dropped as a retry
+    seq = page_seq(client, quiz)
+    assert seq == 2
+    assert save(client, attempt, seq + 1, (q3, 'D')) == 3
+    assert stored(cursor, attempt) == {q1: 'A', q2: 'B', q3: 'D'}
+
+def post(client, attempt, seq, *changes):
+    return client.post('/api/save_answers', json={'attempt_id': attempt, 'seq': seq,
+                                                  'changes': [{'question_id': q, 'option': o, 'is_flagged': 0} for q, o in changes]})
+
+def test_completed_attempt_takes_no_more_answers(client, cursor, conn, exam):
+    quiz, (q1, *_), _, attempt = exam
+    cursor.execute("UPDATE Quiz_Attempts SET status='Completed' WHERE attempt_id=%s", (attempt,))
+    conn.commit()
+    res = post(client, attempt, 1, (q1, 'A'))
+    assert (res.status_code, res.get_json()['output']) == (403, 'Already submitted')
+    assert stored(cursor, attempt) == {}
+
+def test_only_the_attempts_student_saves(app, client, cursor, conn, exam):
+    quiz, (q1, *_), _, attempt = exam
+    other = app.test_client()
+    login(other, make_user(cursor, 'Other'))
+    conn.commit()
+    assert post(other, attempt, 1, (q1, 'A')).status_code == 403
+    assert other.post('/api/save_answer', json={'attempt_id': attempt, 'question_id': q1, 'option': 'A'}).status_code == 403
+    assert stored(cursor, attempt) == {}
+
+@pytest.mark.parametrize('buffered', [False, True])
+def test_answers_after_submit_do_not_change_the_score(request, client, cursor, conn, exam, buffered):
+    quiz, (q1, q2, q3), _, attempt = exam
+    buffer = request.getfixturevalue('buffer') if buffered else None
+    assert save(client, attempt, 1, (q1, 'A'), (q2, 'B')) == 1
+    assert client.post('/api/submit_quiz', json={'attempt_id': attempt}).get_json()['score'] == 1
+
+    # A client that keeps going after the submit
+    res = post(client, attempt, 2, (q2, 'A'), (q3, 'A'))
+    single = client.post('/api/save_answer', json={'attempt_id': attempt, 'question_id': q2, 'option': 'A'})
+    if buffered:
+        assert buffer.flush() == 0
+        assert buffer.stats['dropped'] == 2  # q2's two changes collapsed to one
+    else:
+        assert res.status_code == single.status_code == 403
+    assert stored(cursor, attempt) == {q1: 'A', q2: 'B'}
+
+    scoring.regrade_quiz(cursor, quiz)
+    conn.commit()
+    cursor.execute("SELECT total_score FROM Quiz_Attempts WHERE attempt_id=%s", (attempt,))
+    assert float(cursor.fetchone()['total_score']) == 1
+
+def test_buffered_batches(client, cursor, exam, buffer):
+    quiz, (q1, q2, q3), _, attempt = exam
+    assert save(client, attempt, 1, (q1, 'A')) == 1
+    assert save(client, attempt, 1, (q1, 'B')) == 1
+    assert page_seq(client, quiz) == 1
+    assert save(client, attempt, 2, (q2, 'C')) == 2
+    assert stored(cursor, attempt) == {}
+    assert buffer.flush() == 2
+    assert stored(cursor, attempt) == {q1: 'A', q2: 'C'}
+
+@pytest.mark.parametrize('buffered', [False, True])
+def test_batch_reusing_a_number_is_reported_unapplied(request, client, cursor, exam, buffered):
+    quiz, (q1, q2, q3), _, attempt = exam
+    buffer = request.getfixturevalue('buffer') if buffered else None
+    seq = page_seq(client, quiz)  # the reloaded page reads 0 ...
+    assert save(client, attempt, 1, (q1, 'A')) == 1  # ... then the old page's last batch lands as 1
+    res = post(client, attempt, seq + 1, (q2, 'B')).get_json()
+    assert (res['ack'], res['applied']) == (1, False)
+    # The console renumbers above the ack and sends again
+    res = post(client, attempt, res['ack'] + 1, (q2, 'B')).get_json()
+    assert (res['ack'], res['applied']) == (2, True)
+    if buffer: buffer.flush()
+    assert stored(cursor, attempt) == {q1: 'A', q2: 'B'}
@@ -0,0 +1,63 @@
+import io
+import os
+import zipfile
+import pytest
+import cert_jobs
+import certificate_generator
+from conftest import make_quiz, make_user, make_attempt
+
+
+def test_bulk_zip_holds_every_rendered_certificate(conn, cursor, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # cache and export dirs are relative; the render processes start here too
+    monkeypatch.setattr(cert_jobs, 'MAX_WORKERS', 2)
+    # A cache too small for the batch must not lose certificates before they are packed
+    monkeypatch.setattr(certificate_generator, 'CERT_CACHE_MAX_BYTES', 1)
+    quiz = make_quiz(cursor, 'Python Basics')
+    names = ['Ada Lovelace', '../../etc/passwd', 'Zoë / O\'Brien']
+    attempts = [make_attempt(cursor, make_user(cursor, name), quiz, status='Completed', score=8) for name in names]
+    conn.commit()
+
+    result = cert_jobs.render_quiz_certificates(quiz, make_zip=True)
+    assert (result['total'], result['rendered'], result['failed']) == (3, 3, 0)
+    with zipfile.ZipFile(result['zip']) as zf:
+        members = zf.namelist()
+    assert members == [f"Certificate_{attempts[0]}_Ada_Lovelace.pdf", f"Certificate_{attempts[1]}_etc_passwd.pdf",
+                       f"Certificate_{attempts[2]}_Zoë_O_Brien.pdf"]
+    # Only the ZIP is left in the export dir; the cache was trimmed afterwards
+    assert os.listdir(cert_jobs.EXPORT_DIR) == [os.path.basename(result['zip'])]
+    assert [n for n in os.listdir(certificate_generator.CERT_CACHE_DIR) if n.endswith('.pdf')] == []
+
+def test_member_name():
+    assert cert_jobs.member_name(7, None) == "Certificate_7_student.pdf"
+    assert cert_jobs.member_name(7, '..') == "Certificate_7_student.pdf"
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(certificate_generator, '_cache_bytes', None)
+    monkeypatch.setattr(certificate_generator, 'CERT_CACHE_MAX_BYTES', 10000)
+    monkeypatch.setattr(certificate_generator, 'generate_certificate_pdf', lambda *args: io.BytesIO(b'%PDF' + b'x' * 96))
+    scans = []
+    evict = certificate_generator.evict_cache
+    monkeypatch.setattr(certificate_generator, 'evict_cache', lambda *a: scans.append(1) or evict(*a))
+    return scans
+
+def cached_bytes():
+    return sum(e.stat().st_size for e in os.scandir(certificate_generator.CERT_CACHE_DIR) if e.name.endswith('.pdf'))
+
+def test_cache_is_scanned_only_when_over_the_limit(cache):
+    for i in range(99): certificate_generator.get_certificate_path('Ada', 'Quiz', 9, '2024-01-01', i)
+    assert len(cache) == 1  # the first write reads the size once; the rest only add to it
+    assert cached_bytes() == 9900
+    for i in range(99, 120): certificate_generator.get_certificate_path('Ada', 'Quiz', 9, '2024-01-01', i)
+    assert len(cache) == 2
+    assert cached_bytes() <= 10000
+    # Trimmed to the low-water mark, most recently used kept
+    assert os.path.exists(certificate_generator.cache_path('Ada', 'Quiz', 9, 119))
+    assert not os.path.exists(certificate_generator.cache_path('Ada', 'Quiz', 9, 0))
+
+def test_evicted_certificate_is_rendered_again(cache):
+    path = certificate_generator.get_certificate_path('Ada', 'Quiz', 9, '2024-01-01', 1)
+    os.remove(path)  # e.g. another process's eviction
+    assert certificate_generator.get_certificate_path('Ada', 'Quiz', 9, '2024-01-01', 1) == path
+    assert os.path.exists(path)
@@ -0,0 +1,69 @@
+import time
+import pytest
+import code_grading
+from blueprints import exam
+from conftest import login, make_quiz, make_question, make_user, make_attempt
+
+
+class FakeExecutor:
+    def __init__(self, seconds=0):
+        self.seconds = seconds
+        self.runs = []
+        self.timeouts = []
+
+    def run(self, code, stdin='', user_id=None, timeout=None):
+        self.runs.append(user_id)
+        self.timeouts.append(timeout)
+        time.sleep(self.seconds)
+        return {'status': 'ok', 'stdout': '1\n', 'stderr': '', 'time': self.seconds}
+
+
+@pytest.fixture
+def setup(app, conn, cursor, monkeypatch):
+    quiz = make_quiz(cursor)
+    question = make_question(cursor, quiz, qtype='CODE')
+    cursor.execute("UPDATE Questions SET test_output='1' WHERE question_id=%s", (question,))
+    owner, other = make_user(cursor, 'Owner'), make_user(cursor, 'Other')
+    attempt = make_attempt(cursor, owner, quiz)
+    conn.commit()
+    executor = FakeExecutor()
+    monkeypatch.setattr(exam, 'get_executor', lambda backend: executor)
+    code_grading.results_cache.clear()
+    return app.test_client(), question, owner, other, attempt, executor
+
+def run(client, attempt, question):
+    return client.post('/api/run_code', json={'attempt_id': attempt, 'question_id': question, 'code': 'print(1)'})
+
+def stored(cursor, attempt):
+    cursor.execute("SELECT selected_option FROM Quiz_Responses WHERE attempt_id=%s", (attempt,))
+    return [r['selected_option'] for r in cursor.fetchall()]
+
+
+def test_owner_runs_code(setup, cursor):
+    client, question, owner, other, attempt, executor = setup
+    login(client, owner)
+    res = run(client, attempt, question)
+    assert res.get_json()['is_correct'] is True
+    assert executor.runs == [owner]  # the per-user cap sees who ran it
+    assert stored(cursor, attempt) == ['CODE_SUCCESS']
+
+def test_other_student_and_anonymous_are_denied(setup, cursor):
+    client, question, owner, other, attempt, executor = setup
+    assert run(client, attempt, question).status_code == 403
+    login(client, other)
+    assert run(client, attempt, question).status_code == 403
+    assert run(client, 10 ** 6, question).status_code == 403
+    assert executor.runs == []
+    assert stored(cursor, attempt) == []
+
+def test_grading_stops_at_the_run_budget():
+    tests = {'digest': 'budget', 'tests': [{'input': '', 'expected': '1', 'hidden': True}] * 5}
+    executor = FakeExecutor(seconds=0.1)
+    code_grading.results_cache.clear()
+    started = time.monotonic()
+    result = code_grading.grade(executor, 1, tests, 'print(1)', budget=0.25)
+    assert time.monotonic() - started < 0.5
+    assert (result['passed'], result['total'], result['is_correct']) == (3, 5, False)
+    assert all(0 < t <= 0.25 for t in executor.timeouts)  # each run gets what is left of the budget
+    # Not cached: with a free executor the same code passes
+    assert code_grading.grade(FakeExecutor(), 1, tests, 'print(1)')['is_correct'] is True
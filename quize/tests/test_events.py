@@ -0,0 +1,62 @@
+import threading
+import time
+import pytest
+import events
+from conftest import login, make_quiz, make_user, make_attempt
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    monkeypatch.setattr(events, 'broker', events.Broker())
+    return events.broker
+
+
+def test_event_fans_out_to_every_waiting_poll(broker):
+    results = {}
+    def poll(name, topics):
+        results[name] = broker.wait(0, topics, timeout=0.5)
+    waiters = [threading.Thread(target=poll, args=(f"viewer{i}", {'announcements'})) for i in range(3)]
+    waiters.append(threading.Thread(target=poll, args=('exam', {'attempt:5'})))
+    started = time.monotonic()
+    for t in waiters: t.start()
+    time.sleep(0.1)
+    broker.add([(1, 'announcements', 'announcement', {'message': 'Hi'})])
+    for t in waiters: t.join(3)
+    for i in range(3):
+        assert results[f"viewer{i}"] == ([('announcement', {'message': 'Hi'})], 1)
+    assert results['exam'] == ([], 1)  # other topic: waits out its timeout, but moves its cursor on
+    assert time.monotonic() - started >= 0.5
+    assert broker.metrics()['delivered'] == 3 and broker.metrics()['waiting'] == 0
+
+def test_poll_catches_up_from_its_cursor(broker):
+    broker.add([(1, 'quizzes', 'quizzes', None), (2, 'announcements', 'announcement', {'message': 'a'}),
+                (3, 'announcements', 'announcement', {'message': 'b'})])
+    assert broker.wait(1, {'announcements'}, timeout=0) == ([('announcement', {'message': 'a'}), ('announcement', {'message': 'b'})], 3)
+    assert broker.wait(3, {'announcements'}, timeout=0) == ([], 3)
+    broker.add([(2, 'announcements', 'announcement', {'message': 'again'})])  # already seen: ignored
+    assert broker.metrics()['received'] == 3
+
+def test_published_event_reaches_polls_through_the_table(app, conn, cursor, broker):
+    quiz = make_quiz(cursor)
+    user = make_user(cursor)
+    attempt = make_attempt(cursor, user, quiz)
+    conn.commit()
+    client = app.test_client()
+    login(client, user)
+    cursor_id = client.get(f'/api/events?attempt_id={attempt}').get_json()['cursor']
+
+    events.publish(f"attempt:{attempt}", 'finished', {'attempt_id': attempt})  # e.g. from another worker
+    events.publish('attempt:999', 'finished', {'attempt_id': 999})
+    assert events.poll_once(cursor) == 2
+    res = client.get(f'/api/events?attempt_id={attempt}&since={cursor_id}').get_json()
+    assert res['events'] == [{'event': 'finished', 'data': {'attempt_id': attempt}}]
+    assert res['cursor'] == broker.last_id and res['clock']['remaining'] is None
+
+def test_other_students_attempt_is_denied(app, conn, cursor):
+    quiz = make_quiz(cursor)
+    attempt = make_attempt(cursor, make_user(cursor, 'Owner'), quiz)
+    other = make_user(cursor, 'Other')
+    conn.commit()
+    client = app.test_client()
+    login(client, other)
+    assert client.get(f'/api/events?attempt_id={attempt}').status_code == 403
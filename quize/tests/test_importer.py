@@ -0,0 +1,118 @@
+import pytest
+import importer
+from conftest import make_quiz, make_question
+
+MCQ = {'question_text': 'What is 2 + 2?', 'option_a': '3', 'option_b': '4', 'option_c': '5', 'option_d': '22',
+       'correct_option': 'B', 'marks': '2'}
+
+
+def test_valid_mcq():
+    record, error = importer.validate(MCQ)
+    assert error is None
+    assert (record['question_type'], record['correct_option'], record['marks']) == ('MCQ', 'B', 2)
+
+@pytest.mark.parametrize('changes, expected', [
+    ({'correct_option': 'option c'}, ('C', 2)),
+    ({'correct_option': ' d '}, ('D', 2)),
+    ({'marks': ''}, ('B', 1)),
+    ({'marks': '3.0'}, ('B', 3)),
+    ({'marks': 4}, ('B', 4)),
+])
+def test_lenient_fields(changes, expected):
+    record, error = importer.validate(dict(MCQ, **changes))
+    assert error is None
+    assert (record['correct_option'], record['marks']) == expected
+
+@pytest.mark.parametrize('raw, error', [
+    (None, "Row is malformed or has too few columns"),
+    (['What?', 'a', 'b'], "Row is malformed or has too few columns"),
+    (dict(MCQ, question_text='   '), "Missing question text"),
+    (dict(MCQ, question_type='essay'), "Unknown question type 'ESSAY'"),
+    (dict(MCQ, marks='two'), "Marks 'two' is not a number"),
+    (dict(MCQ, marks='inf'), "Marks 'inf' is not a number"),
+    (dict(MCQ, marks='-inf'), "Marks '-inf' is not a number"),
+    (dict(MCQ, marks='nan'), "Marks 'nan' is not a number"),
+    (dict(MCQ, marks='0'), "Marks must be positive"),
+    (dict(MCQ, marks='-1'), "Marks must be positive"),
+    (dict(MCQ, option_d=''), "All four options are required"),
+    (dict(MCQ, correct_option='E'), "Correct option 'E' must be A, B, C or D"),
+    (dict(MCQ, correct_option=None), "Correct option '' must be A, B, C or D"),
+    ({'question_text': 'Print 1', 'question_type': 'code'}, "CODE question needs test_output"),
+])
+def test_invalid_rows(raw, error):
+    assert importer.validate(raw) == (None, error)
+
+def test_code_question_needs_no_options():
+    record, error = importer.validate({'question_text': 'Print 1', 'question_type': 'CODE', 'test_output': '1'})
+    assert error is None
+    assert (record['question_type'], record['option_a'], record['correct_option'], record['test_output']) == ('CODE', None, None, '1')
+
+
+def test_import_counts_duplicates_and_invalid_rows(conn, cursor):
+    quiz = make_quiz(cursor)
+    make_question(cursor, quiz, text='What is  2 + 2?')  # already in the bank, spacing aside
+    conn.commit()
+    rows = [
+        (1, MCQ),
+        (2, dict(MCQ, question_text='What is 3 + 3?', correct_option='X')),
+        (3, dict(MCQ, question_text='What is 3 + 3?')),
+        (4, dict(MCQ, question_text='WHAT IS 3 + 3?')),  # same text as row 3 once normalised
+        (5, None),
+        (6, dict(MCQ, question_text='What is 4 + 4?')),
+        (7, dict(MCQ, question_text='What is 5 + 5?', marks='inf')),
+    ]
+    summary = importer.import_questions(conn, quiz, rows, chunk_size=1)
+    assert (summary['imported'], summary['duplicates'], summary['invalid']) == (2, 2, 3)
+    assert [e['row'] for e in summary['errors']] == [2, 5, 7]
+
+    cursor.execute("SELECT question_text, text_hash FROM Questions WHERE quiz_id=%s ORDER BY question_id", (quiz,))
+    saved = cursor.fetchall()
+    assert [r['question_text'] for r in saved] == ['What is  2 + 2?', 'What is 3 + 3?', 'What is 4 + 4?']
+    assert all(r['text_hash'] for r in saved)  # the pre-existing row is hashed on the way
+
+    # Importing the same file again adds nothing
+    again = importer.import_questions(conn, quiz, rows)
+    assert (again['imported'], again['duplicates'], again['invalid']) == (0, 4, 3)
+
+def test_same_text_in_another_quiz_is_not_a_duplicate(conn, cursor):
+    first, second = make_quiz(cursor), make_quiz(cursor, 'Second')
+    conn.commit()
+    assert importer.import_questions(conn, first, [(1, MCQ)])['imported'] == 1
+    assert importer.import_questions(conn, second, [(1, MCQ)])['imported'] == 1
+
+def test_csv_rows(tmp_path):
+    path = tmp_path / 'bank.csv'
+    path.write_text('\ufeffQuestion_Text,Option_A,Option_B,Option_C,Option_D,Correct_Option,Marks\n'
+                    'What is 2 + 2?,3,4,5,22,B,2\n', encoding='utf-8')
+    rows = list(importer.read_rows(str(path), importer.detect_format('bank.CSV')))
+    assert len(rows) == 1 and rows[0][0] == 1
+    assert importer.validate(rows[0][1])[0]['correct_option'] == 'B'
+
+@pytest.mark.parametrize('text', [
+    '[{"question_text": "Q1", "marks": 12345}, {"question_text": "Q2", "marks": 2}, 7]',
+    ' {"title": "Bank", "meta": {"questions": [0]}, "questions": [{"question_text": "Q1", "marks": 12345},\n'
+    '  {"question_text": "Q2", "marks": 2}, 7], "tail": 1}',
+])
+@pytest.mark.parametrize('read_size', [3, 64 * 1024])
+def test_json_rows_are_streamed(tmp_path, monkeypatch, text, read_size):
+    # Tiny reads split values (and the number 12345) across chunk boundaries
+    monkeypatch.setattr(importer, 'JSON_READ_SIZE', read_size)
+    path = tmp_path / 'bank.json'
+    path.write_text(text, encoding='utf-8')
+    rows = list(importer.read_rows(str(path), 'json'))
+    assert rows == [(1, {'question_text': 'Q1', 'marks': 12345}), (2, {'question_text': 'Q2', 'marks': 2}), (3, 7)]
+
+@pytest.mark.parametrize('text', ['[{"question_text": "Q1"}, {"question_text": ', '[{"question_text": "Q1"} {}]', '"Q1"'])
+def test_malformed_json_fails(tmp_path, monkeypatch, text):
+    monkeypatch.setattr(importer, 'JSON_READ_SIZE', 4)
+    path = tmp_path / 'bank.json'
+    path.write_text(text, encoding='utf-8')
+    with pytest.raises(ValueError):
+        list(importer.read_rows(str(path), 'json'))
+
+def test_json_value_size_is_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(importer, 'JSON_MAX_VALUE', 100)
+    path = tmp_path / 'bank.json'
+    path.write_text('[{"question_text": "' + 'x' * 500 + '"}]', encoding='utf-8')
+    with pytest.raises(ValueError):
+        list(importer.read_rows(str(path), 'json'))
@@ -0,0 +1,41 @@
+import logging
+import instrumentation
+from conftest import login, make_quiz, make_user, make_attempt
+
+
+def route_stats(method, route):
+    return instrumentation.registry._routes[(method, route)]
+
+
+def test_streamed_export_is_measured_after_its_body(app, conn, cursor):
+    quiz = make_quiz(cursor)
+    for i in range(3): make_attempt(cursor, make_user(cursor, f"S{i}"), quiz, status='Completed', score=i)
+    conn.commit()
+    client = app.test_client()
+    login(client, make_user(cursor, 'Admin', 'Admin'), 'Admin')
+    conn.commit()
+
+    res = client.get('/admin/export_results')
+    body = res.get_data()
+    res.close()
+    assert body.count(b'\n') == 4
+    assert 'X-DB-Queries' not in res.headers  # sent before the body's queries ran
+    stats = route_stats('GET', '/admin/export_results')
+    assert stats.size.count == 1 and stats.size.sum == len(body)
+    assert stats.queries.sum >= 1 and stats.rows.sum == 3  # the export's own query, run while streaming
+    assert instrumentation.current() is None
+
+def test_buffered_response_keeps_its_headers(app, conn, cursor):
+    client = app.test_client()
+    res = client.get('/')
+    assert 'X-DB-Queries' in res.headers
+    assert route_stats('GET', '/').size.sum >= len(res.get_data())
+
+def test_failing_gauge_is_logged(caplog):
+    instrumentation.register_gauges('broken', lambda: 1 / 0)
+    try:
+        with caplog.at_level(logging.ERROR, logger='qcms.slow'):
+            instrumentation.registry.render()
+        assert "Metrics gauges 'broken' failed" in caplog.text and 'ZeroDivisionError' in caplog.text
+    finally:
+        del instrumentation.registry._gauges['broken']
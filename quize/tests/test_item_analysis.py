@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import item_analysis
+from conftest import make_quiz, make_question, make_user, make_attempt
+
+A, B, C, D, PASS, FAIL, BLANK = 0, 1, 2, 3, item_analysis.CODE_PASS, item_analysis.OTHER, item_analysis.BLANK
+QUESTIONS = [{'question_id': 1, 'question_text': 'Q1', 'question_type': 'MCQ', 'correct_option': 'A', 'marks': 1},
+             {'question_id': 2, 'question_text': 'Q2', 'question_type': 'MCQ', 'correct_option': 'b', 'marks': 1},
+             {'question_id': 3, 'question_text': 'Q3', 'question_type': 'CODE', 'correct_option': None, 'marks': 2}]
+# Four attempts; scores 4, 1, 3, 0, so the top and bottom 27% are the first and the last attempt
+CHOICE = np.array([[A, B, PASS],
+                   [A, C, BLANK],
+                   [C, B, PASS],
+                   [BLANK, D, FAIL]], dtype=np.int8)
+SCORES = np.array([4.0, 1.0, 3.0, 0.0])
+
+
+@pytest.fixture(scope='module')
+def items():
+    result = item_analysis.compute(QUESTIONS, SCORES, CHOICE)
+    assert result['attempts'] == 4
+    return {q['question_id']: q for q in result['questions']}
+
+
+def test_difficulty_discrimination_and_omissions(items):
+    assert [(items[i]['difficulty'], items[i]['discrimination'], items[i]['omitted']) for i in (1, 2, 3)] == \
+           [(0.5, 1.0, 0.25), (0.5, 1.0, 0.0), (0.5, 1.0, 0.25)]
+
+def test_point_biserial_uses_the_rest_of_the_score(items):
+    # Q1 right = [1,1,0,0] vs rest [3,0,3,0]: uncorrelated; Q2 vs [3,1,2,0]: 2/sqrt(5); Q3 vs [2,1,1,0]: 1/sqrt(2)
+    assert [items[i]['point_biserial'] for i in (1, 2, 3)] == [0.0, 0.894, 0.707]
+
+def test_option_shares_and_distractors(items):
+    q2 = items[2]['options']
+    assert {k: v['share'] for k, v in q2.items()} == {'A': 0.0, 'B': 0.5, 'C': 0.25, 'D': 0.25}
+    assert q2['B']['correct'] and q2['B']['effective'] is None
+    assert (q2['D']['upper'], q2['D']['lower'], q2['D']['effective']) == (0.0, 1.0, True)  # drew the bottom group
+    assert q2['A']['effective'] is False and q2['C']['effective'] is False
+    assert items[2]['flags'] == ['weak_distractors']
+    assert 'options' not in items[3] and items[3]['flags'] == []
+
+def test_constant_column_has_no_correlation():
+    result = item_analysis.compute(QUESTIONS[:1], np.array([1.0, 1.0, 1.0]), np.array([[A], [A], [A]], dtype=np.int8))
+    item = result['questions'][0]
+    assert (item['difficulty'], item['point_biserial']) == (1.0, None)
+    assert item['flags'] == ['too_easy', 'poor_discrimination', 'weak_distractors']
+
+def test_matrix_is_loaded_from_the_responses(conn, cursor):
+    quiz = make_quiz(cursor)
+    q1, q2, q3 = make_question(cursor, quiz, 'A'), make_question(cursor, quiz, 'B'), make_question(cursor, quiz, qtype='CODE')
+    answers = [[(q1, 'A'), (q2, 'B'), (q3, 'CODE_SUCCESS')], [(q1, 'A'), (q2, 'C'), (q3, '')], [(q1, 'C'), (q2, 'B'), (q3, 'CODE_SUCCESS')],
+               [(q2, 'D'), (q3, 'CODE_FAIL')]]
+    ids = [make_attempt(cursor, make_user(cursor, f"S{i}"), quiz, a, status='Completed', score=s)
+           for i, (a, s) in enumerate(zip(answers, SCORES))]
+    make_attempt(cursor, make_user(cursor, 'Busy'), quiz, [(q1, 'B')])  # in progress: left out
+    conn.commit()
+    questions, attempt_ids, scores, choice = item_analysis.load_matrix(conn, quiz)
+    assert [q['question_id'] for q in questions] == [q1, q2, q3]
+    order = np.argsort(attempt_ids)
+    assert list(attempt_ids[order]) == ids
+    assert list(scores[order]) == list(SCORES)
+    assert choice[order].tolist() == CHOICE.tolist()
@@ -0,0 +1,66 @@
+import time
+import importer
+import jobs
+from conftest import make_quiz
+
+
+def run_job(cursor, job_id):
+    assert jobs.run_one()
+    return jobs.job_status(cursor, job_id)
+
+
+def test_import_job_larger_than_a_chunk(app, conn, cursor, tmp_path):
+    # Progress is reported after each chunk while the import's write transaction is open
+    quiz = make_quiz(cursor)
+    conn.commit()
+    rows = importer.CHUNK_SIZE * 2 + 10
+    path = tmp_path / 'bank.csv'
+    path.write_text('question_text,option_a,option_b,option_c,option_d,correct_option,marks\n' +
+                    ''.join(f"What is {i} + {i}?,{i},{2 * i},{3 * i},{4 * i},B,1\n" for i in range(rows)), encoding='utf-8')
+    job_id = jobs.enqueue('import_questions', {'path': str(path), 'quiz_id': quiz, 'format': 'csv'})
+
+    started = time.monotonic()
+    job = run_job(cursor, job_id)
+    assert time.monotonic() - started < 5  # no wait on the database lock
+    assert job['status'] == 'Completed', job['error']
+    assert job['result']['imported'] == rows
+    assert job['progress_done'] >= importer.CHUNK_SIZE
+    cursor.execute("SELECT COUNT(*) AS n FROM Questions WHERE quiz_id=%s", (quiz,))
+    assert cursor.fetchone()['n'] == rows
+    assert not path.exists()
+
+calls = []
+
+@jobs.handler('test_flaky')
+def flaky(payload, job):
+    calls.append(job.attempts)
+    if len(calls) <= payload['failures']: raise RuntimeError(f"boom {len(calls)}")
+    return {'ok': True}
+
+def make_due(cursor, conn, job_id):
+    # Skip the backoff wait
+    cursor.execute("UPDATE Jobs SET run_after=%s WHERE job_id=%s", ('2000-01-01 00:00:00', job_id))
+    conn.commit()
+
+def test_failed_job_is_retried_after_a_backoff(conn, cursor):
+    calls.clear()
+    job_id = jobs.enqueue('test_flaky', {'failures': 1})
+    job = run_job(cursor, job_id)
+    assert (job['status'], job['attempts'], job['error']) == ('Queued', 1, 'boom 1')
+    assert not jobs.run_one()  # not due yet
+    make_due(cursor, conn, job_id)
+    job = run_job(cursor, job_id)
+    assert (job['status'], job['attempts'], job['error'], job['result']) == ('Completed', 2, None, {'ok': True})
+    assert calls == [1, 2]
+
+def test_job_fails_for_good_after_max_attempts(conn, cursor):
+    calls.clear()
+    job_id = jobs.enqueue('test_flaky', {'failures': 5}, max_attempts=2)
+    run_job(cursor, job_id)
+    make_due(cursor, conn, job_id)
+    job = run_job(cursor, job_id)
+    assert (job['status'], job['attempts'], job['error']) == ('Failed', 2, 'boom 2')
+    assert job['finished_at'] is not None
+    make_due(cursor, conn, job_id)
+    assert not jobs.run_one()  # a failed job is never claimed again
+    assert calls == [1, 2]
@@ -0,0 +1,71 @@
+import base64
+import json
+import pytest
+import listing
+from conftest import login, make_quiz, make_question, make_user, make_attempt
+
+
+def walk(cursor, resource, **args):
+    """Every page of a listing, following `next` until it runs out."""
+    items, after = [], None
+    while True:
+        page = listing.fetch_page(cursor, resource, dict(args, after=after))
+        items.extend(page['items'])
+        if not page['next']: return items
+        after = page['next']
+
+
+def test_attempts_by_score_with_ties(cursor):
+    quiz = make_quiz(cursor)
+    # Pages of two split each run of equal scores, so only the attempt_id tiebreak keeps the walk exact
+    scores = [5, 7, 5, 5, 7, 0, 5, 7, 0]
+    ids = [make_attempt(cursor, make_user(cursor, f"S{i}"), quiz, status='Completed', score=s) for i, s in enumerate(scores)]
+
+    rows = walk(cursor, 'attempts', limit=2)
+    assert [r['attempt_id'] for r in rows] == [i for _, i in sorted(zip(scores, ids), reverse=True)]
+
+    rows = walk(cursor, 'attempts', limit=2, order='asc')
+    assert [r['attempt_id'] for r in rows] == [i for _, i in sorted(zip(scores, ids))]
+
+def test_filters_apply_on_every_page(cursor):
+    quiz, other = make_quiz(cursor), make_quiz(cursor, 'Other')
+    mine = [make_attempt(cursor, make_user(cursor, f"A{i}"), quiz, score=1) for i in range(5)]
+    for i in range(5): make_attempt(cursor, make_user(cursor, f"B{i}"), other, score=1)
+    rows = walk(cursor, 'attempts', limit=2, quiz_id=quiz, sort='id', order='asc')
+    assert [r['attempt_id'] for r in rows] == mine
+
+def test_questions_with_null_marks(cursor):
+    quiz = make_quiz(cursor)
+    marks = [None, 2, None, 0, 2, None, 1]
+    ids = [make_question(cursor, quiz, 'A', m, text=f"Q{i}") for i, m in enumerate(marks)]
+    # NULL sorts as 0 and is tied with the real zero
+    rows = walk(cursor, 'questions', limit=2, sort='marks', order='desc')
+    assert [r['question_id'] for r in rows] == [i for _, i in sorted(zip([m or 0 for m in marks], ids), reverse=True)]
+
+def test_students_by_name(cursor):
+    names = ['Bea', 'Al', 'Bea', None, 'Al', 'Cy']
+    ids = []
+    for i, name in enumerate(names):
+        cursor.execute("INSERT INTO Users (full_name, email, role) VALUES (%s, %s, 'Student')", (name, f"s{i}@test.local"))
+        ids.append(cursor.lastrowid)
+    make_user(cursor, 'Staff', role='Coordinator')
+    rows = walk(cursor, 'students', limit=2, sort='name', order='asc')
+    assert [r['user_id'] for r in rows] == [i for _, i in sorted(zip([n or '' for n in names], ids))]
+
+@pytest.mark.parametrize('token', ['MQ==', '!!!', base64.urlsafe_b64encode(b'{"a": 1}').decode(),
+                                   listing.encode_cursor([1, 2, 3]), listing.encode_cursor([[1], 2])])
+def test_malformed_cursor_is_rejected(token):
+    with pytest.raises(ValueError):
+        listing.decode_cursor(token)
+
+def test_cursor_round_trip():
+    assert listing.decode_cursor(listing.encode_cursor([5.5, 12])) == [5.5, 12]
+    assert json.loads(base64.urlsafe_b64decode(listing.encode_cursor(['x', 1]))) == ['x', 1]
+
+def test_route_answers_400_for_a_bad_cursor(app, conn):
+    client = app.test_client()
+    login(client, 1, role='Admin')
+    assert client.get('/api/list/attempts?after=MQ==').status_code == 400
+    assert client.get('/api/list/attempts?sort=title').status_code == 400
+    assert client.get('/api/list/attempts').status_code == 200
+    assert client.get('/api/list/nothing').status_code == 404
@@ -0,0 +1,35 @@
+import app as app_module
+import loadtest
+from conftest import make_user
+
+
+def test_in_process_run_reports_every_route(conn, cursor, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # certificates are rendered into ./cert_cache
+    monkeypatch.setattr(app_module, 'start_services', lambda app, workers=1: None)  # no background threads in tests
+    bystander = make_user(cursor, 'Bystander')
+    conn.commit()
+    quiz = loadtest.seed(students=4, questions=3)
+
+    result = loadtest.run(students=4, concurrency=2, answers=3)
+    assert result['failed_flows'] == 0
+    routes = result['routes']
+    assert {route: (r['n'], r['errors']) for route, r in routes.items()} == {
+        'POST /': (4, 0), 'GET /student': (4, 0), 'GET /quiz/<id>': (4, 0), 'POST /api/save_answer': (12, 0),
+        'POST /api/submit_quiz': (4, 0), 'GET /download/cert/<id>': (4, 0)}
+    assert all(r['p50'] <= r['p95'] <= r['p99'] <= r['max'] for r in routes.values())
+    assert routes['POST /api/save_answer']['queries'] >= 1
+    cursor.execute("SELECT COUNT(*) AS n FROM Quiz_Attempts WHERE quiz_id=%s AND status='Completed'", (quiz,))
+    assert cursor.fetchone()['n'] == 4
+
+    loadtest.reset(cursor)
+    conn.commit()
+    cursor.execute("SELECT email FROM Users")
+    assert [r['email'] for r in cursor.fetchall()] == ['bystander@test.local']  # only bench rows are removed
+    cursor.execute("SELECT COUNT(*) AS n FROM Quizzes")
+    assert cursor.fetchone()['n'] == 0
+
+def test_summary_percentiles():
+    samples = {'GET /': [(float(ms), 2, ms != 100) for ms in range(1, 101)]}
+    report = loadtest.summarize(samples, wall=10)['GET /']
+    assert (report['n'], report['errors'], report['p50'], report['p95'], report['p99'], report['max']) == (100, 1, 51.0, 96.0, 100.0, 100.0)
+    assert (report['rps'], report['queries']) == (10.0, 2.0)
@@ -0,0 +1,85 @@
+import threading
+import time
+import pytest
+from database import ConnectionPool
+
+
+class FakeRaw:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+
+    def ping(self, reconnect=False):
+        if not self.alive: raise ConnectionError("MySQL server has gone away")
+
+    def rollback(self):
+        if not self.alive: raise ConnectionError("MySQL server has gone away")
+
+    def close(self):
+        self.closed = True
+
+
+class FakeBackend:
+    def __init__(self):
+        self.made = []
+
+    def connect(self):
+        self.made.append(FakeRaw())
+        return self.made[-1]
+
+
+def make_pool(**kwargs):
+    options = dict(min_size=0, max_size=2, checkout_timeout=0.2, idle_timeout=300, ping_after=30)
+    options.update(kwargs)
+    return ConnectionPool(FakeBackend(), **options)
+
+
+def test_exhausted_pool_times_out():
+    pool = make_pool()
+    held = [pool.acquire(), pool.acquire()]
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    assert 0.2 <= time.monotonic() - started < 1
+    assert pool.metrics()['timeouts'] == 1 and pool.metrics()['in_use'] == 2
+    for conn in held: conn.close()
+
+def test_waiter_gets_the_released_connection():
+    pool = make_pool(checkout_timeout=5)
+    first, second = pool.acquire(), pool.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.1)
+    assert not got  # still waiting: the pool is at max_size
+    first.close()
+    waiter.join(2)
+    assert got == [first] and len(pool.backend.made) == 2
+    assert pool.metrics()['wait_max'] >= 0.1
+
+def test_dead_connection_is_replaced_on_checkout():
+    pool = make_pool(ping_after=0)
+    conn = pool.acquire()
+    raw = conn._raw
+    conn.close()
+    raw.alive = False  # dropped by the server while idle
+    time.sleep(0.01)
+    fresh = pool.acquire()
+    assert fresh._raw is not raw and raw.closed
+    assert pool.metrics()['recycled'] == 1 and pool.metrics()['open'] == 1
+
+def test_broken_connection_is_not_returned_to_the_pool():
+    pool = make_pool()
+    conn = pool.acquire()
+    conn._raw.alive = False
+    conn.close()  # the rollback on release fails
+    assert pool.metrics()['open'] == 0 and pool.metrics()['idle'] == 0
+
+def test_idle_connections_above_min_size_are_closed():
+    pool = make_pool(min_size=1, idle_timeout=0)
+    first, second = pool.acquire(), pool.acquire()
+    first.close()
+    second.close()
+    time.sleep(0.01)
+    pool.acquire()
+    assert pool.metrics()['evicted'] == 1 and pool.metrics()['open'] == 1
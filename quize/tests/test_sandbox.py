@@ -0,0 +1,41 @@
+import pytest
+from executor import LocalExecutor
+
+
+@pytest.fixture(scope='module')
+def sandbox():
+    try:
+        executor = LocalExecutor(workers=1, wall_timeout=5, cpu_seconds=1, memory_mb=64)
+        result = executor.run("print(1)")
+    except RuntimeError as e:
+        pytest.skip(f"sandbox unavailable here: {e}")
+    if result['status'] != 'ok': pytest.skip(f"sandbox unavailable here: {result['stderr']}")
+    return executor
+
+
+def test_output_and_stdin(sandbox):
+    result = sandbox.run("print(int(input()) * 2)", stdin='21\n')
+    assert (result['status'], result['stdout']) == ('ok', '42\n')
+
+def test_cpu_limit_kills_a_busy_loop(sandbox):
+    result = sandbox.run("while True: pass")
+    assert result['status'] == 'timeout'
+    assert 'CPU time limit exceeded' in result['stderr']
+
+def test_memory_limit(sandbox):
+    result = sandbox.run("x = bytearray(512 * 1024 * 1024)")
+    assert result['status'] == 'error'
+    assert 'MemoryError' in result['stderr']
+
+def test_wall_time_is_capped_by_the_callers_timeout(sandbox):
+    result = sandbox.run("import time\ntime.sleep(3)", timeout=0.5)
+    assert result['status'] == 'timeout'
+    assert 'Time limit exceeded' in result['stderr']
+
+@pytest.mark.parametrize('code', [
+    "import socket\nsocket.socket()",
+    "open('x', 'w')",
+    "import os\nos.fork()",
+])
+def test_blocked_operations(sandbox, code):
+    assert sandbox.run(code)['status'] == 'error'
@@ -0,0 +1,83 @@
+import pytest
+import scoring
+from conftest import make_quiz, make_question, make_user, make_attempt
+
+
+def score_of(cursor, attempt_id):
+    cursor.execute("SELECT total_score, status FROM Quiz_Attempts WHERE attempt_id=%s", (attempt_id,))
+    row = cursor.fetchone()
+    return float(row['total_score']), row['status']
+
+
+@pytest.fixture
+def paper(cursor):
+    """A quiz with weights 1, 2 and 4 (answer A) and a 3-mark CODE question."""
+    quiz = make_quiz(cursor)
+    one, two, four = (make_question(cursor, quiz, 'A', marks) for marks in (1, 2, 4))
+    code = make_question(cursor, quiz, marks=3, qtype='CODE')
+    return quiz, one, two, four, code
+
+
+def test_weighted_marks(cursor, paper):
+    quiz, one, two, four, code = paper
+    attempt = make_attempt(cursor, make_user(cursor), quiz, [(one, 'A'), (two, 'B'), (four, 'A'), (code, 'CODE_SUCCESS')])
+    assert scoring.score_attempt(cursor, attempt) == 8
+    assert score_of(cursor, attempt) == (8, 'Completed')
+
+def test_failed_code_run_and_blank_answers_score_nothing(cursor, paper):
+    quiz, one, two, four, code = paper
+    attempt = make_attempt(cursor, make_user(cursor), quiz, [(one, ''), (two, None), (code, 'CODE_FAIL')])
+    assert scoring.score_attempt(cursor, attempt) == 0
+
+def test_negative_marking(cursor, paper, monkeypatch):
+    monkeypatch.setattr(scoring, 'NEGATIVE_MARK_RATIO', 0.25)
+    quiz, one, two, four, code = paper
+    # +4 for the right answer, -0.25 * 2 for the wrong one, blanks and failed code runs cost nothing
+    attempt = make_attempt(cursor, make_user(cursor), quiz, [(one, ''), (two, 'C'), (four, 'A'), (code, 'CODE_FAIL')])
+    assert scoring.score_attempt(cursor, attempt) == 3.5
+
+def test_negative_total_is_clamped_to_zero(cursor, paper, monkeypatch):
+    monkeypatch.setattr(scoring, 'NEGATIVE_MARK_RATIO', 1.0)
+    quiz, one, two, four, code = paper
+    attempt = make_attempt(cursor, make_user(cursor), quiz, [(one, 'A'), (four, 'B')])
+    assert scoring.score_attempt(cursor, attempt) == 0
+
+def test_second_submit_is_not_scored_again(cursor, paper):
+    quiz, one, *_ = paper
+    attempt = make_attempt(cursor, make_user(cursor), quiz, [(one, 'A')])
+    assert scoring.score_attempt(cursor, attempt) == 1
+    assert scoring.score_attempt(cursor, attempt) is None
+
+def test_regrade_applies_a_changed_key_to_completed_attempts_only(cursor, paper):
+    quiz, one, two, four, code = paper
+    right = make_attempt(cursor, make_user(cursor, 'Right'), quiz, [(one, 'A'), (four, 'A')])
+    wrong = make_attempt(cursor, make_user(cursor, 'Wrong'), quiz, [(one, 'A'), (four, 'B')])
+    running = make_attempt(cursor, make_user(cursor, 'Running'), quiz, [(four, 'B')])
+    scoring.score_attempt(cursor, right)
+    scoring.score_attempt(cursor, wrong)
+
+    cursor.execute("UPDATE Questions SET correct_option='B' WHERE question_id=%s", (four,))
+    assert scoring.regrade_quiz(cursor, quiz) == 2
+    assert score_of(cursor, right) == (1, 'Completed')
+    assert score_of(cursor, wrong) == (5, 'Completed')
+    assert score_of(cursor, running) == (0, 'In-Progress')
+
+def test_regrade_leaves_other_quizzes_alone(cursor, paper):
+    quiz, one, *_ = paper
+    other = make_quiz(cursor, 'Other')
+    question = make_question(cursor, other, 'A', 10)
+    attempt = make_attempt(cursor, make_user(cursor), other, [(question, 'A')])
+    scoring.score_attempt(cursor, attempt)
+    cursor.execute("UPDATE Questions SET correct_option='B' WHERE question_id=%s", (question,))
+    assert scoring.regrade_quiz(cursor, quiz) == 0
+    assert score_of(cursor, attempt) == (10, 'Completed')
+
+def test_finalize_expired_scores_the_batch(cursor, paper):
+    quiz, one, two, *_ = paper
+    expired = make_attempt(cursor, make_user(cursor, 'Late'), quiz, [(one, 'A'), (two, 'A')])
+    current = make_attempt(cursor, make_user(cursor, 'Busy'), quiz, [(one, 'A')])
+    cursor.execute("UPDATE Quiz_Attempts SET deadline='2000-01-01 00:00:00' WHERE attempt_id=%s", (expired,))
+    cursor.execute("UPDATE Quiz_Attempts SET deadline='2999-01-01 00:00:00' WHERE attempt_id=%s", (current,))
+    done = scoring.finalize_expired(cursor)
+    assert [(d['attempt_id'], d['score']) for d in done] == [(expired, 3)]
+    assert score_of(cursor, current) == (0, 'In-Progress')
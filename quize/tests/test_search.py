@@ -0,0 +1,45 @@
+import random
+import search
+from conftest import make_quiz, make_question
+
+VOCAB = [f"word{i}" for i in range(2000)]
+
+
+def question(rng, n=20):
+    return ' '.join(rng.choice(VOCAB) for _ in range(n))
+
+def reworded(rng, text):
+    """Swaps one word: a near-duplicate (shingle Jaccard around 0.7-0.8 for 20 words)."""
+    ws = text.split()
+    ws[rng.randrange(len(ws))] = rng.choice(VOCAB)
+    return ' '.join(ws)
+
+def share_bucket(a, b):
+    return bool(set(search.buckets(search.shingles(a))) & set(search.buckets(search.shingles(b))))
+
+
+def test_lsh_recall_on_near_duplicates():
+    rng = random.Random(1)
+    pairs = [(text, reworded(rng, text)) for text in (question(rng) for _ in range(500))]
+    near = [(a, b) for a, b in pairs if search.jaccard(search.shingles(a), search.shingles(b)) >= search.SIMILAR_THRESHOLD]
+    assert len(near) > 300
+    found = sum(share_bucket(a, b) for a, b in near)
+    assert found / len(near) >= 0.95  # 16 bands of 4 rows: ~99% at Jaccard 0.7
+
+def test_lsh_rarely_pairs_unrelated_questions():
+    rng = random.Random(2)
+    unrelated = [(question(rng), question(rng)) for _ in range(500)]
+    assert sum(share_bucket(a, b) for a, b in unrelated) <= 5
+
+def test_similar_finds_the_near_duplicate_in_the_bank(conn, cursor):
+    rng = random.Random(3)
+    quiz = make_quiz(cursor)
+    texts = [question(rng) for _ in range(50)]
+    ids = [make_question(cursor, quiz, text=t) for t in texts]
+    search.reindex(cursor, ids)
+    copy = reworded(rng, texts[17])
+    matches = search.similar(cursor, [{'question_text': copy}])[0]
+    assert [m['question_id'] for m in matches] == [ids[17]]
+    assert matches[0]['similarity'] >= search.SIMILAR_THRESHOLD
+    # A saved question doesn't match itself
+    assert search.similar(cursor, [{'question_text': texts[17], 'question_id': ids[17]}])[0] == []
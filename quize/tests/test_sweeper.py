@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+import sweeper
+from answer_buffer import AnswerBuffer
+from conftest import make_quiz, make_question, make_user, make_attempt
+
+
+def set_deadline(cursor, attempt_id, seconds_ago):
+    deadline = datetime.now().replace(microsecond=0) - timedelta(seconds=seconds_ago)
+    cursor.execute("UPDATE Quiz_Attempts SET deadline=%s WHERE attempt_id=%s", (deadline, attempt_id))
+
+def status_of(cursor, attempt_id):
+    cursor.execute("SELECT total_score, status, submitted_at FROM Quiz_Attempts WHERE attempt_id=%s", (attempt_id,))
+    row = cursor.fetchone()
+    return float(row['total_score']), row['status'], row['submitted_at'] is not None
+
+
+def test_sweep_auto_submits_expired_attempts(conn, cursor, monkeypatch):
+    monkeypatch.setattr(sweeper, 'BATCH_SIZE', 2)  # three expired attempts take two batches
+    quiz = make_quiz(cursor)
+    q1, q2 = make_question(cursor, quiz, 'A', 1), make_question(cursor, quiz, 'B', 2)
+    expired = [make_attempt(cursor, make_user(cursor, f"Late{i}"), quiz, [(q1, 'A')]) for i in range(3)]
+    for attempt in expired: set_deadline(cursor, attempt, sweeper.GRACE_SECONDS + 60)
+    in_grace = make_attempt(cursor, make_user(cursor, 'Lagging'), quiz, [(q1, 'A')])
+    set_deadline(cursor, in_grace, sweeper.GRACE_SECONDS - 20)
+    untimed = make_attempt(cursor, make_user(cursor, 'Untimed'), quiz)
+    done = make_attempt(cursor, make_user(cursor, 'Done'), quiz, status='Completed', score=2)
+    set_deadline(cursor, done, 3600)
+    conn.commit()
+    # An answer acknowledged before the deadline but still in the write-behind buffer counts
+    buffer = AnswerBuffer(durability='none')
+    buffer.put(expired[0], q2, 'B')
+
+    assert sweeper.sweep_once(buffer) == 3
+    conn.commit()  # new snapshot
+    assert [status_of(cursor, a) for a in expired] == [(3, 'Completed', True), (1, 'Completed', True), (1, 'Completed', True)]
+    assert status_of(cursor, in_grace)[1] == status_of(cursor, untimed)[1] == 'In-Progress'
+    assert status_of(cursor, done) == (2, 'Completed', False)
+
+    cursor.execute("SELECT attempts FROM Quiz_Stats WHERE quiz_id=%s", (quiz,))
+    assert cursor.fetchone()['attempts'] == 3
+    cursor.execute("SELECT topic FROM Events WHERE event='finished' ORDER BY event_id")
+    assert [r['topic'] for r in cursor.fetchall()] == [f"attempt:{a}" for a in expired]
+    # Nothing left for the next pass
+    assert sweeper.sweep_once(buffer) == 0